@@ -0,0 +1,31 @@
+"""
+Configuração do pytest: imprime no final a tabela de consultas/tempo por
+endpoint montada pelos testes de orçamento (tenants/tests.py).
+"""
+import pytest
+
+
+def pytest_configure(config):
+    config.view_budget_report = []
+
+
+@pytest.fixture
+def view_budget_report(request):
+    return request.config.view_budget_report
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    rows = getattr(config, 'view_budget_report', None)
+    if not rows:
+        return
+
+    terminalreporter.section('Consultas e tempo por endpoint')
+    terminalreporter.write_line(
+        f"{'endpoint':<34} {'papel':<8} {'método':<6} {'status':>6} {'consultas':>9} {'limite':>6} {'ms':>8} {'limite':>7}"
+    )
+    for row in sorted(rows, key=lambda r: (r['name'], r['role'], r['method'])):
+        flag = '' if row['ok'] else '  << ESTOUROU'
+        terminalreporter.write_line(
+            f"{row['name']:<34} {row['role']:<8} {row['method']:<6} {row['status']:>6} "
+            f"{row['queries']:>9} {row['max_queries']:>6} {row['ms']:>8.1f} {row['max_ms']:>7.0f}{flag}"
+        )
@@ -12,7 +12,9 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -39,6 +41,12 @@ DEBUG = os.environ.get('DEBUG', 'False').strip().lower() in ('true', '1', 'yes')
 # ALLOWED HOSTS PARA SUBDOMINIOS E DOMINIOS
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost').split(',')
 
+# DOMINIOS PRINCIPAIS (mostram a Landing Page, nunca uma loja)
+PRIMARY_DOMAINS = os.environ.get(
+    'PRIMARY_DOMAINS',
+    'rmpedidos.online,www.rmpedidos.online,localhost,127.0.0.1'
+).split(',')
+
 # Adicione esta variável para usar nos seus links de Push e E-mail
 BASE_URL = os.environ.get('BASE_URL', 'http://localhost:8000')
 
@@ -59,6 +67,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro da lista: mede a requisição inteira (tenants/perf.py)
+    'tenants.perf.PerfMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -68,6 +78,8 @@ MIDDLEWARE = [
     'tenants.middleware.DomainMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Último da lista: perfil da view com ?_profile=1 (staff, tenants/profiling.py)
+    'tenants.profiling.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'rmpedidos.urls'
@@ -95,11 +107,23 @@ WSGI_APPLICATION = 'rmpedidos.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# Rodando a suíte de testes (manage.py test ou pytest)
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+# Sem DATABASE_URL só os testes e o desenvolvimento local (DEBUG) usam SQLite;
+# em produção a falta da variável derruba o deploy em vez de gravar num arquivo local
+DATABASE_URL = os.environ.get('DATABASE_URL')
+if not DATABASE_URL:
+    if not (DEBUG or TESTING):
+        raise ImproperlyConfigured('DATABASE_URL não definida. Configure o banco em produção!')
+    DATABASE_URL = f"sqlite:///{BASE_DIR / 'db.sqlite3'}"
+
 DATABASES = {
-    'default': dj_database_url.config(
-        default=os.environ.get('DATABASE_URL'),
+    'default': dj_database_url.parse(
+        DATABASE_URL,
         conn_max_age=600,
-        ssl_require=True
+        # SSL só faz sentido no PostgreSQL
+        ssl_require=not DATABASE_URL.startswith('sqlite')
     )
 }
 
@@ -108,10 +132,33 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
         'LOCATION': 'django_cache_table',
+        'OPTIONS': {
+            # Snapshots de cardápio e status das lojas ficam aqui (1+ chave por loja)
+            'MAX_ENTRIES': 20000,
+        },
     }
 }
 
 
+# DESEMPENHO (tenants/perf.py)
+# Requisições acima deste tempo (ms) vão para o log com o SQL executado
+PERF_SLOW_REQUEST_MS = int(os.environ.get('PERF_SLOW_REQUEST_MS', '500'))
+# Cabeçalho Server-Timing: 'staff', 'all' ou 'off'
+PERF_SERVER_TIMING = os.environ.get('PERF_SERVER_TIMING', 'staff')
+
+
+# MÉTRICAS (tenants/metrics.py, exposto em /metrics)
+# Sem token o endpoint responde 404
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Pasta compartilhada entre os workers do Gunicorn (vazio = cada processo só vê as suas)
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+
+
+# BASE LOCAL DE CEPS (tenants/cep_index.py, gerada com: manage.py import_ceps <csv>)
+# Sem o arquivo o checkout usa só o bairro digitado
+CEP_INDEX_PATH = os.environ.get('CEP_INDEX_PATH', os.path.join(BASE_DIR, 'data', 'cep_index.bin'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
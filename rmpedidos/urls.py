@@ -6,6 +6,7 @@ from django.conf.urls.static import static
 # Imports para SEO
 from django.contrib.sitemaps.views import sitemap
 from tenants.sitemaps import StaticViewSitemap, TenantSitemap
+from tenants.views import metrics_endpoint
 from django.views.generic.base import TemplateView
 
 sitemaps = {
@@ -22,6 +23,9 @@ urlpatterns = [
     # Rota do Robots.txt
     path('robots.txt', TemplateView.as_view(template_name="tenants/robots.txt", content_type="text/plain")),
 
+    # Métricas para o Prometheus (token em METRICS_TOKEN)
+    path('metrics', metrics_endpoint, name='metrics'),
+
     path('', include('tenants.urls')),
 ]
 
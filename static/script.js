@@ -9,6 +9,7 @@ let cart = JSON.parse(localStorage.getItem(CART_KEY)) || [];
 let isDelivery = JSON.parse(localStorage.getItem(DELIVERY_KEY)) !== false; // true por padrão
 let valorFreteAtual = 0;
 let ultimoValorFreteValido = 0; // Armazena o último valor válido do frete
+let localizacaoEntrega = null; // {lat, lng} do GPS: o checkout usa as zonas de entrega da loja
 
 // Variável global para número da mesa (definida no cardapio.html)
 window.TABLE_NUMBER = null;
@@ -27,20 +28,67 @@ window.calcularTaxaEntrega = (bairroInput) => {
     const taxaEncontrada = taxasConfiguradas.find(item => normalize(item.neighborhood) === bairroCliente);
     
     if (taxaEncontrada) {
-        valorFreteAtual = parseFloat(taxaEncontrada.fee);
-        ultimoValorFreteValido = valorFreteAtual; 
-        Toastify({ text: `Frete para ${bairroInput}: R$ ${valorFreteAtual.toFixed(2)}`, style: { background: getPrimaryColor() } }).showToast();
-    } else {
-        // Se não achar o bairro, zera o frete
-        valorFreteAtual = 0;
-        // Não atualizamos o ultimoValorFreteValido aqui para não travar lógicas futuras, 
-        // apenas zeramos o atual para mostrar "A combinar" ou sumir.
-        Toastify({ text: `Bairro não tabelado. Taxa a combinar.`, style: { background: getPrimaryColor() } }).showToast();
+        aplicarTaxaEntrega(bairroInput, taxaEncontrada.fee);
+        return;
     }
-    
-    // Atualizar display da taxa de entrega
+
+    // Sem match exato: o servidor procura um bairro parecido ("Jd. America" -> "JARDIM AMÉRICA"),
+    // o mesmo que o checkout vai cobrar
+    fetch(`/${window.TENANT_SLUG}/api/neighborhoods/?q=${encodeURIComponent(bairroInput)}`)
+        .then(r => r.ok ? r.json() : null)
+        .then(data => {
+            if (data && data.match) {
+                aplicarTaxaEntrega(data.match.neighborhood, data.match.fee);
+            } else {
+                semTaxaEntrega();
+            }
+        })
+        .catch(() => semTaxaEntrega());
+};
+
+function aplicarTaxaEntrega(bairro, fee) {
+    valorFreteAtual = parseFloat(fee);
+    ultimoValorFreteValido = valorFreteAtual;
+    Toastify({ text: `Frete para ${bairro}: R$ ${valorFreteAtual.toFixed(2)}`, style: { background: getPrimaryColor() } }).showToast();
+    updateDeliveryFeeDisplay();
+    updateCartTotal();
+}
+
+function semTaxaEntrega() {
+    // Se não achar o bairro, zera o frete
+    valorFreteAtual = 0;
+    // Não atualizamos o ultimoValorFreteValido aqui para não travar lógicas futuras, 
+    // apenas zeramos o atual para mostrar "A combinar" ou sumir.
+    Toastify({ text: `Bairro não tabelado. Taxa a combinar.`, style: { background: getPrimaryColor() } }).showToast();
     updateDeliveryFeeDisplay();
     updateCartTotal();
+}
+
+// --- AUTOCOMPLETE DO BAIRRO (digitação manual) ---
+let sugestaoBairroTimer = null;
+let sugestaoBairroSeq = 0;
+
+window.sugerirBairros = (texto) => {
+    clearTimeout(sugestaoBairroTimer);
+    const lista = document.getElementById("neighborhood-options");
+    if (!lista || !texto || texto.trim().length < 2) return;
+
+    sugestaoBairroTimer = setTimeout(() => {
+        const seq = ++sugestaoBairroSeq;
+        fetch(`/${window.TENANT_SLUG}/api/neighborhoods/?q=${encodeURIComponent(texto.trim())}`)
+            .then(r => r.ok ? r.json() : null)
+            .then(data => {
+                // Resposta atrasada de uma tecla anterior: ignora
+                if (!data || seq !== sugestaoBairroSeq) return;
+                lista.innerHTML = "";
+                data.results.forEach(item => {
+                    const option = document.createElement("option");
+                    option.value = item.neighborhood;
+                    lista.appendChild(option);
+                });
+            })
+            .catch(() => {});
+    }, 150);
 };
 
 // Função para atualizar o display da taxa de entrega
@@ -206,7 +254,9 @@ window.finalizeOrder = async () => {
             cep: document.getElementById("cep").value,
             street: document.getElementById("address").value,
             number: document.getElementById("number").value,
-            neighborhood: document.getElementById("neighborhood").value
+            neighborhood: document.getElementById("neighborhood").value,
+            lat: localizacaoEntrega ? localizacaoEntrega.lat : null,
+            lng: localizacaoEntrega ? localizacaoEntrega.lng : null
         } : {},
         table_number: window.TABLE_NUMBER,
         is_scheduled: isScheduled,
@@ -274,6 +324,22 @@ async function processarSalvamento(orderData, btn, txtOriginal) {
                 return; // PARA AQUI
             }
 
+            // O PIX é gerado em segundo plano depois do pedido: consulta até ficar pronto
+            if (result.pix_pending && result.pix_status_url) {
+                btn.innerText = "Gerando PIX...";
+                const pixData = await aguardarPix(result.pix_status_url);
+                btn.innerText = txtOriginal;
+                btn.disabled = false;
+
+                if (pixData) {
+                    if (typeof mostrarModalPix === 'function') {
+                        mostrarModalPix(pixData, result.real_total);
+                    }
+                    return; // PARA AQUI
+                }
+                // Se o MP falhar, segue o fluxo normal pelo WhatsApp (PIX manual)
+            }
+
             // =========================================================
             // B. SE NÃO FOR PIX MP -> CHAMA SUA FUNÇÃO DO WHATSAPP
             // =========================================================
@@ -1087,6 +1153,8 @@ window.buscarCep = () => {
     
     // Define flag de fetching
     cepFetching = true;
+    // Endereço digitado por CEP: a posição do GPS não vale mais
+    localizacaoEntrega = null;
     
     // CHAMADA À API COM TRATAMENTO COMPLETO
     fetch(`https://viacep.com.br/ws/${cep}/json/`)
@@ -1116,8 +1184,8 @@ window.buscarCep = () => {
                 style: { background: "#10b981" } 
             }).showToast();
             
-            // Calcula frete baseado no bairro (esta função mostrará a mensagem de taxa)
-            window.calcularTaxaEntrega(d.bairro);
+            // Calcula frete pelo CEP/bairro (esta função mostrará a mensagem de taxa)
+            window.calcularTaxaEntregaPorCep(cep, d.bairro);
         })
         .catch(erro => {
             // ERRO: Mostra mensagem amigável UMA ÚNICA VEZ
@@ -1138,6 +1206,9 @@ window.buscarCep = () => {
             window.habilitarEnderecoManual();
             cepInput.value = cep; // Mantém o CEP digitado para referência
             cepInput.focus();
+
+            // A base local de CEPs da loja ainda pode saber o bairro
+            window.calcularTaxaEntregaPorCep(cep, null);
         })
         .finally(() => {
             // Libera flag para próximas requisições
@@ -1145,6 +1216,44 @@ window.buscarCep = () => {
         });
 };
 
+// Taxa pelo CEP: a base local de CEPs do servidor diz o bairro que o checkout vai cobrar
+window.calcularTaxaEntregaPorCep = (cep, bairroInformado) => {
+    const neighborhoodInput = document.getElementById("neighborhood");
+
+    fetch(`/${window.TENANT_SLUG}/api/cep/?cep=${cep}`)
+        .then(r => r.ok ? r.json() : null)
+        .then(data => {
+            if (data && !neighborhoodInput.value) {
+                neighborhoodInput.value = data.neighborhood;
+            }
+            if (data && data.fee !== null) {
+                aplicarTaxaEntrega(data.fee_neighborhood, data.fee);
+                return;
+            }
+            const bairro = bairroInformado || neighborhoodInput.value;
+            if (bairro) window.calcularTaxaEntrega(bairro);
+        })
+        .catch(() => {
+            if (bairroInformado) window.calcularTaxaEntrega(bairroInformado);
+        });
+};
+
+// Taxa pela localização: zona de entrega da loja (raio/polígono); fora delas, pelo bairro
+window.calcularTaxaEntregaPorLocalizacao = (lat, lng, bairro) => {
+    fetch(`/${window.TENANT_SLUG}/api/delivery-zone/?lat=${lat}&lng=${lng}`)
+        .then(r => r.ok ? r.json() : null)
+        .then(data => {
+            if (data && data.zone) {
+                aplicarTaxaEntrega(data.zone.name, data.zone.fee);
+            } else if (bairro) {
+                window.calcularTaxaEntrega(bairro);
+            }
+        })
+        .catch(() => {
+            if (bairro) window.calcularTaxaEntrega(bairro);
+        });
+};
+
 window.habilitarEnderecoManual = () => {
     const addressInput = document.getElementById("address");
     const neighborhoodInput = document.getElementById("neighborhood");
@@ -1155,6 +1264,7 @@ window.habilitarEnderecoManual = () => {
     
     // Remove qualquer listener anterior para evitar duplicatas
     neighborhoodInput.removeEventListener('blur', window.handleNeighborhoodBlur);
+    neighborhoodInput.removeEventListener('input', window.handleNeighborhoodInput);
     
     // Define a função uma única vez e a reutiliza
     if (!window.handleNeighborhoodBlur) {
@@ -1165,8 +1275,15 @@ window.habilitarEnderecoManual = () => {
         };
     }
     
+    if (!window.handleNeighborhoodInput) {
+        window.handleNeighborhoodInput = function() {
+            window.sugerirBairros(this.value);
+        };
+    }
+
     // Adiciona o listener
     neighborhoodInput.addEventListener('blur', window.handleNeighborhoodBlur);
+    neighborhoodInput.addEventListener('input', window.handleNeighborhoodInput);
 };
 
 function setupEventListeners() {
@@ -1516,6 +1633,7 @@ window.usarLocalizacao = () => {
         (position) => {
             const lat = position.coords.latitude;
             const lon = position.coords.longitude;
+            localizacaoEntrega = { lat: lat, lng: lon };
             
             // Busca o endereço exato
             fetch(`https://nominatim.openstreetmap.org/reverse?format=json&lat=${lat}&lon=${lon}&addressdetails=1`)
@@ -1533,7 +1651,7 @@ window.usarLocalizacao = () => {
                     document.getElementById("address").removeAttribute("readonly");
                     document.getElementById("neighborhood").removeAttribute("readonly");
 
-                    if (bairro) window.calcularTaxaEntrega(bairro);
+                    window.calcularTaxaEntregaPorLocalizacao(lat, lon, bairro);
 
                     // Foca no número para o cliente completar
                     document.getElementById("number").value = "";
@@ -1601,6 +1719,24 @@ document.addEventListener('DOMContentLoaded', () => {
 
 // --- FUNÇÕES DO PIX (MERCADO PAGO) ---
 
+// Consulta o status do PIX até ficar pronto. Retorna os dados do PIX ou null (falha/tempo esgotado)
+async function aguardarPix(statusUrl, tentativas = 40, intervaloMs = 1500) {
+    for (let i = 0; i < tentativas; i++) {
+        try {
+            const response = await fetch(statusUrl, { cache: 'no-store' });
+            if (response.ok) {
+                const result = await response.json();
+                if (result.pix_status === 'ready') return result.pix_data;
+                if (result.pix_status === 'failed') return null;
+            }
+        } catch (error) {
+            console.error('Erro ao consultar PIX:', error);
+        }
+        await new Promise(resolve => setTimeout(resolve, intervaloMs));
+    }
+    return null;
+}
+
 function mostrarModalPix(pixData, valorTotal) {
     const modal = document.getElementById('modal-pix');
     const imgQr = document.getElementById('pix-qrcode-img');
@@ -0,0 +1,122 @@
+"""
+Resolução da loja e checagem de dono para as views do painel.
+
+Quase toda API do painel começava com get_object_or_404(Tenant, slug=slug)
+seguido de tenant.owner != request.user, o que custava 2 consultas (a loja e
+o usuário dono). Aqui:
+
+- slug -> (id, slug, owner_id) fica num LRU local entre requisições, então
+  a checagem de dono não consulta o banco;
+- a loja completa é carregada uma única vez por requisição e memorizada no
+  request (views auxiliares reaproveitam a mesma instância).
+
+A loja completa NÃO é cacheada entre requisições: plano e assinatura são
+alterados por queryset.update() nas actions do admin, sem sinal.
+"""
+from collections import namedtuple
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.http import Http404, JsonResponse
+
+from .localcache import LocalLRUCache
+from .models import Tenant
+
+TenantRef = namedtuple('TenantRef', ['id', 'slug', 'owner_id'])
+
+TENANT_REF_CACHE_MAX_SIZE = 2048
+# Troca de dono/slug feita em outro worker leva no máximo isso para valer aqui
+TENANT_REF_CACHE_TTL = 60
+TENANT_REF_CACHE_NEGATIVE_TTL = 10
+
+tenant_ref_cache = LocalLRUCache(
+    TENANT_REF_CACHE_MAX_SIZE, TENANT_REF_CACHE_TTL, negative_ttl=TENANT_REF_CACHE_NEGATIVE_TTL,
+    name='tenant_ref',
+)
+
+
+def _ref_from_tenant(tenant):
+    return TenantRef(tenant.id, tenant.slug, tenant.owner_id)
+
+
+def invalidate_tenant_ref(tenant):
+    """Remove a loja do cache local (pelo slug atual e pelo id, caso o slug tenha mudado)."""
+    tenant_ref_cache.discard(
+        lambda slug, ref: slug == tenant.slug or (ref is not None and ref.id == tenant.id)
+    )
+
+
+def get_tenant_ref(slug):
+    """Retorna o TenantRef da loja ou levanta Http404."""
+    found, ref = tenant_ref_cache.get(slug)
+    if not found:
+        row = Tenant.objects.filter(slug=slug).values_list('id', 'slug', 'owner_id').first()
+        ref = TenantRef(*row) if row else None
+        tenant_ref_cache.set(slug, ref)
+    if ref is None:
+        raise Http404('Loja não encontrada')
+    return ref
+
+
+def can_manage_tenant(user, tenant):
+    """Dono da loja ou superuser. Aceita Tenant ou TenantRef (só usa owner_id)."""
+    if not user.is_authenticated:
+        return False
+    if user.is_superuser:
+        return True
+    return tenant.owner_id is not None and tenant.owner_id == user.pk
+
+
+def get_request_tenant(request, slug):
+    """
+    Retorna a loja da URL, carregada no máximo uma vez por requisição.
+    Levanta Http404 se não existir.
+    """
+    tenants = getattr(request, '_tenants_by_slug', None)
+    if tenants is None:
+        tenants = request._tenants_by_slug = {}
+    tenant = tenants.get(slug)
+    if tenant is None:
+        found, ref = tenant_ref_cache.get(slug)
+        if found and ref is None:
+            raise Http404('Loja não encontrada')
+        try:
+            if found:
+                tenant = Tenant.objects.get(pk=ref.id)
+            else:
+                tenant = Tenant.objects.get(slug=slug)
+        except Tenant.DoesNotExist:
+            raise Http404('Loja não encontrada')
+        # Aproveita a consulta para atualizar o cache local
+        tenant_ref_cache.set(tenant.slug, _ref_from_tenant(tenant))
+        tenants[slug] = tenant
+    return tenant
+
+
+def tenant_owner_required(view_func):
+    """
+    Garante que o usuário é dono da loja do slug (ou superuser) antes de
+    chamar a view, sem consultar o banco quando o slug já está no cache.
+    A view pega a loja com get_request_tenant(request, slug).
+    Funciona também com views async (ex: stream de pedidos).
+
+    Usuário anônimo também recebe 403 (JSON). As views do painel usam
+    @login_required antes deste decorator, para o anônimo ir para o login.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _async_wrapped(request, slug, *args, **kwargs):
+            ref = await sync_to_async(get_tenant_ref)(slug)
+            user = await request.auser()
+            if not can_manage_tenant(user, ref):
+                return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+            return await view_func(request, slug, *args, **kwargs)
+        return _async_wrapped
+
+    @wraps(view_func)
+    def _wrapped(request, slug, *args, **kwargs):
+        ref = get_tenant_ref(slug)
+        if not can_manage_tenant(request.user, ref):
+            return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+        return view_func(request, slug, *args, **kwargs)
+    return _wrapped
@@ -1,9 +1,11 @@
 from django.contrib import admin
-from .models import Tenant, Category, Product, Order, OrderItem, OperatingDay, DeliveryFee, Coupon, CouponUsage, ProductOption, OptionItem, Table
+from .models import Tenant, Category, Product, Order, OrderItem, OperatingDay, DeliveryFee, DeliveryZone, Coupon, CouponUsage, ProductOption, OptionItem, Table, Job, RequestProfile
+from django.http import HttpResponse
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.utils import timezone
 from datetime import timedelta
+from .cache import bump_menu_version, invalidate_weekly_schedule, invalidate_store_status
 
 # --- AÇÕES RÁPIDAS (ACTIONS) ---
 
@@ -35,6 +37,37 @@ def block_access(modeladmin, request, queryset):
     queryset.update(subscription_active=False)
 
 
+# --- Cache do Cardápio ---
+
+class MenuCacheAdminMixin:
+    """Invalida o snapshot do cardápio quando o admin altera algo que aparece nele."""
+
+    def get_menu_tenant_id(self, obj):
+        return obj.tenant_id
+
+    def invalidate_menu_cache(self, tenant_id):
+        bump_menu_version(tenant_id)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self.invalidate_menu_cache(self.get_menu_tenant_id(obj))
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        self.invalidate_menu_cache(self.get_menu_tenant_id(form.instance))
+
+    def delete_model(self, request, obj):
+        tenant_id = self.get_menu_tenant_id(obj)
+        super().delete_model(request, obj)
+        self.invalidate_menu_cache(tenant_id)
+
+    def delete_queryset(self, request, queryset):
+        tenant_ids = {self.get_menu_tenant_id(obj) for obj in queryset}
+        super().delete_queryset(request, queryset)
+        for tenant_id in tenant_ids:
+            self.invalidate_menu_cache(tenant_id)
+
+
 # --- Cadastros Básicos ---
 
 @admin.register(Tenant)
@@ -54,6 +87,11 @@ class TenantAdmin(admin.ModelAdmin):
 
     autocomplete_fields = ['owner']
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Fechamento manual (manual_override) muda o status público em cache
+        invalidate_store_status(obj.slug)
+
     def get_plan_badge(self, obj):
         if obj.plan_type == 'pro':
             return mark_safe('<span style="background:#e0e7ff; color:#3730a3; padding: 2px 8px; border-radius: 10px; font-size: 11px; font-weight: bold;">PRO</span>')
@@ -117,7 +155,7 @@ class TenantAdmin(admin.ModelAdmin):
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(MenuCacheAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'tenant', 'order')
     list_filter = ('tenant',)
     ordering = ('tenant', 'order')
@@ -136,14 +174,17 @@ class ProductOptionInline(admin.TabularInline):
 
 
 @admin.register(ProductOption)
-class ProductOptionAdmin(admin.ModelAdmin):
+class ProductOptionAdmin(MenuCacheAdminMixin, admin.ModelAdmin):
     list_display = ('title', 'product', 'type', 'required', 'max_quantity')
     list_filter = ('type', 'required')
     inlines = [OptionItemInline]
 
+    def get_menu_tenant_id(self, obj):
+        return obj.product.tenant_id
+
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(MenuCacheAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'category', 'price', 'original_price', 'tenant', 'is_available', 'badge')
     list_filter = ('tenant', 'category', 'is_available')
     search_fields = ('name', 'description')
@@ -208,20 +249,35 @@ class OrderAdmin(admin.ModelAdmin):
 
 
 @admin.register(OperatingDay)
-class OperatingDayAdmin(admin.ModelAdmin):
+class OperatingDayAdmin(MenuCacheAdminMixin, admin.ModelAdmin):
     list_display = ('tenant', 'get_day_display', 'open_time', 'close_time', 'is_closed')
     list_filter = ('tenant', 'day', 'is_closed')
     ordering = ('tenant', 'day')
 
+    def invalidate_menu_cache(self, tenant_id):
+        super().invalidate_menu_cache(tenant_id)
+        invalidate_weekly_schedule(tenant_id)
+        slug = Tenant.objects.filter(id=tenant_id).values_list('slug', flat=True).first()
+        if slug:
+            invalidate_store_status(slug)
+
 
 @admin.register(DeliveryFee)
-class DeliveryFeeAdmin(admin.ModelAdmin):
+class DeliveryFeeAdmin(MenuCacheAdminMixin, admin.ModelAdmin):
     list_display = ('tenant', 'neighborhood', 'fee')
     list_filter = ('tenant',)
     search_fields = ('neighborhood',)
     list_editable = ('fee',)
 
 
+@admin.register(DeliveryZone)
+class DeliveryZoneAdmin(MenuCacheAdminMixin, admin.ModelAdmin):
+    list_display = ('tenant', 'name', 'kind', 'radius_km', 'fee', 'priority', 'is_active')
+    list_filter = ('tenant', 'kind', 'is_active')
+    search_fields = ('name',)
+    list_editable = ('fee', 'priority', 'is_active')
+
+
 # --- Gestão de Cupons ---
 
 
@@ -251,6 +307,14 @@ class CouponAdmin(admin.ModelAdmin):
 
     readonly_fields = ('used_count',)
 
+    def save_model(self, request, obj, form, change):
+        if change:
+            # Grava só o que foi editado: used_count lido no form pode estar velho
+            # e apagaria usos contados por redeem() nesse meio tempo
+            obj.save(update_fields=form.changed_data)
+        else:
+            super().save_model(request, obj, form, change)
+
 
 @admin.register(CouponUsage)
 class CouponUsageAdmin(admin.ModelAdmin):
@@ -268,4 +332,57 @@ class TableAdmin(admin.ModelAdmin):
     list_filter = ('tenant', 'is_active')
     search_fields = ('tenant__name', 'number')
     list_editable = ('is_active',)
-    ordering = ('tenant', 'number')
\ No newline at end of file
+    ordering = ('tenant', 'number')
+
+
+# --- Fila de Jobs (segundo plano) ---
+
+@admin.action(description="Executar novamente")
+def retry_jobs(modeladmin, request, queryset):
+    queryset.exclude(status='running').update(
+        status='pending', run_at=timezone.now(), attempts=0, finished_at=None
+    )
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'last_error')
+    ordering = ('-id',)
+    actions = [retry_jobs]
+    readonly_fields = ('created_at', 'finished_at', 'locked_at', 'locked_by', 'result', 'last_error')
+
+
+# --- Perfis de requisição (profiler sob demanda) ---
+
+@admin.action(description="Baixar arquivo .prof (pstats / snakeviz)")
+def download_profile(modeladmin, request, queryset):
+    if queryset.count() != 1:
+        modeladmin.message_user(request, "Selecione um perfil por vez para baixar.", level='warning')
+        return None
+    profile = queryset.get()
+    response = HttpResponse(bytes(profile.profile_data), content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="perfil-{profile.request_id}.prof"'
+    return response
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'view_name', 'tenant_slug', 'status_code', 'duration_ms', 'db_queries', 'db_ms', 'user')
+    list_filter = ('view_name', 'tenant_slug')
+    search_fields = ('path', 'request_id', 'tenant_slug')
+    ordering = ('-created_at',)
+    actions = [download_profile]
+    exclude = ('profile_data',)
+    readonly_fields = (
+        'request_id', 'method', 'path', 'view_name', 'tenant_slug', 'user', 'status_code',
+        'duration_ms', 'db_queries', 'db_ms', 'summary', 'created_at',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description="Resumo (tempo acumulado)")
+    def summary(self, obj):
+        return format_html('<pre style="font-size: 12px">{}</pre>', obj.stats_text)
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class TenantsConfig(AppConfig):
     name = 'tenants'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Registra as tarefas da fila de jobs
+        from . import tasks  # noqa: F401
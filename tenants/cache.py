@@ -0,0 +1,221 @@
+"""
+Cache do cardápio por loja.
+
+O cardápio público é lido milhares de vezes para cada alteração feita pelo
+lojista. Em vez de refazer as consultas (categorias, produtos, adicionais,
+horários, taxas e conexão com o Mercado Pago) a cada acesso, montamos um
+"snapshot" já compilado e guardamos no cache, indexado por um contador de
+versão (menu_version).
+
+Toda escrita que altera o cardápio chama bump_menu_version(), o que faz o
+próximo acesso montar um snapshot novo. Snapshots antigos simplesmente
+expiram pelo timeout.
+"""
+import hashlib
+import json
+import math
+import time
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from .models import Category, Product, OperatingDay, TenantPaymentConfig
+from .perf import record_cache
+from .schedule import WeeklySchedule
+
+# Snapshots antigos ficam órfãos quando a versão muda; o timeout limpa o resto
+MENU_CACHE_TIMEOUT = 60 * 60 * 6
+
+
+def _menu_version_key(tenant_id):
+    return f'menu_version:{tenant_id}'
+
+
+def _menu_snapshot_key(tenant_id, version):
+    return f'menu_snapshot:{tenant_id}:{version}'
+
+
+def _weekly_schedule_key(tenant_id):
+    return f'weekly_schedule:{tenant_id}'
+
+
+def _store_status_key(slug):
+    return f'store_status:{slug}'
+
+
+def _new_version():
+    # Usa o relógio como base: se a chave de versão for descartada pelo cache,
+    # a nova versão nunca coincide com a de um snapshot antigo ainda guardado.
+    return int(time.time() * 1000)
+
+
+def get_menu_version(tenant_id):
+    """Retorna a versão atual do cardápio da loja (cria uma se não existir)."""
+    key = _menu_version_key(tenant_id)
+    version = cache.get(key)
+    record_cache('menu_version', version is not None)
+    if version is None:
+        version = _new_version()
+        cache.add(key, version, None)
+    return version
+
+
+def bump_menu_version(tenant_id):
+    """Invalida o snapshot do cardápio da loja. Chamar após qualquer escrita no cardápio."""
+    key = _menu_version_key(tenant_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Chave não existe (expirou ou nunca foi criada)
+        cache.set(key, _new_version(), None)
+
+
+def build_menu_snapshot(tenant):
+    """
+    Monta o snapshot do cardápio usando apenas tipos simples (dict/list) e o
+    WeeklySchedule compilado, para que possa ser serializado no cache e usado
+    direto no template.
+    """
+    produtos_ativos = Product.objects.filter(is_available=True).order_by('id').prefetch_related('options__items')
+    categories_qs = Category.objects.filter(
+        tenant=tenant,
+        products__is_available=True
+    ).prefetch_related(
+        Prefetch('products', queryset=produtos_ativos)
+    ).distinct().order_by('order')
+
+    categories = []
+    for cat in categories_qs:
+        products = []
+        for prod in cat.products.all():
+            options = []
+            for opt in prod.options.all():
+                options.append({
+                    'id': opt.id,
+                    'title': opt.title,
+                    'type': opt.type,
+                    'required': opt.required,
+                    'max_quantity': opt.max_quantity,
+                    'items': [
+                        {'id': item.id, 'name': item.name, 'price': item.price}
+                        for item in opt.items.all()
+                    ],
+                })
+
+            products.append({
+                'id': prod.id,
+                'name': prod.name,
+                'description': prod.description,
+                'price': prod.price,
+                'original_price': prod.original_price,
+                'badge': prod.badge,
+                'image_url': prod.image.url if prod.image else '',
+                'options': options,
+            })
+
+        categories.append({
+            'id': cat.id,
+            'name': cat.name,
+            'products': products,
+        })
+
+    # Horários (lista para o template + JSON para o JS)
+    schedule = []
+    schedule_data = {}
+    db_days = list(OperatingDay.objects.filter(tenant=tenant).order_by('day'))
+    for d in db_days:
+        schedule.append({
+            'day': d.day,
+            'day_display': d.get_day_display(),
+            'open_time': d.open_time,
+            'close_time': d.close_time,
+            'is_closed': d.is_closed,
+        })
+        schedule_data[d.day] = {
+            'open': d.open_time.strftime('%H:%M') if d.open_time else '00:00',
+            'close': d.close_time.strftime('%H:%M') if d.close_time else '00:00',
+            'closed': d.is_closed
+        }
+
+    delivery_fees = list(tenant.delivery_fees.values('neighborhood', 'fee'))
+
+    return {
+        'categories': categories,
+        # PIX online (Mercado Pago) só aparece se a loja conectou a conta
+        'accepts_online_pix': TenantPaymentConfig.objects.filter(tenant=tenant).exists(),
+        'schedule': schedule,
+        'schedule_json': json.dumps(schedule_data),
+        'weekly_schedule': WeeklySchedule.from_operating_days(db_days),
+        'delivery_fees': delivery_fees,
+        'delivery_fees_json': json.dumps(delivery_fees, default=float),
+    }
+
+
+def get_menu_snapshot(tenant):
+    """
+    Retorna o snapshot do cardápio da loja.
+    No caminho quente são 2 leituras de cache (versão + snapshot) e nenhuma consulta ao ORM.
+    """
+    version = get_menu_version(tenant.id)
+    key = _menu_snapshot_key(tenant.id, version)
+
+    snapshot = cache.get(key)
+    record_cache('menu_snapshot', snapshot is not None)
+    if snapshot is None:
+        snapshot = build_menu_snapshot(tenant)
+        cache.set(key, snapshot, MENU_CACHE_TIMEOUT)
+    return snapshot
+
+
+def get_weekly_schedule(tenant_id):
+    """
+    Retorna o WeeklySchedule compilado da loja (1 leitura de cache).
+    Só consulta os OperatingDay quando o cache está vazio.
+    """
+    key = _weekly_schedule_key(tenant_id)
+    schedule = cache.get(key)
+    record_cache('weekly_schedule', schedule is not None)
+    if schedule is None:
+        schedule = WeeklySchedule.from_operating_days(OperatingDay.objects.filter(tenant_id=tenant_id))
+        cache.set(key, schedule, MENU_CACHE_TIMEOUT)
+    return schedule
+
+
+def invalidate_weekly_schedule(tenant_id):
+    """Descarta o horário compilado. Chamar sempre que os OperatingDay da loja mudarem."""
+    cache.delete(_weekly_schedule_key(tenant_id))
+
+
+def get_store_status(slug):
+    """
+    Retorna o status público cacheado da loja ou None.
+    O valor é {'payload': {...}, 'etag': '...', 'expires_at': timestamp}.
+    """
+    entry = cache.get(_store_status_key(slug))
+    record_cache('store_status', entry is not None)
+    return entry
+
+
+def set_store_status(slug, payload, transition_at=None):
+    """
+    Guarda o status público da loja até a próxima transição de horário
+    (abre/fecha). Sem transição prevista, usa o timeout padrão do cardápio.
+    """
+    timeout = MENU_CACHE_TIMEOUT
+    if transition_at is not None:
+        seconds_left = math.ceil(transition_at.timestamp() - time.time())
+        timeout = min(max(seconds_left, 1), MENU_CACHE_TIMEOUT)
+
+    body = json.dumps(payload, sort_keys=True).encode()
+    entry = {
+        'payload': payload,
+        'etag': hashlib.md5(body).hexdigest(),
+        'expires_at': time.time() + timeout,
+    }
+    cache.set(_store_status_key(slug), entry, timeout)
+    return entry
+
+
+def invalidate_store_status(slug):
+    """Descarta o status público cacheado (fechamento manual, horários, etc)."""
+    cache.delete(_store_status_key(slug))
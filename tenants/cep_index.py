@@ -0,0 +1,216 @@
+"""
+Base local de CEPs: CEP -> bairro/cidade/UF sem API externa.
+
+O import_ceps lê um CSV (base dos Correios, CEP aberto etc.) e grava um
+arquivo binário compacto em CEP_INDEX_PATH:
+
+    cabeçalho   b'RMCEPIDX', versão, nº de faixas, nº de nomes   (<8sIII)
+    faixas      (cep_inicial, cep_final, id_do_nome) ordenadas   (<III cada)
+    offsets     nº de nomes + 1 posições no bloco de texto       (<I cada)
+    nomes       'BAIRRO\\tCIDADE\\tUF' em UTF-8, já normalizados
+
+Os processos abrem o arquivo com mmap (só leitura): a página fica no cache do
+sistema operacional e é compartilhada entre os workers, nada é lido por
+requisição. A busca é binária direto no mmap, O(log n).
+
+O comando troca o arquivo com os.replace (atômico); cada processo confere o
+arquivo no máximo a cada CEP_INDEX_CHECK_SECONDS e reabre se ele mudou.
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from .validators import neighborhood_key
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'RMCEPIDX'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIII')
+RANGE = struct.Struct('<III')
+OFFSET = struct.Struct('<I')
+
+# Intervalo mínimo entre as conferências do arquivo (troca pelo import_ceps)
+CEP_INDEX_CHECK_SECONDS = 30
+
+CepEntry = namedtuple('CepEntry', ['neighborhood', 'city', 'uf'])
+
+
+def name_key(neighborhood, city, uf):
+    """Nome gravado no índice: bairro e cidade com a mesma chave das taxas de entrega."""
+    return CepEntry(neighborhood_key(neighborhood), neighborhood_key(city), (uf or '').strip().upper())
+
+
+def compact_ranges(rows):
+    """
+    rows: iterável de (cep_inicial, cep_final, CepEntry).
+    Ordena e junta faixas vizinhas do mesmo bairro, inclusive por cima dos
+    buracos entre elas (CEP é geográfico: um CEP que falta entre dois do
+    mesmo bairro é desse bairro). Faixas que se sobrepõem com outro bairro
+    ficam com a primeira.
+
+    Retorna (faixas [(início, fim, id_do_nome)], nomes [CepEntry], conflitos).
+    """
+    names = []
+    name_ids = {}
+    ranges = []
+    conflicts = 0
+
+    for start, end, entry in sorted(rows, key=lambda row: (row[0], row[1])):
+        name_id = name_ids.get(entry)
+        if name_id is None:
+            name_id = name_ids[entry] = len(names)
+            names.append(entry)
+
+        if ranges:
+            last_start, last_end, last_id = ranges[-1]
+            if last_id == name_id:
+                ranges[-1] = (last_start, max(last_end, end), last_id)
+                continue
+            if start <= last_end:
+                if end <= last_end:
+                    conflicts += 1
+                    continue
+                start = last_end + 1
+        ranges.append((start, end, name_id))
+
+    return ranges, names, conflicts
+
+
+def write_index(path, ranges, names):
+    """Grava o índice em `path` de forma atômica (arquivo temporário + os.replace)."""
+    blob = bytearray()
+    offsets = []
+    for entry in names:
+        offsets.append(len(blob))
+        blob += '\t'.join(entry).encode('utf-8')
+    offsets.append(len(blob))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(ranges), len(names)))
+            for start, end, name_id in ranges:
+                f.write(RANGE.pack(start, end, name_id))
+            for offset in offsets:
+                f.write(OFFSET.pack(offset))
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class CepIndex:
+    """Índice aberto via mmap. lookup() é seguro entre threads (só leitura)."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mm) < HEADER.size:
+            raise ValueError(f'Índice de CEP truncado: {path}')
+        magic, version, self.range_count, self.name_count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f'Arquivo não é um índice de CEP (versão {FORMAT_VERSION}): {path}')
+
+        self._ranges_at = HEADER.size
+        self._offsets_at = self._ranges_at + self.range_count * RANGE.size
+        self._blob_at = self._offsets_at + (self.name_count + 1) * OFFSET.size
+        blob_size = OFFSET.unpack_from(self._mm, self._blob_at - OFFSET.size)[0]
+        if len(self._mm) < self._blob_at + blob_size:
+            raise ValueError(f'Índice de CEP truncado: {path}')
+        # Nomes já decodificados (um bairro é pedido muitas vezes)
+        self._names = {}
+
+    def __len__(self):
+        return self.range_count
+
+    def _range(self, position):
+        return RANGE.unpack_from(self._mm, self._ranges_at + position * RANGE.size)
+
+    def _name(self, name_id):
+        entry = self._names.get(name_id)
+        if entry is None:
+            start, end = struct.unpack_from('<II', self._mm, self._offsets_at + name_id * OFFSET.size)
+            text = self._mm[self._blob_at + start:self._blob_at + end].decode('utf-8')
+            entry = self._names[name_id] = CepEntry(*text.split('\t'))
+        return entry
+
+    def lookup(self, cep):
+        """CepEntry do CEP (int de 8 dígitos) ou None se está fora das faixas."""
+        # Última faixa com início <= cep
+        low, high = 0, self.range_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._range(middle)[0] <= cep:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return None
+        start, end, name_id = self._range(low - 1)
+        if cep > end:
+            return None
+        return self._name(name_id)
+
+
+_lock = threading.Lock()
+# (caminho, identificação do arquivo, CepIndex ou None)
+_loaded = None
+_next_check = 0.0
+
+
+def get_cep_index():
+    """CepIndex de CEP_INDEX_PATH (None se não configurado ou o arquivo não existe)."""
+    global _loaded, _next_check
+
+    path = getattr(settings, 'CEP_INDEX_PATH', '')
+    if not path:
+        return None
+    current = _loaded
+    if current is not None and current[0] == path and time.monotonic() < _next_check:
+        return current[2]
+
+    with _lock:
+        try:
+            stat = os.stat(path)
+            file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            file_id = None
+
+        current = _loaded
+        if current is None or current[0] != path or current[1] != file_id:
+            index = None
+            if file_id is not None:
+                try:
+                    index = CepIndex(path)
+                    logger.info(f'[CEP] Índice carregado: {path} ({len(index)} faixas)')
+                except (OSError, ValueError) as e:
+                    logger.error(f'[CEP] Erro ao abrir índice {path}: {e}')
+            # O mmap antigo não é fechado aqui: outra thread pode estar lendo; o GC fecha
+            _loaded = (path, file_id, index)
+        _next_check = time.monotonic() + CEP_INDEX_CHECK_SECONDS
+        return _loaded[2]
+
+
+def lookup_cep(cep):
+    """Bairro/cidade/UF do CEP ('58038-000' ou '58038000') pela base local, ou None."""
+    digits = ''.join(c for c in str(cep or '') if c.isdigit())
+    if len(digits) != 8:
+        return None
+    index = get_cep_index()
+    if index is None:
+        return None
+    return index.lookup(int(digits))
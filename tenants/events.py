@@ -0,0 +1,154 @@
+"""
+Avisos de pedidos novos/alterados para o painel do lojista (Server-Sent Events).
+
+O painel consultava api_get_orders a cada 5 segundos, mesmo sem nenhuma
+mudança. Agora ele abre um stream (api_orders_stream) e só recebe os pedidos
+que mudaram.
+
+- Toda escrita em pedido chama publish_order_change(order) (após o COMMIT).
+- Log de eventos no cache compartilhado: um contador por loja
+  (orders_seq:<loja>) e uma entrada por evento com o id do pedido. Funciona
+  entre processos/servidores com qualquer backend de cache (hoje é o
+  DatabaseCache, ou seja, o próprio banco).
+- OrderEventHub: dentro do mesmo processo, os streams abertos são acordados
+  na hora; os de outros processos percebem o evento na próxima checagem do
+  contador (STREAM_POLL_SECONDS).
+
+O stream precisa do servidor ASGI (rmpedidos/asgi.py). Sob WSGI a view
+responde 503 e o painel continua no polling.
+"""
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Eventos guardados por loja; cliente mais atrasado que isso recarrega a lista
+ORDER_EVENTS_LOG_SIZE = 200
+ORDER_EVENTS_TTL = 60 * 10
+# Cada conexão dura no máximo isso; o EventSource reconecta com Last-Event-ID
+STREAM_MAX_SECONDS = 55
+# Checagem do contador compartilhado (eventos publicados por outros processos)
+STREAM_POLL_SECONDS = 2
+# Comentário enviado para proxies não derrubarem a conexão ociosa
+STREAM_KEEPALIVE_SECONDS = 15
+
+
+def _seq_key(tenant_id):
+    return f'orders_seq:{tenant_id}'
+
+
+def _event_key(tenant_id, seq):
+    return f'orders_event:{tenant_id}:{seq}'
+
+
+def _new_seq():
+    # Mesma ideia do menu_version: se o contador sumir do cache, o novo
+    # começa acima de qualquer Last-Event-ID que um painel ainda tenha
+    return int(time.time() * 1000)
+
+
+class OrderEventHub:
+    """Acorda os streams abertos neste processo quando uma loja tem evento novo."""
+
+    def __init__(self):
+        self._waiters = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def listen(self, tenant_id):
+        """asyncio.Event sinalizado a cada notify(tenant_id). Usar dentro do event loop."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.setdefault(tenant_id, set()).add(waiter)
+        try:
+            yield waiter[1]
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(tenant_id)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[tenant_id]
+
+    def notify(self, tenant_id):
+        """Pode ser chamado de qualquer thread (views síncronas, workers)."""
+        with self._lock:
+            waiters = list(self._waiters.get(tenant_id, ()))
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Loop já encerrado: o listen() correspondente vai se remover
+                pass
+
+
+hub = OrderEventHub()
+
+
+def current_seq(tenant_id):
+    """Último evento publicado para a loja (0 se não há nenhum no cache)."""
+    return cache.get(_seq_key(tenant_id), 0)
+
+
+def ensure_seq(tenant_id):
+    """Como current_seq, mas cria o contador da loja se ainda não existe."""
+    key = _seq_key(tenant_id)
+    seq = cache.get(key)
+    if seq is None:
+        cache.add(key, _new_seq(), None)
+        seq = cache.get(key, 0)
+    return seq
+
+
+def _next_seq(tenant_id):
+    key = _seq_key(tenant_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Contador não existe (expirou ou nunca foi criado)
+        cache.add(key, _new_seq(), None)
+        return cache.incr(key)
+
+
+def _publish(tenant_id, order_id):
+    # O incr do DatabaseCache não é atômico: dois processos podem receber o
+    # mesmo número. O add() só grava se a entrada não existe, então quem
+    # perdeu a corrida pega o próximo.
+    try:
+        for _ in range(5):
+            seq = _next_seq(tenant_id)
+            if cache.add(_event_key(tenant_id, seq), order_id, ORDER_EVENTS_TTL):
+                break
+    except Exception as e:
+        # O pedido já foi gravado; na pior das hipóteses o painel vê na próxima recarga
+        logger.error(f'[EVENTS] Erro ao publicar pedido #{order_id} da loja {tenant_id}: {e}')
+    hub.notify(tenant_id)
+
+
+def publish_order_change(order):
+    """Avisa os painéis da loja que o pedido foi criado ou alterado (após o COMMIT)."""
+    tenant_id, order_id = order.tenant_id, order.id
+    transaction.on_commit(lambda: _publish(tenant_id, order_id))
+
+
+def changed_order_ids(tenant_id, after_seq, until_seq):
+    """
+    Ids dos pedidos alterados entre os eventos (after_seq, until_seq], sem
+    repetição. None se parte do log já foi descartada: o painel deve
+    recarregar a lista inteira.
+    """
+    if after_seq <= 0 or until_seq < after_seq or until_seq - after_seq > ORDER_EVENTS_LOG_SIZE:
+        return None
+
+    keys = [_event_key(tenant_id, seq) for seq in range(after_seq + 1, until_seq + 1)]
+    events = cache.get_many(keys)
+    if len(events) < len(keys):
+        return None
+
+    return list(dict.fromkeys(events[key] for key in keys))
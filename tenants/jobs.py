@@ -0,0 +1,258 @@
+"""
+Fila de tarefas em segundo plano, gravada no próprio banco (model Job).
+
+As views só chamam enqueue() e respondem na hora; push, email e chamadas ao
+Mercado Pago rodam no comando `manage.py run_workers`. Assim o tempo de
+resposta não depende de SMTP, web push nem da latência do MP.
+
+- Registro: @task('nome') em tenants/tasks.py
+- Enfileirar: enqueue('nome', {...}) (dentro de uma transação, o job só
+  fica visível para os workers depois do COMMIT)
+- Reserva: SELECT ... FOR UPDATE SKIP LOCKED no PostgreSQL; no SQLite (que
+  não tem FOR UPDATE) a reserva é garantida pelo UPDATE condicional
+- Falhas: nova tentativa com backoff exponencial; esgotadas as tentativas o
+  job fica com status 'failed' (dead letter) para análise no admin
+- Tarefas longas: report_progress()/heartbeat() renovam locked_at, para o job
+  não ser dado como travado enquanto ainda roda
+"""
+import logging
+import random
+import threading
+import traceback
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+# Backoff: 2s, 4s, 8s, 16s... limitado a 10 minutos (+ até 20% de variação)
+RETRY_BASE_SECONDS = 2
+RETRY_MAX_SECONDS = 60 * 10
+# Job 'running' sem sinal de vida (locked_at) há mais tempo que isso é de um
+# worker que morreu: volta para a fila, ou vai para dead letter se não tem mais tentativas
+STALE_LOCK_SECONDS = 60 * 15
+
+# nome -> TaskSpec
+TASKS = {}
+
+
+class TaskSpec:
+    def __init__(self, name, func, max_attempts, on_dead_letter, bind):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.on_dead_letter = on_dead_letter
+        self.bind = bind
+
+
+def task(name, max_attempts=DEFAULT_MAX_ATTEMPTS, on_dead_letter=None, bind=False):
+    """
+    Registra uma função como tarefa. Ela recebe o payload como kwargs e o
+    retorno (serializável em JSON) fica salvo em Job.result.
+    on_dead_letter(job) é chamado quando as tentativas se esgotam.
+    Com bind=True a função recebe o Job como primeiro argumento (para report_progress).
+    """
+    def decorator(func):
+        TASKS[name] = TaskSpec(name, func, max_attempts, on_dead_letter, bind)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, run_at=None, max_attempts=None):
+    """Grava um job na fila e retorna o Job criado."""
+    if name not in TASKS:
+        raise ValueError(f'Tarefa não registrada: {name}')
+
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or TASKS[name].max_attempts,
+    )
+
+
+def report_progress(job, data):
+    """
+    Grava um resultado parcial no job (ex: {'sent': 120, 'total': 5000}) enquanto ele roda.
+    Também serve de heartbeat (renova locked_at).
+    """
+    Job.objects.filter(pk=job.pk, status='running').update(result=data, locked_at=timezone.now())
+
+
+def heartbeat(job):
+    """Avisa que o job ainda está rodando (tarefas longas sem progresso para reportar)."""
+    Job.objects.filter(pk=job.pk, status='running').update(locked_at=timezone.now())
+
+
+def retry_delay(attempts):
+    """Segundos até a próxima tentativa, depois de `attempts` tentativas."""
+    delay = min(RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), RETRY_MAX_SECONDS)
+    return delay * (1 + random.random() * 0.2)
+
+
+def claim_jobs(worker_id, limit=1):
+    """
+    Reserva até `limit` jobs prontos para este worker.
+    Dois workers nunca recebem o mesmo job.
+    """
+    now = timezone.now()
+    claimed = []
+
+    with transaction.atomic():
+        # Job sem tentativas sobrando nunca é reservado de novo
+        candidates = Job.objects.filter(
+            status='pending', run_at__lte=now, attempts__lt=F('max_attempts'),
+        ).order_by('run_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+
+        for job in candidates[:limit]:
+            # UPDATE condicional: no PostgreSQL a linha já está travada; no
+            # SQLite é ele que impede dois workers de pegarem o mesmo job
+            updated = Job.objects.filter(pk=job.pk, status='pending').update(
+                status='running',
+                locked_at=now,
+                locked_by=worker_id,
+                attempts=job.attempts + 1,
+            )
+            if updated:
+                job.status = 'running'
+                job.locked_at = now
+                job.locked_by = worker_id
+                job.attempts += 1
+                claimed.append(job)
+
+    return claimed
+
+
+def _dead_letter_hook(job, spec):
+    if spec and spec.on_dead_letter:
+        try:
+            spec.on_dead_letter(job)
+        except Exception as hook_error:
+            logger.error(f'[JOBS] Erro no dead letter de {job.name} #{job.id}: {hook_error}')
+
+
+def release_stale_jobs():
+    """
+    Trata os jobs presos em 'running' por workers que morreram: com tentativas
+    sobrando voltam para a fila; sem (ex: push.broadcast, max_attempts=1) vão
+    para dead letter, para não repetir um envio que pode já ter acontecido.
+    """
+    now = timezone.now()
+    limit = now - timedelta(seconds=STALE_LOCK_SECONDS)
+    stale = Job.objects.filter(status='running', locked_at__lt=limit)
+
+    released = stale.filter(attempts__lt=F('max_attempts')).update(
+        status='pending', locked_at=None, locked_by=''
+    )
+    if released:
+        logger.warning(f'[JOBS] {released} job(s) travados devolvidos para a fila')
+
+    dead = []
+    for job in stale.filter(attempts__gte=F('max_attempts')):
+        # Condicional: o worker pode ter terminado (ou dado heartbeat) nesse meio tempo
+        updated = Job.objects.filter(pk=job.pk, status='running', locked_at=job.locked_at).update(
+            status='failed', finished_at=now, locked_at=None, locked_by='',
+            last_error=f'Worker {job.locked_by} parou de responder na tentativa {job.attempts}/{job.max_attempts}',
+        )
+        if updated:
+            job.status = 'failed'
+            dead.append(job)
+            logger.error(f'[JOBS] {job.name} #{job.id} travado sem tentativas sobrando, movido para dead letter')
+
+    for job in dead:
+        _dead_letter_hook(job, TASKS.get(job.name))
+    return released + len(dead)
+
+
+def run_job(job):
+    """Executa um job já reservado e grava o resultado (sucesso, nova tentativa ou dead letter)."""
+    spec = TASKS.get(job.name)
+
+    try:
+        if spec is None:
+            raise LookupError(f'Tarefa não registrada: {job.name}')
+        if spec.bind:
+            result = spec.func(job, **job.payload)
+        else:
+            result = spec.func(**job.payload)
+    except Exception as e:
+        error = ''.join(traceback.format_exception(type(e), e, e.__traceback__))
+
+        if job.attempts >= job.max_attempts or spec is None:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            logger.error(f'[JOBS] {job.name} #{job.id} falhou {job.attempts}x, movido para dead letter: {e}')
+        else:
+            job.status = 'pending'
+            job.run_at = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+            logger.warning(f'[JOBS] {job.name} #{job.id} falhou (tentativa {job.attempts}), nova tentativa agendada: {e}')
+
+        job.last_error = error[-5000:]
+        job.locked_at = None
+        job.locked_by = ''
+        job.save(update_fields=['status', 'run_at', 'finished_at', 'last_error', 'locked_at', 'locked_by'])
+
+        if job.status == 'failed':
+            _dead_letter_hook(job, spec)
+        return False
+
+    job.status = 'done'
+    job.result = result
+    job.finished_at = timezone.now()
+    job.locked_at = None
+    job.save(update_fields=['status', 'result', 'finished_at', 'locked_at'])
+    return True
+
+
+def run_pending(worker_id='inline', limit=100):
+    """
+    Executa na hora os jobs prontos (até `limit`), na thread atual.
+    Útil em testes e no comando run_workers --burst. Retorna quantos rodaram.
+    """
+    count = 0
+    while count < limit:
+        jobs = claim_jobs(worker_id, limit=1)
+        if not jobs:
+            break
+        run_job(jobs[0])
+        count += 1
+    return count
+
+
+class Worker(threading.Thread):
+    """Thread que fica buscando e executando jobs até stop_event ser sinalizado."""
+
+    def __init__(self, worker_id, stop_event, poll_interval=1.0, batch_size=1):
+        super().__init__(name=worker_id, daemon=True)
+        self.worker_id = worker_id
+        self.stop_event = stop_event
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+
+    def run(self):
+        logger.info(f'[JOBS] Worker {self.worker_id} iniciado')
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                try:
+                    jobs = claim_jobs(self.worker_id, limit=self.batch_size)
+                except Exception as e:
+                    logger.error(f'[JOBS] Worker {self.worker_id}: erro ao buscar jobs: {e}')
+                    jobs = []
+
+                for job in jobs:
+                    run_job(job)
+
+                if not jobs:
+                    # Fila vazia: espera um pouco (acorda antes se pedirem para parar)
+                    self.stop_event.wait(self.poll_interval)
+        finally:
+            connection.close()
+            logger.info(f'[JOBS] Worker {self.worker_id} finalizado')
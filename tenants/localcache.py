@@ -0,0 +1,61 @@
+"""
+Cache LRU local (em memória, por processo).
+
+Usado para dados pequenos e muito lidos que não valem uma ida ao cache do
+Django (que aqui é o próprio banco). Cada processo tem a sua cópia: a
+invalidação por sinal só alcança o processo atual, então toda entrada tem um
+TTL curto para que os outros workers também enxerguem as mudanças.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from .perf import record_cache
+
+
+class LocalLRUCache:
+    """
+    LRU limitado com TTL por entrada. Também guarda None (cache negativo),
+    com um TTL próprio, para não repetir consultas de chaves inexistentes.
+    """
+
+    def __init__(self, max_size, ttl, negative_ttl=None, name='local'):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retorna (encontrado_no_cache, valor)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        record_cache(self.name, entry is not None)
+        if entry is None:
+            return False, None
+        return True, entry[0]
+
+    def set(self, key, value):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, predicate):
+        """Remove as entradas para as quais predicate(chave, valor) é verdadeiro."""
+        with self._lock:
+            stale = [key for key, (value, _) in self._entries.items() if predicate(key, value)]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
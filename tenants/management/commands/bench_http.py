@@ -0,0 +1,342 @@
+import json
+import math
+import platform
+import random
+import subprocess
+import threading
+import time
+from contextlib import ExitStack
+from unittest import mock
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from tenants import views
+from tenants.models import Coupon, DeliveryFee, Job, Order, Product, Tenant
+
+# Ordem em que os cenários rodam (e aparecem no relatório)
+SCENARIOS = [
+    'cardapio_publico',
+    'api_public_store_status',
+    'api_get_products',
+    'api_get_orders',
+    'api_validate_coupon',
+    'create_order',
+]
+# Produtos sorteados por carrinho no create_order
+CART_MIN_ITEMS = 1
+CART_MAX_ITEMS = 5
+# Cenários que precisam do dono da loja logado
+OWNER_SCENARIOS = frozenset({'api_get_products', 'api_get_orders'})
+
+
+def percentile(sorted_values, pct):
+    """Percentil pelo método nearest-rank (valores já ordenados)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+class BenchContext:
+    """Dados da loja usados para montar as requisições (carregados uma vez, antes da medição)."""
+
+    def __init__(self, tenant, host):
+        self.tenant = tenant
+        self.host = host
+        self.product_ids = list(
+            Product.objects.filter(tenant=tenant, is_available=True).order_by('id').values_list('id', flat=True)[:500]
+        )
+        if not self.product_ids:
+            raise CommandError(f'A loja "{tenant.slug}" não tem produtos disponíveis. Rode o seed_load antes.')
+        self.neighborhoods = list(
+            DeliveryFee.objects.filter(tenant=tenant).order_by('id').values_list('neighborhood', flat=True)
+        ) or ['CENTRO']
+        self.coupon_code = (
+            Coupon.objects.filter(tenant=tenant, is_active=True).order_by('id').values_list('code', flat=True).first()
+            or 'BENCH'
+        )
+
+
+def build_request(scenario, ctx, rng):
+    """(método, url, kwargs do Client) de uma requisição do cenário."""
+    slug = ctx.tenant.slug
+
+    if scenario == 'cardapio_publico':
+        return 'get', reverse('cardapio_publico', kwargs={'slug': slug}), {}
+    if scenario == 'api_public_store_status':
+        return 'get', reverse('api_public_store_status', kwargs={'slug': slug}), {}
+    if scenario == 'api_get_products':
+        return 'get', reverse('api_get_products', kwargs={'slug': slug}), {}
+    if scenario == 'api_get_orders':
+        return 'get', reverse('api_get_orders', kwargs={'slug': slug}), {}
+    if scenario == 'api_validate_coupon':
+        body = {'code': ctx.coupon_code, 'order_value': rng.randint(30, 150)}
+        return 'post', reverse('api_validate_coupon', kwargs={'slug': slug}), {
+            'data': json.dumps(body), 'content_type': 'application/json',
+        }
+    if scenario == 'create_order':
+        count = rng.randint(CART_MIN_ITEMS, min(CART_MAX_ITEMS, len(ctx.product_ids)))
+        items = [
+            {'id': product_id, 'qtd': rng.randint(1, 3), 'obs': '', 'options': []}
+            for product_id in rng.sample(ctx.product_ids, count)
+        ]
+        body = {
+            'nome': 'Cliente Benchmark',
+            'phone': f'8399{rng.randint(0, 9_999_999):07d}',
+            'order_type': 'delivery',
+            'method': 'dinheiro',
+            'address': {
+                'cep': '58000000', 'street': 'Rua do Teste', 'number': str(rng.randint(1, 999)),
+                'neighborhood': rng.choice(ctx.neighborhoods),
+            },
+            'items': items,
+        }
+        return 'post', reverse('api_create_order', kwargs={'slug': slug}), {
+            'data': json.dumps(body), 'content_type': 'application/json',
+        }
+    raise CommandError(f'Cenário desconhecido: {scenario}')
+
+
+def _always_open(original):
+    # Roda a checagem de horário de verdade (mesmas queries), mas ignora o
+    # resultado: o benchmark dá o mesmo resultado a qualquer hora do dia
+    def wrapper(*args, **kwargs):
+        _, message = original(*args, **kwargs)
+        return True, message
+    return wrapper
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark HTTP das views mais quentes (cardápio, status da loja, produtos, '
+        'pedidos, cupom e checkout) com o test client do Django e N workers em paralelo. '
+        'Mercado Pago, push e email ficam mockados. Resultado em JSON (--output).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', default='load-00000', help='Slug da loja. Padrão: load-00000 (maior loja do seed_load)')
+        parser.add_argument('--requests', type=int, default=200, help='Requisições medidas por cenário. Padrão: 200')
+        parser.add_argument('--concurrency', type=int, default=4, help='Workers (threads) simultâneos. Padrão: 4')
+        parser.add_argument('--warmup', type=int, default=10, help='Requisições descartadas por cenário antes de medir. Padrão: 10')
+        parser.add_argument(
+            '--scenarios', default=','.join(SCENARIOS),
+            help=f'Cenários separados por vírgula. Padrão: todos ({", ".join(SCENARIOS)})'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Semente dos carrinhos/cupons sorteados. Padrão: 42')
+        parser.add_argument('--host', default='localhost', help='Cabeçalho Host das requisições. Padrão: localhost')
+        parser.add_argument('--output', help='Arquivo JSON com o resultado')
+        parser.add_argument('--compare', help='JSON de uma execução anterior para comparar p95 e queries')
+        parser.add_argument(
+            '--keep-orders', action='store_true',
+            help='Não apaga os pedidos e jobs criados pelo create_order no final'
+        )
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Cenário(s) desconhecido(s): {", ".join(sorted(unknown))}')
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests e --concurrency precisam ser pelo menos 1')
+
+        tenant = Tenant.objects.select_related('owner').filter(slug=options['tenant']).first()
+        if tenant is None:
+            raise CommandError(f'Loja "{options["tenant"]}" não encontrada. Gere dados com: manage.py seed_load')
+
+        ctx = BenchContext(tenant, options['host'])
+        last_order_id = Order.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        last_job_id = Job.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+        report = {
+            'meta': {
+                'started_at': timezone.now().isoformat(),
+                'git': git_revision(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'cache': settings.CACHES['default']['BACKEND'],
+                'tenant': tenant.slug,
+                'products': len(ctx.product_ids),
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'warmup': options['warmup'],
+                'seed': options['seed'],
+            },
+            'results': {},
+        }
+
+        try:
+            with ExitStack() as stack:
+                # Nada sai da máquina: MP, push e email mockados; rate limit
+                # desligado para o checkout não virar uma sequência de 429
+                stack.enter_context(mock.patch('mercadopago.SDK'))
+                stack.enter_context(mock.patch('tenants.push.webpush'))
+                stack.enter_context(mock.patch.object(
+                    views, 'is_store_open_by_hours', _always_open(views.is_store_open_by_hours)
+                ))
+                stack.enter_context(override_settings(
+                    RATELIMIT_ENABLE=False,
+                    SECURE_SSL_REDIRECT=False,
+                    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                ))
+
+                for scenario in scenarios:
+                    result = self.run_scenario(scenario, ctx, options)
+                    report['results'][scenario] = result
+                    self.print_result(scenario, result)
+        finally:
+            if not options['keep_orders']:
+                self.cleanup(tenant, last_order_id, last_job_id)
+
+        report['meta']['finished_at'] = timezone.now().isoformat()
+
+        if options['compare']:
+            self.print_comparison(report, options['compare'])
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f'Resultado gravado em {options["output"]}'))
+
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+
+    def make_client(self, scenario, ctx):
+        client = Client(HTTP_HOST=ctx.host)
+        if scenario in OWNER_SCENARIOS:
+            client.force_login(ctx.tenant.owner)
+        return client
+
+    def run_requests(self, scenario, ctx, count, rng, samples, errors):
+        """Faz `count` requisições na thread atual, anotando (ms, queries, status)."""
+        client = self.make_client(scenario, ctx)
+        for _ in range(count):
+            method, url, kwargs = build_request(scenario, ctx, rng)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                try:
+                    response = getattr(client, method)(url, **kwargs)
+                    status = response.status_code
+                except Exception as e:
+                    status = 'exception'
+                    errors.append(f'{type(e).__name__}: {e}')
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            samples.append((elapsed_ms, len(queries.captured_queries), status))
+
+    def run_scenario(self, scenario, ctx, options):
+        seed = options['seed']
+        concurrency = options['concurrency']
+
+        if options['warmup']:
+            self.run_requests(scenario, ctx, options['warmup'], random.Random(f'{seed}-warmup'), [], [])
+
+        total = options['requests']
+        shares = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+        samples, errors = [], []
+
+        def worker(index):
+            try:
+                self.run_requests(scenario, ctx, shares[index], random.Random(f'{seed}-{index}'), samples, errors)
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        if concurrency == 1:
+            self.run_requests(scenario, ctx, total, random.Random(f'{seed}-0'), samples, errors)
+        else:
+            threads = [
+                threading.Thread(target=worker, args=(i,), name=f'bench-{i}')
+                for i in range(concurrency) if shares[i]
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        wall = time.perf_counter() - started
+
+        latencies = sorted(sample[0] for sample in samples)
+        queries = [sample[1] for sample in samples]
+        statuses = {}
+        for _, _, status in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for _, _, status in samples if status == 'exception' or status >= 400),
+            'status_codes': statuses,
+            'wall_seconds': round(wall, 3),
+            'throughput_rps': round(len(samples) / wall, 1) if wall else 0.0,
+            'latency_ms': {
+                'min': round(latencies[0], 2) if latencies else 0.0,
+                'mean': round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+                'p50': round(percentile(latencies, 50), 2),
+                'p95': round(percentile(latencies, 95), 2),
+                'p99': round(percentile(latencies, 99), 2),
+                'max': round(latencies[-1], 2) if latencies else 0.0,
+            },
+            'queries': {
+                'mean': round(sum(queries) / len(queries), 2) if queries else 0.0,
+                'max': max(queries, default=0),
+            },
+            'exceptions': errors[:5],
+        }
+
+    def cleanup(self, tenant, last_order_id, last_job_id):
+        deleted, _ = Order.objects.filter(tenant=tenant, id__gt=last_order_id).delete()
+        Job.objects.filter(id__gt=last_job_id).delete()
+        if deleted:
+            self.stdout.write(f'Pedidos criados pelo benchmark apagados ({deleted} linhas).')
+
+    # ------------------------------------------------------------------
+    # Relatório
+    # ------------------------------------------------------------------
+
+    def print_result(self, scenario, result):
+        latency = result['latency_ms']
+        line = (
+            f'{scenario:<26} {result["requests"]:>5} req  {result["throughput_rps"]:>8.1f} req/s  '
+            f'p50 {latency["p50"]:>8.2f}ms  p95 {latency["p95"]:>8.2f}ms  p99 {latency["p99"]:>8.2f}ms  '
+            f'{result["queries"]["mean"]:>5.1f} queries'
+        )
+        if result['errors']:
+            self.stdout.write(self.style.WARNING(f'{line}  ({result["errors"]} erros: {result["status_codes"]})'))
+        else:
+            self.stdout.write(line)
+
+    def print_comparison(self, report, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Não foi possível ler {path}: {e}')
+
+        self.stdout.write(f'\nComparação com {path} (git {baseline.get("meta", {}).get("git") or "?"}):')
+        for scenario, result in report['results'].items():
+            before = baseline.get('results', {}).get(scenario)
+            if not before:
+                continue
+            p95_before, p95_after = before['latency_ms']['p95'], result['latency_ms']['p95']
+            change = (p95_after - p95_before) / p95_before * 100 if p95_before else 0.0
+            self.stdout.write(
+                f'{scenario:<26} p95 {p95_before:>8.2f} -> {p95_after:>8.2f}ms ({change:+.1f}%)  '
+                f'queries {before["queries"]["mean"]:.1f} -> {result["queries"]["mean"]:.1f}'
+            )
@@ -0,0 +1,105 @@
+import math
+import pickle
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tenants.models import Tenant
+from tenants.zones import Zone, ZoneIndex, get_zone_index
+
+# Centro das zonas sintéticas (João Pessoa) e lado da área coberta
+CENTER = (-7.115, -34.863)
+AREA_KM = 20.0
+KM_PER_DEGREE = 111.0
+
+
+def synthetic_zones(count, rng):
+    """Metade círculos, metade polígonos (6 a 10 vértices), espalhados pela cidade."""
+    zones = []
+    half = AREA_KM / 2 / KM_PER_DEGREE
+    for zone_id in range(count):
+        lat = CENTER[0] + rng.uniform(-half, half)
+        lng = CENTER[1] + rng.uniform(-half, half)
+        radius_km = rng.uniform(0.3, 2.0)
+        fee = round(rng.uniform(3, 15), 2)
+        priority = rng.choice([0, 0, 0, 1])
+        if zone_id % 2:
+            zones.append(Zone(zone_id, f'Raio {zone_id}', fee, priority, 'radius', [[lat, lng]], radius_km))
+            continue
+        sides = rng.randint(6, 10)
+        points = []
+        for side in range(sides):
+            angle = 2 * math.pi * side / sides
+            distance = radius_km * rng.uniform(0.6, 1.0) / KM_PER_DEGREE
+            points.append([lat + distance * math.sin(angle), lng + distance * math.cos(angle)])
+        zones.append(Zone(zone_id, f'Polígono {zone_id}', fee, priority, 'polygon', points))
+    return zones
+
+
+def random_points(count, rng):
+    # Um pouco além da área das zonas, para medir também os pontos fora de todas
+    half = AREA_KM * 0.6 / KM_PER_DEGREE
+    return [(CENTER[0] + rng.uniform(-half, half), CENTER[1] + rng.uniform(-half, half)) for _ in range(count)]
+
+
+def time_lookups(lookup, points):
+    started = time.perf_counter()
+    results = [lookup(lat, lng) for lat, lng in points]
+    return (time.perf_counter() - started) / len(points) * 1e6, results
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a busca de zonas de entrega (lat/lng -> zona) com a grade do '
+        'ZoneIndex contra o teste zona a zona. Usa zonas sintéticas, ou as da '
+        'loja passada em --tenant.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--zones', type=int, default=500, help='Zonas sintéticas (padrão: 500)')
+        parser.add_argument('--lookups', type=int, default=20000, help='Buscas por medição (padrão: 20000)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--tenant', help='Slug da loja para medir as zonas reais (ignora --zones)')
+
+    def handle(self, *args, **options):
+        if options['zones'] < 1 or options['lookups'] < 1:
+            raise CommandError('--zones e --lookups precisam ser pelo menos 1')
+        rng = random.Random(options['seed'])
+
+        started = time.perf_counter()
+        if options['tenant']:
+            tenant_id = Tenant.objects.filter(slug=options['tenant']).values_list('id', flat=True).first()
+            if tenant_id is None:
+                raise CommandError(f'Loja "{options["tenant"]}" não encontrada.')
+            index = get_zone_index(tenant_id)
+            if not len(index):
+                raise CommandError(f'A loja "{options["tenant"]}" não tem zonas de entrega ativas.')
+            min_lat, min_lng, max_lat, max_lng = index.bounds
+            points = [
+                (rng.uniform(min_lat, max_lat), rng.uniform(min_lng, max_lng))
+                for _ in range(options['lookups'])
+            ]
+        else:
+            index = ZoneIndex(synthetic_zones(options['zones'], rng))
+            points = random_points(options['lookups'], rng)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        cells = len(index.cells)
+        per_cell = sum(len(positions) for positions in index.cells.values()) / max(cells, 1)
+        grid_us, grid_results = time_lookups(index.lookup, points)
+        linear_us, linear_results = time_lookups(index.lookup_linear, points)
+        if grid_results != linear_results:
+            raise CommandError('A grade e a busca linear discordaram; o índice está incorreto.')
+        hits = sum(1 for result in grid_results if result is not None)
+
+        self.stdout.write(
+            f'{len(index)} zona(s), grade {index.size}x{index.size} ({cells} células usadas, '
+            f'{per_cell:.1f} zonas/célula), montado em {build_ms:.1f}ms, '
+            f'{len(pickle.dumps(index)) / 1024:.0f} KB no cache.'
+        )
+        self.stdout.write(f'{len(points)} busca(s), {hits / len(points):.0%} dentro de alguma zona.')
+        self.stdout.write(self.style.SUCCESS(
+            f'grade:  {grid_us:8.2f} µs/busca\n'
+            f'linear: {linear_us:8.2f} µs/busca  ({linear_us / max(grid_us, 1e-9):.0f}x mais lento)'
+        ))
@@ -0,0 +1,112 @@
+import csv
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tenants.cep_index import CepIndex, compact_ranges, name_key, write_index
+
+# Nomes de coluna aceitos no CSV (cabeçalho sem diferenciar maiúsculas)
+CEP_COLUMNS = ('cep',)
+CEP_START_COLUMNS = ('cep_inicial', 'cep_inicio', 'cep_ini')
+CEP_END_COLUMNS = ('cep_final', 'cep_fim')
+NEIGHBORHOOD_COLUMNS = ('bairro', 'neighborhood')
+CITY_COLUMNS = ('cidade', 'localidade', 'municipio', 'city')
+UF_COLUMNS = ('uf', 'estado', 'state')
+
+
+def _column(header, names, required=True):
+    for name in names:
+        if name in header:
+            return header[name]
+    if required:
+        raise CommandError(f'Coluna obrigatória ausente no CSV (uma de: {", ".join(names)})')
+    return None
+
+
+def _cep(value):
+    digits = ''.join(c for c in (value or '') if c.isdigit())
+    if len(digits) != 8 or digits == '00000000':
+        return None
+    return int(digits)
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera o índice local de CEPs (CEP -> bairro/cidade/UF) a partir de um CSV. '
+        'Colunas: cep (ou cep_inicial e cep_final), bairro, cidade, uf. '
+        'O arquivo em CEP_INDEX_PATH é trocado de forma atômica; os workers '
+        'passam a usar o novo em até 30 segundos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Arquivo CSV com a base de CEPs')
+        parser.add_argument('--output', help='Caminho do índice (padrão: CEP_INDEX_PATH)')
+        parser.add_argument('--delimiter', help='Separador do CSV (padrão: detecta ; ou ,)')
+        parser.add_argument('--encoding', default='utf-8', help='Codificação do CSV (padrão: utf-8)')
+
+    def handle(self, *args, **options):
+        output = options['output'] or getattr(settings, 'CEP_INDEX_PATH', '')
+        if not output:
+            raise CommandError('Informe --output ou configure CEP_INDEX_PATH.')
+
+        started = time.perf_counter()
+        try:
+            with open(options['source'], newline='', encoding=options['encoding']) as f:
+                delimiter = options['delimiter'] or (';' if ';' in f.readline() else ',')
+                f.seek(0)
+                rows, skipped = self.read_rows(csv.reader(f, delimiter=delimiter))
+        except (OSError, UnicodeDecodeError) as e:
+            raise CommandError(f'Não foi possível ler {options["source"]}: {e}')
+
+        if not rows:
+            raise CommandError('Nenhum CEP válido no arquivo; o índice atual foi mantido.')
+
+        ranges, names, conflicts = compact_ranges(rows)
+        try:
+            write_index(output, ranges, names)
+            # Confere o arquivo gravado antes de dar como pronto
+            CepIndex(output)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Erro ao gravar o índice {output}: {e}')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{len(rows)} linha(s) lida(s), {skipped} ignorada(s), {conflicts} faixa(s) em conflito descartada(s).'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Índice gravado em {output}: {len(ranges)} faixa(s), {len(names)} bairro(s), '
+            f'{os.path.getsize(output) / 1024:.0f} KB em {elapsed:.1f}s.'
+        ))
+
+    def read_rows(self, reader):
+        try:
+            header = {name.strip().lower(): position for position, name in enumerate(next(reader))}
+        except StopIteration:
+            raise CommandError('CSV vazio.')
+
+        cep_col = _column(header, CEP_COLUMNS, required=False)
+        start_col = _column(header, CEP_START_COLUMNS, required=cep_col is None)
+        end_col = _column(header, CEP_END_COLUMNS, required=cep_col is None)
+        neighborhood_col = _column(header, NEIGHBORHOOD_COLUMNS)
+        city_col = _column(header, CITY_COLUMNS)
+        uf_col = _column(header, UF_COLUMNS)
+
+        rows = []
+        skipped = 0
+        for line in reader:
+            try:
+                if cep_col is not None:
+                    start = end = _cep(line[cep_col])
+                else:
+                    start, end = _cep(line[start_col]), _cep(line[end_col])
+                entry = name_key(line[neighborhood_col], line[city_col], line[uf_col])
+            except IndexError:
+                skipped += 1
+                continue
+            if start is None or end is None or end < start or not entry.neighborhood:
+                skipped += 1
+                continue
+            rows.append((start, end, entry))
+        return rows, skipped
@@ -0,0 +1,67 @@
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from tenants.jobs import Worker, release_stale_jobs, run_pending
+
+# De quanto em quanto tempo procurar jobs presos por workers que morreram
+STALE_CHECK_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Executa os workers da fila de jobs (push, email, Mercado Pago).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Quantidade de workers (threads). Padrão: 4')
+        parser.add_argument('--poll', type=float, default=1.0, help='Espera (segundos) quando a fila está vazia. Padrão: 1')
+        parser.add_argument('--batch', type=int, default=1, help='Jobs reservados por vez por worker. Padrão: 1')
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Executa o que estiver pronto na fila e sai (útil em testes/cron)'
+        )
+
+    def handle(self, *args, **options):
+        if options['burst']:
+            release_stale_jobs()
+            count = run_pending(worker_id='burst', limit=10_000)
+            self.stdout.write(self.style.SUCCESS(f'{count} job(s) executado(s).'))
+            return
+
+        stop_event = threading.Event()
+
+        def _stop(signum, frame):
+            self.stdout.write('Finalizando workers...')
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, _stop)
+        signal.signal(signal.SIGTERM, _stop)
+
+        workers = [
+            Worker(
+                f'worker-{i + 1}',
+                stop_event,
+                poll_interval=options['poll'],
+                batch_size=options['batch'],
+            )
+            for i in range(max(options['threads'], 1))
+        ]
+        for worker in workers:
+            worker.start()
+
+        self.stdout.write(self.style.SUCCESS(f'{len(workers)} worker(s) rodando. Ctrl+C para parar.'))
+
+        last_stale_check = 0
+        while not stop_event.is_set():
+            if time.monotonic() - last_stale_check >= STALE_CHECK_INTERVAL:
+                try:
+                    release_stale_jobs()
+                except Exception as e:
+                    self.stderr.write(f'Erro ao liberar jobs travados: {e}')
+                last_stale_check = time.monotonic()
+            stop_event.wait(1)
+
+        for worker in workers:
+            worker.join()
+        self.stdout.write(self.style.SUCCESS('Workers finalizados.'))
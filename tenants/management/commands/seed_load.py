@@ -0,0 +1,392 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import time as dtime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from tenants.models import (
+    Category,
+    Coupon,
+    CouponUsage,
+    DeliveryFee,
+    OperatingDay,
+    OptionItem,
+    Order,
+    OrderItem,
+    Product,
+    ProductOption,
+    PushSubscription,
+    Table,
+    Tenant,
+)
+from tenants.validators import neighborhood_key
+
+FIRST_NAMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Eduarda', 'Felipe', 'Gabriela', 'Heitor', 'Isabela', 'João', 'Larissa', 'Mateus']
+LAST_NAMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Almeida']
+NEIGHBORHOODS = ['CENTRO', 'MANAÍRA', 'TAMBAÚ', 'BESSA', 'BANCÁRIOS', 'MANGABEIRA', 'TORRE', 'JAGUARIBE', 'CRISTO', 'ALTIPLANO', 'VALENTINA', 'CABO BRANCO']
+CATEGORY_NAMES = ['Lanches', 'Pizzas', 'Bebidas', 'Porções', 'Sobremesas', 'Combos', 'Pratos', 'Açaí']
+OPTION_TITLES = ['Adicionais', 'Ponto da carne', 'Molhos', 'Tamanho', 'Borda']
+PAYMENT_METHODS = ['pix', 'dinheiro', 'cartao']
+ORDER_TYPES = ['delivery'] * 12 + ['pickup'] * 5 + ['table'] * 3
+TABLES_PER_TENANT = 5
+COUPONS_PER_TENANT = 3
+# Fração dos pedidos que usou cupom
+COUPON_RATE = 0.1
+
+
+def skewed_split(total, count, skew, minimum=0):
+    """
+    Divide `total` entre `count` lojas seguindo uma lei de potência (Zipf):
+    a loja de posição i recebe peso 1/(i+1)^skew. skew=0 divide igualmente;
+    quanto maior, mais concentrado nas primeiras lojas.
+    """
+    if count <= 0:
+        return []
+    minimum = min(minimum, total // count)
+    weights = [1 / (rank + 1) ** skew for rank in range(count)]
+    total_weight = sum(weights)
+    remaining = total - minimum * count
+    shares = [minimum + int(remaining * weight / total_weight) for weight in weights]
+    # O que sobrou do arredondamento vai para a maior loja
+    shares[0] += total - sum(shares)
+    return shares
+
+
+@contextmanager
+def manual_timestamps(*fields):
+    """Desliga auto_now/auto_now_add para gravar datas do passado no bulk_create."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera dados sintéticos em volume (lojas, cardápios, pedidos, inscrições push '
+        'e usos de cupom) para benchmarks. Determinístico para a mesma --seed '
+        '(as datas dos pedidos são relativas ao momento da execução).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenants', type=int, default=1000, help='Quantidade de lojas. Padrão: 1000')
+        parser.add_argument('--products', type=int, default=50_000, help='Total de produtos (somando todas as lojas). Padrão: 50000')
+        parser.add_argument('--options', type=int, default=2, help='Grupos de adicionais por produto. Padrão: 2')
+        parser.add_argument('--option-items', type=int, default=4, help='Itens por grupo de adicionais. Padrão: 4')
+        parser.add_argument('--orders', type=int, default=1_000_000, help='Total de pedidos. Padrão: 1000000')
+        parser.add_argument('--max-items', type=int, default=5, help='Máximo de itens por pedido (mínimo 1). Padrão: 5')
+        parser.add_argument('--days', type=int, default=180, help='Profundidade do histórico de pedidos, em dias. Padrão: 180')
+        parser.add_argument('--subscriptions', type=int, default=100_000, help='Total de inscrições push. Padrão: 100000')
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Concentração (Zipf) de produtos/pedidos/inscrições nas maiores lojas. 0 = uniforme. Padrão: 1.1'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório. Padrão: 42')
+        parser.add_argument('--chunk', type=int, default=5000, help='Linhas por bulk_create/transação. Padrão: 5000')
+        parser.add_argument('--prefix', default='load', help='Prefixo dos slugs/usuários gerados. Padrão: load')
+        parser.add_argument('--database', default='default', help='Alias do banco (settings.DATABASES). Padrão: default')
+        parser.add_argument('--reset', action='store_true', help='Apaga antes os dados gerados com o mesmo prefixo')
+
+    def handle(self, *args, **options):
+        if options['tenants'] < 1:
+            raise CommandError('--tenants precisa ser pelo menos 1')
+        if options['max_items'] < 1:
+            raise CommandError('--max-items precisa ser pelo menos 1')
+
+        self.db = options['database']
+        self.chunk = max(options['chunk'], 1)
+        self.prefix = options['prefix']
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        started = time.monotonic()
+
+        if options['reset']:
+            self.reset()
+        elif Tenant.objects.using(self.db).filter(slug__startswith=f'{self.prefix}-').exists():
+            raise CommandError(f'Já existem lojas "{self.prefix}-*". Use --reset ou outro --prefix.')
+
+        count, skew = options['tenants'], options['skew']
+        tenants = self.create_tenants(count)
+        menus = self.create_menus(tenants, skewed_split(options['products'], count, skew, minimum=1), options)
+        self.create_orders(tenants, menus, skewed_split(options['orders'], count, skew), options)
+        self.create_subscriptions(tenants, skewed_split(options['subscriptions'], count, skew))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Concluído em {elapsed:.1f}s.'))
+        biggest = ', '.join(f'{t.slug} ({len(menus[t.id][0])} produtos)' for t in tenants[:3])
+        self.stdout.write(f'Maiores lojas: {biggest}')
+
+    # ------------------------------------------------------------------
+    # Utilitários
+    # ------------------------------------------------------------------
+
+    def bulk(self, model, objs):
+        """bulk_create em lotes de --chunk, cada lote na sua transação."""
+        created = []
+        for start in range(0, len(objs), self.chunk):
+            with transaction.atomic(using=self.db):
+                created.extend(model.objects.using(self.db).bulk_create(objs[start:start + self.chunk]))
+        return created
+
+    def progress(self, label, done, total, started):
+        rate = done / max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f'  {label}: {done}/{total} ({rate:,.0f}/s)')
+
+    def reset(self):
+        self.stdout.write(f'Apagando dados "{self.prefix}-*"...')
+        with transaction.atomic(using=self.db):
+            Tenant.objects.using(self.db).filter(slug__startswith=f'{self.prefix}-').delete()
+            User.objects.using(self.db).filter(username__startswith=f'{self.prefix}-').delete()
+
+    # ------------------------------------------------------------------
+    # Lojas
+    # ------------------------------------------------------------------
+
+    def create_tenants(self, count):
+        started = time.monotonic()
+        users = self.bulk(User, [
+            # '!' = senha inutilizável (ninguém loga com esses usuários)
+            User(username=f'{self.prefix}-{i:05d}', email=f'{self.prefix}-{i:05d}@load.local', password='!')
+            for i in range(count)
+        ])
+        tenants = self.bulk(Tenant, [
+            Tenant(
+                name=f'Loja Carga {i:05d}',
+                slug=f'{self.prefix}-{i:05d}',
+                owner=user,
+                phone_whatsapp=f'8399{i:07d}',
+                plan_type='pro' if i % 3 == 0 else 'starter',
+            )
+            for i, user in enumerate(users)
+        ])
+
+        self.bulk(OperatingDay, [
+            OperatingDay(tenant=tenant, day=day, open_time=dtime(10, 0), close_time=dtime(23, 30))
+            for tenant in tenants for day in range(7)
+        ])
+        self.bulk(Table, [
+            Table(tenant=tenant, number=n + 1) for tenant in tenants for n in range(TABLES_PER_TENANT)
+        ])
+
+        fees = []
+        for tenant in tenants:
+            for neighborhood in self.rng.sample(NEIGHBORHOODS, self.rng.randint(3, len(NEIGHBORHOODS))):
+                fees.append(DeliveryFee(
+                    tenant=tenant, neighborhood=neighborhood, neighborhood_key=neighborhood_key(neighborhood),
+                    fee=Decimal(self.rng.randint(3, 12)),
+                ))
+        self.bulk(DeliveryFee, fees)
+
+        self.bulk(Coupon, [
+            Coupon(tenant=tenant, code=f'CARGA{n}', discount_type='fixed', discount_value=Decimal(5 * (n + 1)))
+            for tenant in tenants for n in range(COUPONS_PER_TENANT)
+        ])
+
+        self.progress('lojas', len(tenants), count, started)
+        return tenants
+
+    def create_menus(self, tenants, product_counts, options):
+        """Categorias, produtos e árvore de adicionais. Retorna {tenant_id: (produtos, taxas, mesas, cupons)}."""
+        started = time.monotonic()
+        total = sum(product_counts)
+
+        categories = {}
+        category_objs = []
+        for tenant, size in zip(tenants, product_counts):
+            names = CATEGORY_NAMES[:max(1, min(len(CATEGORY_NAMES), size // 10))]
+            for order, name in enumerate(names):
+                category_objs.append(Category(tenant=tenant, name=name, order=order))
+        for category in self.bulk(Category, category_objs):
+            categories.setdefault(category.tenant_id, []).append(category)
+
+        menus = {}
+        done = 0
+        buffer = []
+
+        def flush():
+            nonlocal done
+            products = self.bulk(Product, buffer)
+            self.create_option_tree(products, options)
+            for product in products:
+                menus[product.tenant_id].append((product.name, product.price))
+            done += len(products)
+            buffer.clear()
+            self.progress('produtos', done, total, started)
+
+        for tenant, size in zip(tenants, product_counts):
+            menus[tenant.id] = []
+            tenant_categories = categories[tenant.id]
+            for n in range(size):
+                buffer.append(Product(
+                    tenant=tenant,
+                    category=tenant_categories[n % len(tenant_categories)],
+                    name=f'Produto {n + 1}',
+                    price=Decimal(self.rng.randint(800, 8900)) / 100,
+                    is_available=self.rng.random() > 0.05,
+                ))
+            if len(buffer) >= self.chunk:
+                flush()
+        if buffer:
+            flush()
+
+        fees = {}
+        for tenant_id, neighborhood, fee in DeliveryFee.objects.using(self.db).filter(
+            tenant__in=tenants
+        ).values_list('tenant_id', 'neighborhood', 'fee'):
+            fees.setdefault(tenant_id, []).append((neighborhood, fee))
+        tables = {}
+        for table_id, tenant_id in Table.objects.using(self.db).filter(tenant__in=tenants).values_list('id', 'tenant_id'):
+            tables.setdefault(tenant_id, []).append(table_id)
+        coupons = {}
+        for coupon_id, tenant_id, value in Coupon.objects.using(self.db).filter(
+            tenant__in=tenants
+        ).values_list('id', 'tenant_id', 'discount_value'):
+            coupons.setdefault(tenant_id, []).append((coupon_id, value))
+
+        return {
+            tenant.id: (menus[tenant.id], fees.get(tenant.id, []), tables.get(tenant.id, []), coupons.get(tenant.id, []))
+            for tenant in tenants
+        }
+
+    def create_option_tree(self, products, options):
+        product_options = self.bulk(ProductOption, [
+            ProductOption(
+                product=product,
+                title=OPTION_TITLES[n % len(OPTION_TITLES)],
+                type='checkbox' if n else 'radio',
+                required=n == 0,
+                max_quantity=3,
+            )
+            for product in products for n in range(options['options'])
+        ])
+        self.bulk(OptionItem, [
+            OptionItem(option=option, name=f'Opção {n + 1}', price=Decimal(self.rng.choice([0, 1, 2, 3, 5])))
+            for option in product_options for n in range(options['option_items'])
+        ])
+
+    # ------------------------------------------------------------------
+    # Pedidos
+    # ------------------------------------------------------------------
+
+    def create_orders(self, tenants, menus, order_counts, options):
+        started = time.monotonic()
+        total = sum(order_counts)
+        history = timedelta(days=max(options['days'], 1))
+        done = 0
+
+        # Pedidos, com a lista de itens e o cupom de cada um em paralelo
+        orders, plans = [], []
+
+        def flush():
+            nonlocal done
+            with manual_timestamps(
+                Order._meta.get_field('created_at'),
+                Order._meta.get_field('updated_at'),
+                CouponUsage._meta.get_field('used_at'),
+            ):
+                created = self.bulk(Order, orders)
+                items, usages = [], []
+                for order, (lines, coupon) in zip(created, plans):
+                    items.extend(
+                        OrderItem(order=order, product_name=name, quantity=quantity, price=price)
+                        for name, price, quantity in lines
+                    )
+                    if coupon:
+                        usages.append(CouponUsage(
+                            coupon_id=coupon[0], order=order, used_at=order.created_at, discount_applied=coupon[1]
+                        ))
+                self.bulk(OrderItem, items)
+                self.bulk(CouponUsage, usages)
+            done += len(created)
+            orders.clear()
+            plans.clear()
+            self.progress('pedidos', done, total, started)
+
+        for tenant, count in zip(tenants, order_counts):
+            products, fees, tables, coupons = menus[tenant.id]
+            available = [p for p in products] or [('Produto', Decimal('10.00'))]
+
+            for _ in range(count):
+                created_at = self.now - history * self.rng.random() ** 2
+                lines = [
+                    (name, price, self.rng.randint(1, 3))
+                    for name, price in self.rng.sample(available, min(len(available), self.rng.randint(1, options['max_items'])))
+                ]
+                subtotal = sum(price * quantity for _, price, quantity in lines)
+
+                order_type = self.rng.choice(ORDER_TYPES)
+                neighborhood, fee = self.rng.choice(fees) if order_type == 'delivery' and fees else (None, Decimal('0'))
+                coupon = self.rng.choice(coupons) if coupons and self.rng.random() < COUPON_RATE else None
+                discount = min(coupon[1], subtotal) if coupon else Decimal('0')
+
+                if self.now - created_at > timedelta(hours=3):
+                    status = 'cancelado' if self.rng.random() < 0.04 else 'concluido'
+                else:
+                    status = self.rng.choice(['pendente', 'em_preparo', 'saiu_entrega', 'concluido'])
+
+                orders.append(Order(
+                    tenant=tenant,
+                    customer_name=f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}',
+                    customer_phone=f'839{self.rng.randint(80000000, 99999999)}',
+                    order_type=order_type,
+                    table_id=self.rng.choice(tables) if order_type == 'table' and tables else None,
+                    address_street='Rua da Carga' if neighborhood else None,
+                    address_number=str(self.rng.randint(1, 999)) if neighborhood else None,
+                    address_neighborhood=neighborhood,
+                    payment_method=self.rng.choice(PAYMENT_METHODS),
+                    total_value=subtotal + fee - discount,
+                    delivery_fee=fee,
+                    discount_value=discount,
+                    coupon_id=coupon[0] if coupon else None,
+                    is_printed=status != 'pendente',
+                    status=status,
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+                plans.append((lines, coupon))
+
+                if len(orders) >= self.chunk:
+                    flush()
+        if orders:
+            flush()
+
+    # ------------------------------------------------------------------
+    # Push
+    # ------------------------------------------------------------------
+
+    def create_subscriptions(self, tenants, subscription_counts):
+        started = time.monotonic()
+        total = sum(subscription_counts)
+        services = [
+            'https://fcm.googleapis.com/fcm/send',
+            'https://updates.push.services.mozilla.com/wpush/v2',
+            'https://web.push.apple.com',
+        ]
+        subscriptions = []
+        done = 0
+        for tenant, count in zip(tenants, subscription_counts):
+            for n in range(count):
+                subscriptions.append(PushSubscription(
+                    tenant=tenant,
+                    endpoint=f'{self.rng.choice(services)}/{tenant.slug}-{n}',
+                    p256dh=f'carga-{tenant.id}-{n}',
+                    auth=f'carga-{n}',
+                    customer_phone=f'839{self.rng.randint(80000000, 99999999)}',
+                    is_active=self.rng.random() > 0.1,
+                ))
+                if len(subscriptions) >= self.chunk:
+                    done += len(self.bulk(PushSubscription, subscriptions))
+                    subscriptions.clear()
+                    self.progress('inscrições push', done, total, started)
+        if subscriptions:
+            done += len(self.bulk(PushSubscription, subscriptions))
+            self.progress('inscrições push', done, total, started)
@@ -0,0 +1,247 @@
+"""
+Métricas no formato texto do Prometheus, sem APM externo.
+
+Registro em memória (contadores e histogramas) exposto em /metrics, protegido
+por METRICS_TOKEN (cabeçalho 'Authorization: Bearer <token>').
+
+Vários workers do Gunicorn: com METRICS_DIR configurado, cada processo grava
+os próprios valores em METRICS_DIR/metrics-<pid>.json (no máximo a cada
+METRICS_FLUSH_SECONDS, e sempre antes de responder /metrics). Quem atende o
+/metrics soma os arquivos de todos os processos. Arquivos de workers que já
+morreram continuam somando (contador não pode diminuir); limpe a pasta ao
+reiniciar o serviço. Sem METRICS_DIR cada processo expõe só os seus números.
+
+- Registrar: Counter/Histogram no fim deste arquivo
+- Usar: REQUESTS.inc(view='...', status='200'), MP_LATENCY.observe(0.3, operation='...')
+"""
+import atexit
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Buckets (segundos) dos histogramas de latência
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Intervalo mínimo entre gravações do arquivo do processo (modo multiprocesso)
+METRICS_FLUSH_SECONDS = 5
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Registry:
+    """Guarda as métricas do processo e monta o texto do /metrics."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._next_flush = 0.0
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Métrica duplicada: {metric.name}')
+        self.metrics[metric.name] = metric
+        return metric
+
+    # ------------------------------------------------------------------
+    # Modo multiprocesso
+    # ------------------------------------------------------------------
+
+    def directory(self):
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: [[list(key), value] for key, value in metric.export().items()]
+                for name, metric in self.metrics.items()
+            }
+
+    def flush(self):
+        """Grava os valores deste processo em METRICS_DIR (se configurado)."""
+        directory = self.directory()
+        if not directory:
+            return
+        path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        try:
+            with self._flush_lock:
+                os.makedirs(directory, exist_ok=True)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.snapshot(), f)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f'[METRICS] Erro ao gravar {path}: {e}')
+
+    def maybe_flush(self):
+        if not self.directory():
+            return
+        now = time.monotonic()
+        with self.lock:
+            if now < self._next_flush:
+                return
+            self._next_flush = now + METRICS_FLUSH_SECONDS
+        self.flush()
+
+    def collect(self):
+        """{nome: {labels: valor}} somando todos os processos (ou só este)."""
+        directory = self.directory()
+        if not directory:
+            with self.lock:
+                return {name: dict(metric.export()) for name, metric in self.metrics.items()}
+
+        self.flush()
+        merged = {name: {} for name in self.metrics}
+        for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f'[METRICS] Ignorando {path}: {e}')
+                continue
+            for name, series in data.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                for key, value in series:
+                    key = tuple(key)
+                    merged[name][key] = metric.merge(merged[name].get(key), value)
+        return merged
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)."""
+        values = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key in sorted(values.get(name, {})):
+                lines.extend(metric.render(key, values[name][key]))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=(), registry=registry):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        self._values = {}
+        registry.register(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.registry.lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self.registry.maybe_flush()
+
+    def export(self):
+        return self._values
+
+    def merge(self, current, value):
+        return (current or 0) + value
+
+    def render(self, key, value):
+        return [f'{self.name}{_labels_text(self.labelnames, key)} {_format_value(value)}']
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=registry):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.registry = registry
+        # labels -> [contagem por bucket (+Inf no fim)..., soma]
+        self._values = {}
+        registry.register(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.registry.lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+        self.registry.maybe_flush()
+
+    @contextmanager
+    def time(self, **labels):
+        """Observa a duração do bloco `with` (também quando ele levanta exceção)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def export(self):
+        return {key: list(series) for key, series in self._values.items()}
+
+    def merge(self, current, value):
+        if current is None:
+            return list(value)
+        return [a + b for a, b in zip(current, value)]
+
+    def render(self, key, series):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f'{self.name}_bucket{_labels_text(self.labelnames, key, le)} {_format_value(cumulative)}')
+        labels = _labels_text(self.labelnames, key)
+        lines.append(f'{self.name}_sum{labels} {_format_value(series[-1])}')
+        lines.append(f'{self.name}_count{labels} {_format_value(cumulative)}')
+        return lines
+
+
+atexit.register(registry.flush)
+
+
+# ========================
+# MÉTRICAS DA APLICAÇÃO
+# ========================
+
+REQUEST_LATENCY = Histogram(
+    'rmpedidos_http_request_duration_seconds', 'Tempo de resposta por view (nome da rota)', ['view', 'method'],
+)
+REQUESTS = Counter('rmpedidos_http_requests_total', 'Requisições por view e status HTTP', ['view', 'status'])
+TENANT_REQUESTS = Counter('rmpedidos_tenant_requests_total', 'Requisições por loja (rotas com slug)', ['tenant'])
+ORDERS_CREATED = Counter('rmpedidos_orders_created_total', 'Pedidos criados por status inicial e tipo', ['status', 'order_type'])
+PUSH_SENT = Counter('rmpedidos_push_total', 'Envios de push por resultado (sent, failed, expired)', ['outcome'])
+MP_LATENCY = Histogram(
+    'rmpedidos_mercadopago_request_duration_seconds', 'Tempo das chamadas à API do Mercado Pago', ['operation'],
+)
+CACHE_REQUESTS = Counter('rmpedidos_cache_requests_total', 'Leituras de cache por cache e resultado (hit, miss)', ['cache', 'result'])
@@ -1,34 +1,58 @@
-from django.shortcuts import get_object_or_404
-from django.http import Http404
+from collections import namedtuple
+
+from django.conf import settings
+
+from .localcache import LocalLRUCache
 from .models import Tenant # Ajuste o import conforme o nome do seu app
 
+# O que a view precisa saber da loja encontrada pelo domínio
+DomainTenant = namedtuple('DomainTenant', ['id', 'slug'])
+
+# Tamanho máximo do cache de domínios (por processo)
+DOMAIN_CACHE_MAX_SIZE = 1024
+# Outros workers não recebem a invalidação local, então as entradas expiram sozinhas
+DOMAIN_CACHE_TTL = 300
+# Domínios desconhecidos (bots, IP direto, DNS antigo) ficam menos tempo
+DOMAIN_CACHE_NEGATIVE_TTL = 60
+
+domain_cache = LocalLRUCache(
+    DOMAIN_CACHE_MAX_SIZE, DOMAIN_CACHE_TTL, negative_ttl=DOMAIN_CACHE_NEGATIVE_TTL, name='domain'
+)
+
+
+def resolve_domain(host):
+    """Busca a loja pelo domínio personalizado, passando pelo cache local."""
+    # Remove o 'www.' se tiver, para evitar duplicidade
+    clean_host = host.replace('www.', '')
+
+    found, tenant = domain_cache.get(clean_host)
+    if found:
+        return tenant
+
+    row = Tenant.objects.filter(custom_domain=clean_host).values_list('id', 'slug').first()
+    tenant = DomainTenant(*row) if row else None
+    domain_cache.set(clean_host, tenant)
+    return tenant
+
+
 class DomainMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
 
+        # Lista dos SEUS domínios oficiais (que devem mostrar a Landing Page)
+        self.primary_domains = frozenset(
+            domain.strip().lower() for domain in settings.PRIMARY_DOMAINS if domain.strip()
+        )
+
     def __call__(self, request):
         # Pega o domínio limpo (sem porta, ex: pizzariadoze.com)
         host = request.get_host().split(':')[0].lower()
-        
-        # Lista dos SEUS domínios oficiais (que devem mostrar a Landing Page)
-        my_domains = ['rmpedidos.online', 'www.rmpedidos.online', 'localhost', '127.0.0.1']
 
         request.tenant_from_domain = None
 
-        if host not in my_domains:
+        if host not in self.primary_domains:
             # Se não é o seu domínio principal, TENTA achar uma loja
-            try:
-                # Remove o 'www.' se tiver, para evitar duplicidade
-                clean_host = host.replace('www.', '')
-                
-                # Busca a loja pelo domínio personalizado
-                tenant = Tenant.objects.get(custom_domain=clean_host)
-                
-                # Salva a loja na requisição para usarmos na View
-                request.tenant_from_domain = tenant
-                
-            except Tenant.DoesNotExist:
-                # Se o domínio aponta pro seu IP mas não tem loja cadastrada
-                pass 
-
-        return self.get_response(request)
\ No newline at end of file
+            # (None se o domínio aponta pro seu IP mas não tem loja cadastrada)
+            request.tenant_from_domain = resolve_domain(host)
+
+        return self.get_response(request)
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0031_order_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('request_id', models.CharField(max_length=32, unique=True, verbose_name='ID da Requisição')),
+                ('method', models.CharField(max_length=10, verbose_name='Método')),
+                ('path', models.CharField(max_length=500, verbose_name='Caminho')),
+                ('view_name', models.CharField(blank=True, default='', max_length=200, verbose_name='View')),
+                ('tenant_slug', models.CharField(blank=True, default='', max_length=100, verbose_name='Loja')),
+                ('status_code', models.IntegerField(blank=True, null=True, verbose_name='Status HTTP')),
+                ('duration_ms', models.FloatField(verbose_name='Tempo da View (ms)')),
+                ('db_queries', models.IntegerField(default=0, verbose_name='Consultas ao Banco')),
+                ('db_ms', models.FloatField(default=0, verbose_name='Tempo no Banco (ms)')),
+                ('stats_text', models.TextField(blank=True, default='', verbose_name='Resumo')),
+                ('profile_data', models.BinaryField(verbose_name='Perfil (pstats)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Perfil de Requisição',
+                'verbose_name_plural': 'Perfis de Requisição',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
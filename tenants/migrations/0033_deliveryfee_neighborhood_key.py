@@ -0,0 +1,66 @@
+# Generated by Django 6.0 on 2026-10-17 02:50
+
+import logging
+import unicodedata
+
+from django.db import migrations, models
+
+logger = logging.getLogger('tenants.migrations')
+
+
+def _key(texto):
+    # Cópia de validators.neighborhood_key (migrations não devem depender do código atual)
+    texto = unicodedata.normalize('NFD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.upper().split())
+
+
+def backfill_neighborhood_key(apps, schema_editor):
+    DeliveryFee = apps.get_model('tenants', 'DeliveryFee')
+    groups = {}
+
+    for fee in DeliveryFee.objects.order_by('tenant_id', 'id').only('id', 'tenant_id', 'neighborhood', 'fee').iterator():
+        groups.setdefault((fee.tenant_id, _key(fee.neighborhood)), []).append(fee)
+
+    changed = []
+    duplicates = []
+    for (tenant_id, key), fees in groups.items():
+        # Bairros repetidos ('Centro' e 'CENTRO'): fica a menor taxa (empate: a mais antiga),
+        # para nenhum cliente passar a pagar mais depois da migração
+        kept = min(fees, key=lambda fee: (fee.fee, fee.id))
+        kept.neighborhood_key = key
+        changed.append(kept)
+        for fee in fees:
+            if fee is kept:
+                continue
+            duplicates.append(fee.id)
+            logger.warning(
+                f'[MIGRATION 0033] Loja {tenant_id}: taxa #{fee.id} "{fee.neighborhood}" R$ {fee.fee} '
+                f'apagada (duplicada de #{kept.id} "{kept.neighborhood}" R$ {kept.fee})'
+            )
+
+    DeliveryFee.objects.filter(id__in=duplicates).delete()
+    DeliveryFee.objects.bulk_update(changed, ['neighborhood_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0032_request_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliveryfee',
+            name='neighborhood_key',
+            field=models.CharField(default='', editable=False, max_length=100, verbose_name='Chave do Bairro'),
+            preserve_default=False,
+        ),
+        # Ao desfazer, a coluna some e as taxas apagadas como duplicadas não voltam
+        # (estão no log do migrate): não há o que desfazer aqui
+        migrations.RunPython(backfill_neighborhood_key, reverse_code=migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='deliveryfee',
+            constraint=models.UniqueConstraint(fields=('tenant', 'neighborhood_key'), name='deliveryfee_tenant_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0033_deliveryfee_neighborhood_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryZone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nome da Zona')),
+                ('kind', models.CharField(choices=[('polygon', 'Polígono'), ('radius', 'Raio')], default='radius', max_length=10, verbose_name='Tipo')),
+                ('coordinates', models.JSONField(default=list, help_text='[[lat, lng], ...] (raio: só o centro)', verbose_name='Coordenadas')),
+                ('radius_km', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True, verbose_name='Raio (km)')),
+                ('fee', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Taxa de Entrega')),
+                ('priority', models.IntegerField(default=0, verbose_name='Prioridade')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Ativa?')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='delivery_zones', to='tenants.tenant')),
+            ],
+            options={
+                'verbose_name': 'Zona de Entrega',
+                'verbose_name_plural': 'Zonas de Entrega',
+            },
+        ),
+    ]
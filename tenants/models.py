@@ -1,8 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import timedelta
 
+from .validators import neighborhood_key
+
 class Tenant(models.Model):
     # NOME DA LOJA E SUBDOMINIO
     name = models.CharField(max_length=100, verbose_name="Nome da Loja")
@@ -266,6 +269,8 @@ class Order(models.Model):
     
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Data do Pedido")
+    # Cursor da sincronização incremental do painel (api_get_orders?since=)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
 
     # NOVOS CAMPOS PARA AGENDAMENTO
     is_scheduled = models.BooleanField(default=False, verbose_name="É agendamento?")
@@ -276,6 +281,9 @@ class Order(models.Model):
         verbose_name = "Pedido"
         verbose_name_plural = "Pedidos"
         ordering = ['-created_at'] # Mais recentes primeiro
+        indexes = [
+            models.Index(fields=['tenant', 'updated_at'], name='order_tenant_updated_idx'),
+        ]
 
     def __str__(self):
         table_info = f" - Mesa {self.table.number}" if self.table and self.order_type == 'table' else ""
@@ -316,14 +324,82 @@ class OperatingDay(models.Model):
 class DeliveryFee(models.Model):
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='delivery_fees')
     neighborhood = models.CharField(max_length=100, verbose_name="Bairro")
+    # Forma normalizada do bairro (sem acentos, maiúscula), preenchida no save().
+    # É por ela que o checkout acha a taxa: 'São José' e 'sao jose' são o mesmo bairro
+    neighborhood_key = models.CharField(max_length=100, editable=False, verbose_name="Chave do Bairro")
     fee = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Taxa de Entrega")
 
     def __str__(self):
         return f"{self.neighborhood} - R$ {self.fee}"
 
+    def clean(self):
+        key = neighborhood_key(self.neighborhood)
+        if self.tenant_id and DeliveryFee.objects.filter(tenant_id=self.tenant_id, neighborhood_key=key).exclude(pk=self.pk).exists():
+            raise ValidationError({'neighborhood': 'Já existe uma taxa para este bairro.'})
+
+    def save(self, *args, **kwargs):
+        # bulk_create não passa por aqui: preencha neighborhood_key com validators.neighborhood_key
+        self.neighborhood_key = neighborhood_key(self.neighborhood)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'neighborhood' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'neighborhood_key'}
+        super().save(*args, **kwargs)
+
     class Meta:
         # Garante que não haja bairros duplicados na mesma loja
         unique_together = ('tenant', 'neighborhood')
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'neighborhood_key'], name='deliveryfee_tenant_key_uniq'),
+        ]
+
+class DeliveryZone(models.Model):
+    """
+    Área de entrega desenhada pela loja: polígono (lista de [lat, lng]) ou
+    círculo (coordinates = [[lat, lng]] do centro + radius_km). O checkout
+    procura a zona da localização do cliente (tenants/zones.py) e, se não
+    achar, usa a tabela de bairros (DeliveryFee).
+    """
+    KIND_CHOICES = [
+        ('polygon', 'Polígono'),
+        ('radius', 'Raio'),
+    ]
+
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='delivery_zones')
+    name = models.CharField(max_length=100, verbose_name="Nome da Zona")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='radius', verbose_name="Tipo")
+    coordinates = models.JSONField(default=list, verbose_name="Coordenadas", help_text="[[lat, lng], ...] (raio: só o centro)")
+    radius_km = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True, verbose_name="Raio (km)")
+    fee = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Taxa de Entrega")
+    # Zonas sobrepostas: vence a de maior prioridade; empatou, vence a menor (anéis de raio)
+    priority = models.IntegerField(default=0, verbose_name="Prioridade")
+    is_active = models.BooleanField(default=True, verbose_name="Ativa?")
+
+    class Meta:
+        verbose_name = "Zona de Entrega"
+        verbose_name_plural = "Zonas de Entrega"
+
+    def __str__(self):
+        return f"{self.name} - R$ {self.fee}"
+
+    def clean(self):
+        points = self.coordinates if isinstance(self.coordinates, list) else None
+        try:
+            valid = points is not None and all(
+                len(point) == 2 and -90 <= float(point[0]) <= 90 and -180 <= float(point[1]) <= 180
+                for point in points
+            )
+        except (TypeError, ValueError):
+            valid = False
+        if not valid:
+            raise ValidationError({'coordinates': 'Use uma lista de pares [latitude, longitude].'})
+
+        if self.kind == 'polygon' and len(points) < 3:
+            raise ValidationError({'coordinates': 'O polígono precisa de pelo menos 3 pontos.'})
+        if self.kind == 'radius':
+            if len(points) != 1:
+                raise ValidationError({'coordinates': 'Informe só o centro: [[lat, lng]].'})
+            if not self.radius_km or self.radius_km <= 0:
+                raise ValidationError({'radius_km': 'Informe o raio em km.'})
 
 # GRUPOS REUTILIZÁVEIS DE ADICIONAIS
 class ProductGroup(models.Model):
@@ -425,6 +501,18 @@ class Coupon(models.Model):
     def __str__(self):
         return f"{self.code} - {self.tenant.name}"
 
+    def redeem(self):
+        """
+        Conta um uso do cupom num único UPDATE condicional:
+        used_count = used_count + 1 WHERE ativo AND (sem limite OR used_count < usage_limit).
+        Pedidos simultâneos não perdem incrementos nem passam do limite.
+        Retorna False se o cupom esgotou (ou foi desativado) depois de validado.
+        """
+        redeemed = Coupon.objects.filter(pk=self.pk, is_active=True).filter(
+            models.Q(usage_limit__lte=0) | models.Q(used_count__lt=models.F('usage_limit'))
+        ).update(used_count=models.F('used_count') + 1)
+        return redeemed == 1
+
     def is_valid(self):
         """Verifica se o cupom é válido para uso"""
         from django.utils import timezone
@@ -537,4 +625,78 @@ class TenantPaymentConfig(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"Config MP - {self.tenant.name}"
\ No newline at end of file
+        return f"Config MP - {self.tenant.name}"
+# ==========================================
+# FILA DE TAREFAS EM SEGUNDO PLANO (JOBS)
+# ==========================================
+class Job(models.Model):
+    """
+    Tarefa assíncrona (push, email, Mercado Pago...) gravada no banco.
+    Criada com jobs.enqueue() e executada pelo comando `manage.py run_workers`.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('running', 'Executando'),
+        ('done', 'Concluído'),
+        ('failed', 'Falhou (Dead Letter)'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name="Tarefa")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Parâmetros")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Status")
+
+    attempts = models.IntegerField(default=0, verbose_name="Tentativas")
+    max_attempts = models.IntegerField(default=5, verbose_name="Máximo de Tentativas")
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="Executar a partir de")
+
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Em execução desde")
+    locked_by = models.CharField(max_length=100, blank=True, default='', verbose_name="Worker")
+
+    result = models.JSONField(null=True, blank=True, verbose_name="Resultado")
+    last_error = models.TextField(blank=True, default='', verbose_name="Último Erro")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Finalizado em")
+
+    class Meta:
+        verbose_name = "Tarefa em Segundo Plano"
+        verbose_name_plural = "Tarefas em Segundo Plano"
+        indexes = [
+            # Busca dos workers: pendentes cujo horário já chegou
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.get_status_display()})"
+
+
+class RequestProfile(models.Model):
+    """
+    Perfil (cProfile) de uma requisição pedida por um usuário staff com
+    ?_profile=1 ou o cabeçalho X-Profile: 1. Gravado por tenants/profiling.py.
+    """
+    request_id = models.CharField(max_length=32, unique=True, verbose_name="ID da Requisição")
+    method = models.CharField(max_length=10, verbose_name="Método")
+    path = models.CharField(max_length=500, verbose_name="Caminho")
+    view_name = models.CharField(max_length=200, blank=True, default='', verbose_name="View")
+    tenant_slug = models.CharField(max_length=100, blank=True, default='', verbose_name="Loja")
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Usuário")
+    status_code = models.IntegerField(null=True, blank=True, verbose_name="Status HTTP")
+
+    duration_ms = models.FloatField(verbose_name="Tempo da View (ms)")
+    db_queries = models.IntegerField(default=0, verbose_name="Consultas ao Banco")
+    db_ms = models.FloatField(default=0, verbose_name="Tempo no Banco (ms)")
+
+    # Resumo legível (funções mais caras) e o arquivo .prof completo (pstats/snakeviz)
+    stats_text = models.TextField(blank=True, default='', verbose_name="Resumo")
+    profile_data = models.BinaryField(verbose_name="Perfil (pstats)")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+
+    class Meta:
+        verbose_name = "Perfil de Requisição"
+        verbose_name_plural = "Perfis de Requisição"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f}ms)"
@@ -0,0 +1,186 @@
+"""
+Busca aproximada de bairros nas taxas de entrega (checkout e autocomplete).
+
+O cliente digita "Jd. América", "Jardim America" ou "jardim américa"; a
+comparação exata pela neighborhood_key só resolve acentos e maiúsculas, e o
+resto virava frete zerado. Aqui cada loja tem um NeighborhoodIndex:
+
+- chave de busca: neighborhood_key + pontuação removida + abreviações comuns
+  expandidas (JD -> JARDIM, VL -> VILA, STA -> SANTA...);
+- índice invertido de trigramas (como o pg_trgm): trigrama -> bairros que o
+  contêm. A busca só visita os bairros que compartilham algum trigrama com o
+  texto digitado e ordena pela similaridade (Jaccard dos trigramas).
+
+O índice é montado uma vez por versão do cardápio (toda alteração de taxa já
+chama bump_menu_version) e fica no cache compartilhado e num LRU local do
+processo, então cada busca custa 1 leitura de cache (a versão) e
+microssegundos de CPU.
+"""
+import re
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .cache import MENU_CACHE_TIMEOUT, get_menu_version
+from .localcache import LocalLRUCache
+from .models import DeliveryFee
+from .validators import neighborhood_key
+
+# Abreviações usadas em nomes de bairro (depois de normalizar e tirar a pontuação)
+ABBREVIATIONS = {
+    'JD': 'JARDIM', 'JDM': 'JARDIM', 'JARD': 'JARDIM',
+    'VL': 'VILA',
+    'PQ': 'PARQUE', 'PQE': 'PARQUE', 'PRQ': 'PARQUE',
+    'CJ': 'CONJUNTO', 'CONJ': 'CONJUNTO', 'CJTO': 'CONJUNTO',
+    'RES': 'RESIDENCIAL', 'RESID': 'RESIDENCIAL',
+    'LOT': 'LOTEAMENTO',
+    'STA': 'SANTA', 'STO': 'SANTO',
+    'SRA': 'SENHORA', 'NSA': 'NOSSA', 'NS': 'NOSSA SENHORA',
+    'DR': 'DOUTOR', 'PE': 'PADRE', 'PRES': 'PRESIDENTE', 'GOV': 'GOVERNADOR',
+    'CEL': 'CORONEL', 'GAL': 'GENERAL', 'MAL': 'MARECHAL', 'PROF': 'PROFESSOR',
+    'NV': 'NOVA',
+}
+
+# Similaridade mínima para o checkout cobrar a taxa de um bairro parecido
+CHECKOUT_MIN_SIMILARITY = 0.6
+# O melhor resultado precisa ganhar do segundo por essa margem (evita adivinhar entre dois bairros)
+CHECKOUT_MIN_MARGIN = 0.1
+# Similaridade mínima para aparecer no autocomplete
+SUGGEST_MIN_SIMILARITY = 0.2
+SUGGEST_LIMIT = 8
+
+NEIGHBORHOOD_INDEX_LOCAL_SIZE = 512
+# A chave já leva a versão do cardápio; o TTL só libera memória de lojas paradas
+NEIGHBORHOOD_INDEX_LOCAL_TTL = 60 * 10
+
+NeighborhoodMatch = namedtuple('NeighborhoodMatch', ['neighborhood', 'fee', 'score'])
+
+_local_indexes = LocalLRUCache(
+    NEIGHBORHOOD_INDEX_LOCAL_SIZE, NEIGHBORHOOD_INDEX_LOCAL_TTL, name='neighborhood_index'
+)
+
+_NON_ALNUM = re.compile(r'[^A-Z0-9]+')
+
+
+def search_key(texto):
+    """'Jd. América' -> 'JARDIM AMERICA'"""
+    words = _NON_ALNUM.sub(' ', neighborhood_key(texto)).split()
+    return ' '.join(ABBREVIATIONS.get(word, word) for word in words)
+
+
+def trigrams(key):
+    """Trigramas de cada palavra com o preenchimento do pg_trgm ('  PALAVRA ')."""
+    grams = set()
+    for word in key.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NeighborhoodIndex:
+    """Bairros de uma loja com índice de trigramas (imutável; montado por build())."""
+
+    def __init__(self, fees):
+        """fees: iterável de (bairro, taxa)."""
+        self.names = []
+        self.fees = []
+        self.keys = []
+        self.sizes = []
+        self.exact = {}
+        postings = {}
+
+        for neighborhood, fee in fees:
+            position = len(self.names)
+            key = search_key(neighborhood)
+            grams = trigrams(key)
+            self.names.append(neighborhood)
+            self.fees.append(fee)
+            self.keys.append(key)
+            self.sizes.append(len(grams))
+            self.exact.setdefault(key, position)
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+
+        self.postings = {gram: tuple(ids) for gram, ids in postings.items()}
+
+    @classmethod
+    def build(cls, tenant_id):
+        return cls(DeliveryFee.objects.filter(tenant_id=tenant_id).order_by('id').values_list('neighborhood', 'fee'))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _result(self, position, score):
+        return NeighborhoodMatch(self.names[position], self.fees[position], round(score, 3))
+
+    def _scores(self, key):
+        grams = trigrams(key)
+        if not grams:
+            return {}
+        shared = {}
+        for gram in grams:
+            for position in self.postings.get(gram, ()):
+                shared[position] = shared.get(position, 0) + 1
+        total = len(grams)
+        return {
+            position: count / (total + self.sizes[position] - count)
+            for position, count in shared.items()
+        }
+
+    def search(self, texto, limit=SUGGEST_LIMIT, min_score=SUGGEST_MIN_SIMILARITY):
+        """Bairros mais parecidos com o texto, do mais para o menos parecido."""
+        key = search_key(texto)
+        if not key:
+            return []
+        scores = self._scores(key)
+        exact = self.exact.get(key)
+        if exact is not None:
+            scores[exact] = 1.0
+
+        # Autocomplete: quem começa com o que foi digitado vem antes
+        ranked = sorted(
+            (position for position, score in scores.items() if score >= min_score or self.keys[position].startswith(key)),
+            key=lambda position: (not self.keys[position].startswith(key), -scores[position], self.names[position]),
+        )
+        return [self._result(position, scores[position]) for position in ranked[:limit]]
+
+    def match(self, texto):
+        """
+        Bairro que o checkout deve cobrar: o exato (mesma chave de busca) ou o
+        mais parecido, se for parecido o bastante e sem empate. None se não há.
+        """
+        key = search_key(texto)
+        if not key:
+            return None
+        exact = self.exact.get(key)
+        if exact is not None:
+            return self._result(exact, 1.0)
+
+        ranked = sorted(self._scores(key).items(), key=lambda item: -item[1])[:2]
+        if not ranked or ranked[0][1] < CHECKOUT_MIN_SIMILARITY:
+            return None
+        if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < CHECKOUT_MIN_MARGIN:
+            return None
+        return self._result(*ranked[0])
+
+
+def _index_cache_key(tenant_id, version):
+    return f'neighborhood_index:{tenant_id}:{version}'
+
+
+def get_neighborhood_index(tenant_id):
+    """Índice de bairros da loja (LRU local -> cache compartilhado -> banco)."""
+    version = get_menu_version(tenant_id)
+    local_key = (tenant_id, version)
+
+    found, index = _local_indexes.get(local_key)
+    if found:
+        return index
+
+    key = _index_cache_key(tenant_id, version)
+    index = cache.get(key)
+    if index is None:
+        index = NeighborhoodIndex.build(tenant_id)
+        cache.set(key, index, MENU_CACHE_TIMEOUT)
+    _local_indexes.set(local_key, index)
+    return index
@@ -0,0 +1,197 @@
+"""
+Integração com o Mercado Pago fora do ciclo da requisição.
+
+O pedido é gravado e confirmado primeiro; a cobrança PIX é criada depois,
+pela fila de jobs (tarefa 'mp.create_pix'). Assim a latência do MP nunca
+segura conexão nem lock do banco. O cliente recebe um token e consulta o PIX
+pelo endpoint de status (api_order_pix_status) até ele ficar pronto.
+
+As notificações do webhook também são processadas pela fila ('mp.webhook').
+"""
+import logging
+
+import mercadopago
+from mercadopago.config import RequestOptions
+from django.core import signing
+from django.utils import timezone
+
+from .events import publish_order_change
+from .metrics import MP_LATENCY
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+# Marcador gravado em mercadopago_status quando a criação da cobrança falha
+PIX_STATUS_ERROR = 'error'
+
+PIX_TOKEN_SALT = 'tenants.pix'
+# O QR Code do MP expira bem antes disso; depois de 1 dia o token não vale mais
+PIX_TOKEN_MAX_AGE = 60 * 60 * 24
+
+# Tempo máximo de espera por uma resposta do MP dentro do worker
+MP_TIMEOUT_SECONDS = 15.0
+
+
+class MercadoPagoUnavailable(Exception):
+    """Falha temporária do MP (rede, 5xx): a tarefa deve ser tentada de novo."""
+
+
+def make_pix_token(order_id):
+    """Token assinado que autoriza o cliente a consultar o PIX do próprio pedido."""
+    return signing.dumps(order_id, salt=PIX_TOKEN_SALT)
+
+
+def check_pix_token(token, order_id):
+    try:
+        return signing.loads(token, salt=PIX_TOKEN_SALT, max_age=PIX_TOKEN_MAX_AGE) == order_id
+    except signing.BadSignature:
+        return False
+
+
+def pix_payload(order):
+    """Dados do PIX para o frontend, ou None se ainda não foi gerado."""
+    if not order.pix_qr_code:
+        return None
+    return {
+        'qr_code': order.pix_qr_code,
+        'qr_code_base64': order.pix_qr_code_base64,
+        'ticket_url': order.pix_ticket_url,
+    }
+
+
+def mark_pix_failed(order_id):
+    """Sinaliza para o frontend que o PIX não será gerado (ele cai no fluxo manual)."""
+    pending = Order.objects.filter(pk=order_id, mercadopago_id__isnull=True)
+    order = pending.only('id', 'tenant_id').first()
+    if order is None:
+        return
+    if pending.update(mercadopago_status=PIX_STATUS_ERROR, updated_at=timezone.now()):
+        # O painel mostra o pedido sem PIX automático
+        publish_order_change(order)
+
+
+def create_pix_payment(order_id):
+    """
+    Cria a cobrança PIX no Mercado Pago e grava no pedido.
+    Idempotente: não faz nada se o pedido já tem transação no MP, e a chave de
+    idempotência enviada ao MP evita cobrança duplicada em novas tentativas.
+    Levanta MercadoPagoUnavailable em falhas temporárias.
+    Retorna os dados do PIX ou None.
+    """
+    order = Order.objects.select_related('tenant__payment_config').get(pk=order_id)
+    if order.mercadopago_id:
+        return pix_payload(order)
+
+    tenant = order.tenant
+    if not hasattr(tenant, 'payment_config'):
+        logger.warning(f"PIX MP: loja {tenant.slug} não tem Mercado Pago conectado (pedido #{order.id})")
+        mark_pix_failed(order.id)
+        return None
+
+    nome = order.customer_name
+
+    # 1. Inicializa SDK com o Token DO LOJISTA
+    sdk = mercadopago.SDK(tenant.payment_config.access_token)
+
+    # 2. Prepara os dados do pagamento
+    # Email é obrigatório na API, usamos um fictício caso não tenha
+    payer_email = "cliente@rmpedidos.online"
+
+    payment_data = {
+        "transaction_amount": float(order.total_value),
+        "description": f"Pedido #{order.id} - {tenant.name}",
+        "payment_method_id": "pix",
+        "payer": {
+            "email": payer_email,
+            "first_name": nome.split()[0],
+            "last_name": nome.split()[-1] if len(nome.split()) > 1 else "Cliente",
+        },
+        # A URL onde o MP vai avisar que o pagamento foi aprovado
+        # IMPORTANTE: Deve ser HTTPS em produção
+        "notification_url": "https://rmpedidos.online/api/mp/webhook/",
+        "external_reference": str(order.id)
+    }
+    request_options = RequestOptions(
+        connection_timeout=MP_TIMEOUT_SECONDS,
+        custom_headers={'x-idempotency-key': f'rmpedidos-pix-{order.id}'},
+    )
+
+    # 3. Cria o pagamento
+    try:
+        with MP_LATENCY.time(operation='payment_create'):
+            mp_response = sdk.payment().create(payment_data, request_options)
+    except Exception as e:
+        raise MercadoPagoUnavailable(f"Erro ao gerar PIX MP (pedido #{order.id}): {e}") from e
+
+    mp_result = mp_response["response"]
+    if mp_response["status"] >= 500:
+        raise MercadoPagoUnavailable(f"Erro MP (pedido #{order.id}): {mp_result}")
+    if mp_response["status"] != 201:
+        # Recusa definitiva (dados inválidos, conta sem PIX...): não adianta tentar de novo
+        logger.error(f"Erro MP (pedido #{order.id}): {mp_result}")
+        mark_pix_failed(order.id)
+        return None
+
+    # 4. Salva os dados do PIX no pedido
+    poi = mp_result.get("point_of_interaction", {}).get("transaction_data", {})
+    order.mercadopago_id = str(mp_result.get("id"))
+    order.mercadopago_status = mp_result.get("status")
+    order.pix_qr_code = poi.get("qr_code") # Copia e Cola
+    order.pix_qr_code_base64 = poi.get("qr_code_base64") # Imagem
+    order.pix_ticket_url = poi.get("ticket_url")
+    order.save(update_fields=[
+        'mercadopago_id', 'mercadopago_status',
+        'pix_qr_code', 'pix_qr_code_base64', 'pix_ticket_url', 'updated_at',
+    ])
+    return pix_payload(order)
+
+
+class PaymentOrderNotFound(Exception):
+    """O MP avisou antes de o pedido ter o ID da transação salvo: tentar de novo depois."""
+
+
+def process_payment_notification(payment_id):
+    """
+    Processa uma notificação de pagamento do webhook: consulta o status
+    atualizado no MP e atualiza o pedido. Retorna o status do MP (ou None).
+    """
+    # 1. Tenta achar o pedido que tem esse ID de transação
+    order = Order.objects.select_related('tenant__payment_config').filter(mercadopago_id=payment_id).first()
+    if not order:
+        # As vezes o MP avisa antes de o worker gravar o ID no pedido
+        raise PaymentOrderNotFound(f"Webhook: Pedido não encontrado para ID MP {payment_id}")
+
+    # Achamos o pedido! Agora consultamos o status atualizado no MP
+    tenant = order.tenant
+    if not hasattr(tenant, 'payment_config'):
+        return None
+
+    sdk = mercadopago.SDK(tenant.payment_config.access_token)
+    try:
+        with MP_LATENCY.time(operation='payment_get'):
+            payment_info = sdk.payment().get(payment_id, RequestOptions(connection_timeout=MP_TIMEOUT_SECONDS))
+    except Exception as e:
+        raise MercadoPagoUnavailable(f"Webhook: erro ao consultar pagamento {payment_id}: {e}") from e
+
+    if payment_info["status"] >= 500:
+        raise MercadoPagoUnavailable(f"Webhook: erro MP ao consultar pagamento {payment_id}: {payment_info['response']}")
+
+    status = payment_info["response"].get("status")
+
+    if status == 'approved':
+        # PAGAMENTO CONFIRMADO!
+        # Muda status do pedido e salva
+        if order.status == 'pendente':
+            order.status = 'em_preparo' # Ou 'confirmado'
+            order.mercadopago_status = status
+            order.save(update_fields=['status', 'mercadopago_status', 'updated_at'])
+            publish_order_change(order)
+            logger.info(f"Webhook: Pedido #{order.id} APROVADO via Pix!")
+
+    elif status == 'rejected' or status == 'cancelled':
+        order.mercadopago_status = status
+        order.status = 'cancelado'
+        order.save(update_fields=['status', 'mercadopago_status', 'updated_at'])
+        publish_order_change(order)
+
+    return status
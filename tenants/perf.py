@@ -0,0 +1,227 @@
+"""
+Medição de desempenho por requisição (PerfMiddleware).
+
+Para cada requisição são medidos: tempo total, quantidade e tempo das
+consultas ao banco (connection.execute_wrapper), tempo de renderização de
+templates e acertos/faltas de cache (tenants/cache.py e LocalLRUCache).
+
+- Log estruturado: uma linha '[PERF] {...json...}' por requisição no logger
+  tenants.perf (INFO), ou WARNING com o SQL executado quando passa de
+  PERF_SLOW_REQUEST_MS.
+- Server-Timing: cabeçalho com os tempos para usuários staff (aparece na aba
+  Network do navegador). PERF_SERVER_TIMING = 'staff' (padrão), 'all' ou 'off'.
+
+Feito para ficar ligado em produção: por consulta só anotamos o SQL e a
+duração (sem os parâmetros); o SQL só é formatado no log das requisições lentas.
+"""
+import contextvars
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404
+from django.template.backends.django import Template as DjangoBackendTemplate
+from django.utils.functional import empty
+
+from .metrics import CACHE_REQUESTS, REQUEST_LATENCY, REQUESTS, TENANT_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Requisições mais lentas que isso (ms) geram WARNING com o SQL executado
+DEFAULT_SLOW_REQUEST_MS = 500
+# Consultas guardadas por requisição para o log de lentidão
+PERF_MAX_QUERIES_LOGGED = 200
+# Consultas impressas no log de lentidão (as mais demoradas)
+PERF_SLOW_SQL_SHOWN = 20
+
+_current = contextvars.ContextVar('perf_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = (
+        'started', 'db_queries', 'db_ms', 'template_ms', 'template_depth',
+        'cache_hits', 'cache_misses', 'queries',
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.queries = []
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+
+def current_stats():
+    """RequestStats da requisição em andamento (None fora do PerfMiddleware)."""
+    return _current.get()
+
+
+def record_cache(name, hit):
+    """Conta um acerto (hit=True) ou falta no cache `name` (métricas e requisição atual)."""
+    CACHE_REQUESTS.inc(cache=name, result='hit' if hit else 'miss')
+    stats = _current.get()
+    if stats is None:
+        return
+    if hit:
+        stats.cache_hits += 1
+    else:
+        stats.cache_misses += 1
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (time.perf_counter() - started) * 1000
+        stats.db_queries += 1
+        stats.db_ms += duration
+        if len(stats.queries) < PERF_MAX_QUERIES_LOGGED:
+            stats.queries.append((sql, duration))
+
+
+_original_template_render = DjangoBackendTemplate.render
+
+
+def _timed_template_render(self, context=None, request=None):
+    stats = _current.get()
+    if stats is None:
+        return _original_template_render(self, context, request)
+
+    # Templates renderizados dentro de outro (render_to_string em tag, etc.) não contam duas vezes
+    stats.template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_template_render(self, context, request)
+    finally:
+        stats.template_depth -= 1
+        if stats.template_depth == 0:
+            stats.template_ms += (time.perf_counter() - started) * 1000
+
+
+def install_template_timer():
+    """Passa a medir o render() dos templates Django (idempotente)."""
+    DjangoBackendTemplate.render = _timed_template_render
+
+
+def server_timing(stats, total_ms):
+    return ', '.join([
+        f'db;dur={stats.db_ms:.1f};desc="{stats.db_queries} queries"',
+        f'tpl;dur={stats.template_ms:.1f}',
+        f'cache;desc="{stats.cache_hits} hits, {stats.cache_misses} misses"',
+        f'total;dur={total_ms:.1f}',
+    ])
+
+
+class PerfMiddleware:
+    """Mede cada requisição; deve ser o primeiro da lista MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'PERF_SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS)
+        self.server_timing_mode = getattr(settings, 'PERF_SERVER_TIMING', 'staff')
+        install_template_timer()
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(_db_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        total_ms = stats.elapsed_ms()
+
+        try:
+            if self.wants_server_timing(request):
+                response['Server-Timing'] = server_timing(stats, total_ms)
+            self.log(request, response, stats, total_ms)
+            self.record_metrics(request, response, total_ms)
+        except Exception as e:
+            # Medição nunca derruba a requisição
+            logger.error(f'[PERF] Erro ao registrar requisição {request.path}: {e}')
+
+        return response
+
+    def wants_server_timing(self, request):
+        if self.server_timing_mode == 'all':
+            return True
+        if self.server_timing_mode != 'staff':
+            return False
+        user = getattr(request, 'user', None)
+        # Só olha o usuário se a view já o carregou: ler request.user aqui
+        # custaria as consultas de sessão e usuário em toda página pública
+        if user is None or getattr(user, '_wrapped', None) is empty:
+            return False
+        return bool(user.is_authenticated and user.is_staff)
+
+    def record_metrics(self, request, response, total_ms):
+        match = getattr(request, 'resolver_match', None)
+        # Rotas inexistentes (404 de bots) num rótulo só, para não explodir as séries
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        REQUEST_LATENCY.observe(total_ms / 1000, view=view, method=request.method)
+        REQUESTS.inc(view=view, status=response.status_code)
+        slug = match.kwargs.get('slug') if match else None
+        if slug:
+            TENANT_REQUESTS.inc(tenant=self.tenant_label(request, slug))
+
+    def tenant_label(self, request, slug):
+        """Slug para o rótulo da métrica, ou 'unknown' se a loja não existe (slugs inventados por bots)."""
+        if slug in getattr(request, '_tenants_by_slug', {}):
+            return slug
+        # Import local: access -> localcache -> perf
+        from .access import get_tenant_ref
+
+        try:
+            # Cache local por slug (negativo também): no máximo uma consulta por minuto
+            get_tenant_ref(slug)
+        except Http404:
+            return 'unknown'
+        return slug
+
+    def log(self, request, response, stats, total_ms):
+        match = getattr(request, 'resolver_match', None)
+        entry = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.url_name if match else None,
+            'tenant': match.kwargs.get('slug') if match else None,
+            'status': response.status_code,
+            'ms': round(total_ms, 1),
+            'db_queries': stats.db_queries,
+            'db_ms': round(stats.db_ms, 1),
+            'template_ms': round(stats.template_ms, 1),
+            'cache_hits': stats.cache_hits,
+            'cache_misses': stats.cache_misses,
+        }
+
+        if total_ms < self.slow_ms:
+            logger.info(f'[PERF] {json.dumps(entry)}')
+            return
+
+        repeated = Counter(sql for sql, _ in stats.queries)
+        slowest = sorted(stats.queries, key=lambda q: q[1], reverse=True)[:PERF_SLOW_SQL_SHOWN]
+        lines = [f'[PERF] Requisição lenta {json.dumps(entry)}']
+        lines += [f'  {duration:8.1f}ms  {sql}' for sql, duration in slowest]
+        lines += [
+            f'  repetida {count}x: {sql}'
+            for sql, count in repeated.most_common(5) if count > 1
+        ]
+        logger.warning('\n'.join(lines))
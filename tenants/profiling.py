@@ -0,0 +1,123 @@
+"""
+Profiler sob demanda para requisições em produção (ProfilerMiddleware).
+
+Um usuário staff adiciona ?_profile=1 à URL (ou envia o cabeçalho
+X-Profile: 1) e a requisição roda dentro do cProfile. O resultado vira um
+RequestProfile (admin > Perfis de Requisição) com o resumo das funções mais
+caras e o arquivo .prof completo, para abrir no snakeviz/pstats. A resposta
+traz o cabeçalho X-Profile-Id com o id do perfil.
+
+Sem a flag o custo é só a checagem da query string/cabeçalho: o usuário nem
+é carregado. Deve ficar no fim da lista MIDDLEWARE (depois da autenticação):
+o perfil envolve o handler do Django, então o process_view do CSRF e dos
+outros middlewares, o ATOMIC_REQUESTS e o process_exception continuam valendo.
+"""
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import time
+import uuid
+
+from .models import RequestProfile
+from .perf import current_stats
+
+logger = logging.getLogger(__name__)
+
+PROFILE_QUERY_PARAM = '_profile'
+PROFILE_HEADER = 'X-Profile'
+# Linhas do resumo gravado (funções ordenadas por tempo acumulado)
+PROFILE_SUMMARY_LINES = 60
+# Perfis mantidos no banco; os mais antigos são apagados
+PROFILE_KEEP = 200
+
+
+def profile_requested(request):
+    if request.GET.get(PROFILE_QUERY_PARAM) == '1' or request.headers.get(PROFILE_HEADER) == '1':
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_authenticated and user.is_staff)
+    return False
+
+
+def summarize(profiler):
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(PROFILE_SUMMARY_LINES)
+    return out.getvalue()
+
+
+def save_profile(request, response, profiler, duration_ms, db_queries, db_ms):
+    profiler.create_stats()
+    # Mesmo formato do profiler.dump_stats(): abre com pstats.Stats('arquivo.prof').
+    # Serializado antes do resumo, porque pstats.Stats(profiler) esvazia profiler.stats
+    data = marshal.dumps(profiler.stats)
+    match = getattr(request, 'resolver_match', None)
+    profile = RequestProfile.objects.create(
+        request_id=uuid.uuid4().hex,
+        method=request.method,
+        path=request.get_full_path()[:500],
+        view_name=(match.view_name if match else '')[:200],
+        tenant_slug=(match.kwargs.get('slug', '') if match else '')[:100],
+        user=request.user,
+        status_code=getattr(response, 'status_code', None),
+        duration_ms=duration_ms,
+        db_queries=db_queries,
+        db_ms=db_ms,
+        stats_text=summarize(profiler),
+        profile_data=data,
+    )
+
+    stale = RequestProfile.objects.order_by('-id').values_list('id', flat=True)[PROFILE_KEEP:PROFILE_KEEP + 1]
+    if stale:
+        RequestProfile.objects.filter(id__lte=stale[0]).delete()
+    return profile
+
+
+class ProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profile_requested(request):
+            return self.get_response(request)
+
+        stats = current_stats()
+        queries_before = stats.db_queries if stats else 0
+        db_ms_before = stats.db_ms if stats else 0.0
+
+        # Perfila o handler inteiro: resolução da URL, process_view dos outros
+        # middlewares, transação da view (ATOMIC_REQUESTS), render do template
+        # e a conversão de exceções em resposta (process_exception)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        except Exception:
+            # Exceção que escapou do handler: grava o perfil parcial e segue o caminho normal
+            profiler.disable()
+            self.record(request, None, profiler, started, stats, queries_before, db_ms_before)
+            raise
+        profiler.disable()
+
+        # Stream (SSE): o corpo é gerado depois, o perfil não diria nada
+        if not getattr(response, 'streaming', False):
+            profile = self.record(request, response, profiler, started, stats, queries_before, db_ms_before)
+            if profile is not None:
+                response['X-Profile-Id'] = profile.request_id
+        return response
+
+    def record(self, request, response, profiler, started, stats, queries_before, db_ms_before):
+        duration_ms = (time.perf_counter() - started) * 1000
+        try:
+            profile = save_profile(
+                request, response, profiler, duration_ms,
+                db_queries=(stats.db_queries - queries_before) if stats else 0,
+                db_ms=(stats.db_ms - db_ms_before) if stats else 0.0,
+            )
+        except Exception as e:
+            logger.error(f'[PROFILE] Erro ao gravar perfil de {request.path}: {e}')
+            return None
+        logger.info(f'[PROFILE] {request.method} {request.path} perfilado em {duration_ms:.0f}ms (#{profile.id})')
+        return profile
@@ -0,0 +1,310 @@
+"""
+Envio de notificações push (Web Push / VAPID) para os clientes das lojas.
+
+Chamado pelos workers da fila de jobs (tenants/tasks.py), nunca direto na
+requisição: cada push é uma chamada HTTPS ao serviço do navegador.
+
+Envios para muitas inscrições passam pelo PushFanout: criptografia e POST
+rodam em paralelo num pool de threads, cada thread reaproveita uma conexão
+por serviço de push (FCM, Mozilla, Apple...) e as inscrições expiradas são
+desativadas num único UPDATE no final.
+
+O cabeçalho VAPID (JWT assinado) depende só do serviço de push, não do
+destinatário: o VapidSigner assina uma vez por origem e reaproveita o token
+até perto de expirar.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+from py_vapid import Vapid
+from pywebpush import webpush, WebPushException
+
+from .metrics import PUSH_SENT
+from .models import PushSubscription
+
+logger = logging.getLogger(__name__)
+
+# Envios simultâneos por fan-out (o trabalho é quase todo espera de rede)
+PUSH_MAX_WORKERS = 16
+# Tempo máximo de espera pela resposta do serviço de push
+PUSH_TIMEOUT_SECONDS = 10
+# Respostas que indicam inscrição expirada ou cancelada pelo navegador
+EXPIRED_STATUS_CODES = frozenset({404, 410})
+# De quantos em quantos envios o callback de progresso é chamado
+PUSH_PROGRESS_EVERY = 100
+# Validade do JWT VAPID (o máximo aceito pelos serviços de push é 24h)
+VAPID_TOKEN_TTL = 60 * 60 * 12
+# O token em cache é renovado com essa folga antes de expirar
+VAPID_TOKEN_REFRESH_MARGIN = 60 * 10
+
+
+def _push_origin(endpoint):
+    parts = urlsplit(endpoint)
+    return f'{parts.scheme}://{parts.netloc}'
+
+
+class VapidSigner:
+    """
+    Chave VAPID carregada uma vez e cabeçalhos Authorization em cache por
+    origem do serviço de push (o 'aud' do JWT).
+    """
+
+    def __init__(self, private_key, claim_email):
+        if os.path.isfile(private_key):
+            self.vapid = Vapid.from_file(private_key_file=private_key)
+        else:
+            self.vapid = Vapid.from_string(private_key=private_key)
+        self.claim_email = claim_email
+        self._headers = {}
+        self._lock = threading.Lock()
+
+    def headers_for(self, endpoint):
+        """Cabeçalhos VAPID para o endpoint, assinando só quando o token da origem expira."""
+        origin = _push_origin(endpoint)
+        now = time.time()
+
+        with self._lock:
+            cached = self._headers.get(origin)
+            if cached and cached[1] > now:
+                return cached[0]
+
+            expires_at = int(now) + VAPID_TOKEN_TTL
+            headers = self.vapid.sign({'aud': origin, 'exp': expires_at, 'sub': self.claim_email})
+            self._headers[origin] = (headers, expires_at - VAPID_TOKEN_REFRESH_MARGIN)
+            return headers
+
+
+@functools.lru_cache(maxsize=4)
+def get_vapid_signer(private_key, claim_email):
+    """Um VapidSigner por processo (por chave), compartilhado entre os envios."""
+    return VapidSigner(private_key, claim_email)
+
+
+class PushFanout:
+    """
+    Envia a mesma notificação para várias inscrições em paralelo.
+
+    Só faz HTTP: quem chama carrega as inscrições e grava o resultado no banco
+    (as threads do pool não abrem conexão com o banco).
+    """
+
+    def __init__(self, signer, max_workers=PUSH_MAX_WORKERS, timeout=PUSH_TIMEOUT_SECONDS):
+        self.signer = signer
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+
+    def _session(self, endpoint):
+        """Sessão HTTP da thread atual para o serviço de push do endpoint (keep-alive)."""
+        sessions = getattr(self._local, 'sessions', None)
+        if sessions is None:
+            sessions = self._local.sessions = {}
+
+        origin = _push_origin(endpoint)
+        session = sessions.get(origin)
+        if session is None:
+            session = sessions[origin] = requests.Session()
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def send_one(self, subscription_info, data):
+        """Envia um push. Retorna 'sent', 'expired' ou 'failed'."""
+        endpoint = subscription_info['endpoint']
+        try:
+            # Sem vapid_claims: o webpush não reassina, usa o cabeçalho em cache
+            webpush(
+                subscription_info=subscription_info,
+                data=data,
+                headers=self.signer.headers_for(endpoint),
+                timeout=self.timeout,
+                requests_session=self._session(endpoint),
+            )
+            return 'sent'
+        except WebPushException as e:
+            status_code = e.response.status_code if e.response is not None else None
+            if status_code in EXPIRED_STATUS_CODES:
+                return 'expired'
+            logger.warning(f'[PUSH] Falha ao enviar para {_push_origin(endpoint)}: {e}')
+            return 'failed'
+        except Exception as e:
+            logger.warning(f'[PUSH] Erro ao enviar para {_push_origin(endpoint)}: {e}')
+            return 'failed'
+
+    def send(self, subscriptions, data, progress=None):
+        """
+        Envia `data` (str JSON) para cada (id, subscription_info) de `subscriptions`.
+        progress(stats) é chamado a cada PUSH_PROGRESS_EVERY envios, na thread de quem chamou.
+        Retorna {'total', 'sent', 'failed', 'expired', 'expired_ids'}.
+        """
+        subscriptions = list(subscriptions)
+        stats = {'total': len(subscriptions), 'sent': 0, 'failed': 0, 'expired': 0}
+        expired_ids = []
+
+        if not subscriptions:
+            return {**stats, 'expired_ids': expired_ids}
+
+        workers = min(self.max_workers, len(subscriptions))
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='push') as pool:
+                futures = {
+                    pool.submit(self.send_one, info, data): sub_id
+                    for sub_id, info in subscriptions
+                }
+                for done, future in enumerate(as_completed(futures), 1):
+                    outcome = future.result()
+                    stats[outcome] += 1
+                    PUSH_SENT.inc(outcome=outcome)
+                    if outcome == 'expired':
+                        expired_ids.append(futures[future])
+
+                    if progress and done % PUSH_PROGRESS_EVERY == 0:
+                        progress(dict(stats))
+        finally:
+            with self._sessions_lock:
+                for session in self._sessions:
+                    session.close()
+                self._sessions.clear()
+
+        return {**stats, 'expired_ids': expired_ids}
+
+
+def get_push_fanout():
+    """PushFanout com as chaves VAPID do settings, ou None se não configurado."""
+    vapid_private_key = getattr(settings, 'VAPID_PRIVATE_KEY', None)
+    if not vapid_private_key:
+        return None
+    vapid_claim_email = getattr(settings, 'VAPID_CLAIM_EMAIL', 'mailto:admin@admin.com')
+    return PushFanout(get_vapid_signer(vapid_private_key, vapid_claim_email))
+
+
+def deactivate_subscriptions(subscription_ids):
+    """Marca como inativas as inscrições expiradas, num único UPDATE."""
+    if not subscription_ids:
+        return 0
+    return PushSubscription.objects.filter(id__in=subscription_ids).update(
+        is_active=False, updated_at=timezone.now()
+    )
+
+
+def fanout_subscriptions(fanout, subscriptions, data, progress=None):
+    """Envia para o queryset de inscrições e desativa as expiradas. Retorna os totais."""
+    rows = subscriptions.values_list('id', 'endpoint', 'p256dh', 'auth')
+    targets = [
+        (sub_id, {'endpoint': endpoint, 'keys': {'p256dh': p256dh, 'auth': auth}})
+        for sub_id, endpoint, p256dh, auth in rows
+    ]
+
+    result = fanout.send(targets, data, progress=progress)
+    deactivate_subscriptions(result.pop('expired_ids'))
+    return result
+
+
+def broadcast_push(tenant, title, body, url, notification_type='custom', progress=None):
+    """
+    Envia uma notificação manual (promoção, cupom, aviso) para todos os
+    inscritos ativos da loja. Retorna {'total', 'sent', 'failed', 'expired'}.
+    """
+    fanout = get_push_fanout()
+    if fanout is None:
+        raise RuntimeError('VAPID private key não configurada no settings.py')
+
+    icon_url = tenant.logo.url if tenant.logo else '/static/img/icon-192.svg'
+    data = json.dumps({
+        'title': title,
+        'body': body,
+        'icon': icon_url,
+        'badge': '/static/img/badge-72.png',
+        'url': url,
+        'tag': f'push-manual-{notification_type}-{int(timezone.now().timestamp())}',
+        'extra': {
+            'type': notification_type,
+            'tenant_slug': tenant.slug
+        }
+    })
+
+    subscriptions = PushSubscription.objects.filter(tenant=tenant, is_active=True)
+    result = fanout_subscriptions(fanout, subscriptions, data, progress=progress)
+
+    logger.info(
+        f'[PUSH MANUAL] {tenant.slug}: {result["sent"]} enviados, '
+        f'{result["failed"]} falharam, {result["expired"]} expirados'
+    )
+    return result
+
+
+def send_push_notification(order, tenant, custom_title=None, custom_body=None):
+    try:
+        fanout = get_push_fanout()
+
+        if fanout is None:
+            return {'success': False, 'error': 'VAPID key not configured'}
+
+        # Lógica de Mensagem
+        subscriptions = PushSubscription.objects.none()
+
+        if custom_body:
+            # Notificação Manual (Promoção/Aviso) -> Envia para TODOS
+            title = custom_title or tenant.name
+            body = custom_body
+            url = f"/{tenant.slug}/"
+            subscriptions = PushSubscription.objects.filter(tenant=tenant, is_active=True)
+
+        elif order:
+            # Notificação de Pedido -> Envia APENAS para o CLIENTE ESPECÍFICO
+            title = f"🔔 Atualização do Pedido #{order.id}"
+            url = f"/{tenant.slug}/meus-pedidos/"
+
+            if order.status == 'saiu_entrega':
+                body = f"🏍️ Seu pedido saiu para entrega! Acompanhe."
+            else:
+                body = f"Status atualizado para: {order.get_status_display()}"
+
+            # CORREÇÃO: Filtrar pelo telefone
+            if order.customer_phone:
+                # Garante que só temos números para comparar
+                target_phone = ''.join(filter(str.isdigit, order.customer_phone))
+
+                subscriptions = PushSubscription.objects.filter(
+                    tenant=tenant,
+                    is_active=True,
+                    customer_phone=target_phone
+                )
+            else:
+                logger.warning("[PUSH] Pedido sem telefone, impossível notificar.")
+                return {'success': False, 'error': 'Pedido sem telefone'}
+
+        else:
+            return {'success': False, 'error': 'Sem contexto'}
+
+        # Envio
+        icon_url = tenant.logo.url if tenant.logo else '/static/img/icon-192.svg'
+        data = json.dumps({
+            'title': title,
+            'body': body,
+            'icon': icon_url,
+            'url': url
+        })
+        result = fanout_subscriptions(fanout, subscriptions, data)
+
+        if order and not custom_body and result['total'] == 0:
+            logger.warning(f"[PUSH] Nenhuma inscrição encontrada para o telefone {target_phone}")
+            return {'success': False, 'error': 'Cliente não inscrito no push'}
+
+        logger.info(f"[PUSH] Enviado para {result['sent']} dispositivos.")
+        return {'success': True, **result}
+
+    except Exception as e:
+        logger.error(f"[PUSH] Erro crítico: {e}")
+        return {'success': False, 'error': str(e)}
@@ -0,0 +1,123 @@
+"""
+Avaliador do horário semanal de funcionamento.
+
+Os OperatingDay da loja são compilados uma única vez em uma lista ordenada de
+fronteiras (abre/fecha) em minutos da semana, já tratando horários que viram a
+madrugada (ex: 18:00 às 02:00). A consulta "está aberta agora?" vira uma busca
+binária sobre no máximo 42 inteiros, sem nenhuma consulta ao banco, e também
+devolve quando acontece a próxima abertura/fechamento.
+"""
+from bisect import bisect_right
+from datetime import timedelta
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Mesmo índice do model OperatingDay (0=Domingo ... 6=Sábado)
+DAY_NAMES = ['Domingo', 'Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado']
+
+
+def _to_minutes(value):
+    if value is None:
+        return None
+    return value.hour * 60 + value.minute
+
+
+def _format_minutes(minutes):
+    minutes %= MINUTES_PER_DAY
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+class WeeklySchedule:
+    """
+    Horário semanal pré-compilado de uma loja.
+
+    rules: {dia: (abre_em_minutos, fecha_em_minutos, fechado_no_dia)}
+    """
+
+    def __init__(self, rules):
+        self.rules = dict(rules)
+
+        intervals = []
+        for day, (open_min, close_min, is_closed) in self.rules.items():
+            if is_closed or open_min is None or close_min is None or open_min == close_min:
+                continue
+
+            start = day * MINUTES_PER_DAY + open_min
+            if close_min > open_min:
+                end = day * MINUTES_PER_DAY + close_min
+            else:
+                # Vira a madrugada: fecha no dia seguinte
+                end = (day + 1) * MINUTES_PER_DAY + close_min
+
+            # Copia a semana anterior e a seguinte para que a virada de
+            # Sábado -> Domingo e a "próxima transição" nunca precisem de casos especiais
+            for shift in (-MINUTES_PER_WEEK, 0, MINUTES_PER_WEEK):
+                intervals.append((start + shift, end + shift))
+
+        intervals.sort()
+
+        # Fronteiras achatadas [abre, fecha, abre, fecha, ...], com intervalos
+        # encostados/sobrepostos unidos (ex: 18:00-00:00 seguido de 00:00-02:00)
+        bounds = []
+        for start, end in intervals:
+            if bounds and start <= bounds[-1]:
+                bounds[-1] = max(bounds[-1], end)
+            else:
+                bounds.extend((start, end))
+        self._bounds = bounds
+
+    @classmethod
+    def from_operating_days(cls, days):
+        """Compila a partir de objetos OperatingDay."""
+        return cls({
+            d.day: (_to_minutes(d.open_time), _to_minutes(d.close_time), d.is_closed)
+            for d in days
+        })
+
+    def state_at(self, minute_of_week):
+        """
+        Retorna (aberta, minuto_da_próxima_transição) para um minuto da semana.
+        O minuto da próxima transição pode passar de MINUTES_PER_WEEK (semana seguinte)
+        e é None quando a loja nunca abre.
+        """
+        index = bisect_right(self._bounds, minute_of_week)
+        is_open = index % 2 == 1
+        next_transition = self._bounds[index] if index < len(self._bounds) else None
+        return is_open, next_transition
+
+    def status(self, now):
+        """
+        Avalia o horário para um datetime local.
+        Retorna (aberta, mensagem, datetime_da_próxima_transição ou None).
+        As mensagens são as mesmas exibidas pelo cardápio.
+        """
+        # Converter Python weekday (0=Segunda...6=Domingo) para model (0=Domingo...6=Sábado)
+        today = (now.weekday() + 1) % 7
+        minute = today * MINUTES_PER_DAY + now.hour * 60 + now.minute
+
+        is_open, next_transition = self.state_at(minute)
+
+        transition_at = None
+        if next_transition is not None:
+            transition_at = now.replace(second=0, microsecond=0) + timedelta(minutes=next_transition - minute)
+
+        if is_open:
+            return True, f'ABERTO - Fecha as {_format_minutes(next_transition)}', transition_at
+
+        if next_transition is None:
+            return False, 'FECHADO HOJE', None
+
+        if next_transition < (today + 1) * MINUTES_PER_DAY:
+            # Ainda abre hoje
+            return False, f'FECHADO AGORA - ABRE AS {_format_minutes(next_transition)}', transition_at
+
+        today_rule = self.rules.get(today)
+        if today_rule:
+            open_min, close_min, is_closed = today_rule
+            if is_closed or (open_min is not None and close_min is not None):
+                # Hoje está marcado como fechado ou o horário de hoje já passou
+                return False, 'FECHADO HOJE', transition_at
+
+        day_name = DAY_NAMES[(next_transition // MINUTES_PER_DAY) % 7]
+        return False, f'FECHADO - ABRE {day_name} às {_format_minutes(next_transition)}', transition_at
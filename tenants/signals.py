@@ -0,0 +1,25 @@
+"""
+Sinais do app tenants.
+
+Mantém os caches locais em memória (que não passam pelo cache do Django)
+coerentes quando uma loja é alterada ou removida.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .access import invalidate_tenant_ref
+from .middleware import domain_cache
+from .models import Tenant
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def tenant_changed(sender, instance, **kwargs):
+    # Remove o domínio novo (pode estar no cache negativo) e o antigo (aponta pro id)
+    domain = (instance.custom_domain or '').lower().replace('www.', '') or None
+    domain_cache.discard(
+        lambda host, ref: host == domain or (ref is not None and ref.id == instance.id)
+    )
+
+    # slug -> dono usado pelas APIs do painel
+    invalidate_tenant_ref(instance)
@@ -0,0 +1,83 @@
+"""
+Tarefas executadas pela fila de jobs (ver tenants/jobs.py).
+
+Cada tarefa recebe o payload do job como kwargs e deve ser segura para rodar
+mais de uma vez: em caso de erro o job é tentado de novo com backoff.
+"""
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+
+from .jobs import task, report_progress
+from .models import Order, Tenant
+from .payments import create_pix_payment, process_payment_notification, mark_pix_failed
+from .push import broadcast_push, send_push_notification
+
+logger = logging.getLogger(__name__)
+
+
+# ========================
+# PUSH
+# ========================
+
+@task('push.order_status', max_attempts=3)
+def push_order_status(order_id):
+    """Avisa o cliente sobre a mudança de status do pedido."""
+    order = Order.objects.select_related('tenant').filter(pk=order_id).first()
+    if not order:
+        return {'success': False, 'error': 'Pedido não encontrado'}
+    return send_push_notification(order, order.tenant)
+
+
+# Sem novas tentativas: repetir reenviaria a notificação para quem já recebeu
+@task('push.broadcast', max_attempts=1, bind=True)
+def push_broadcast(job, tenant_id, title, body, url, notification_type='custom'):
+    """Notificação manual do lojista para todos os inscritos; o progresso fica em Job.result."""
+    tenant = Tenant.objects.get(pk=tenant_id)
+    return broadcast_push(
+        tenant, title, body, url,
+        notification_type=notification_type,
+        progress=lambda stats: report_progress(job, stats),
+    )
+
+
+# ========================
+# EMAIL
+# ========================
+
+@task('email.send')
+def send_email(subject, text, to, html=None):
+    """Envia um email (texto + HTML opcional). Falha de SMTP gera nova tentativa."""
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=text,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=to
+    )
+    if html:
+        email.attach_alternative(html, "text/html")
+    email.send(fail_silently=False)
+    logger.info(f'[EMAIL] Email "{subject}" enviado para {", ".join(to)}')
+    return {'sent': len(to)}
+
+
+# ========================
+# MERCADO PAGO
+# ========================
+
+def _pix_dead_letter(job):
+    # Sem PIX automático: o frontend para de esperar e segue o fluxo manual
+    mark_pix_failed(job.payload.get('order_id'))
+
+
+# Poucas tentativas: o cliente está esperando o QR Code na tela
+@task('mp.create_pix', max_attempts=3, on_dead_letter=_pix_dead_letter)
+def mp_create_pix(order_id):
+    pix_data = create_pix_payment(order_id)
+    return {'created': pix_data is not None}
+
+
+@task('mp.webhook', max_attempts=6)
+def mp_webhook(payment_id):
+    return {'status': process_payment_notification(payment_id)}
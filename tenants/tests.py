@@ -1,3 +1,1775 @@
-from django.test import TestCase
+import base64
+import importlib
+import json
+import os
+import pstats
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import pytest
+from asgiref.sync import sync_to_async
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from django.apps import apps as django_apps
+from django.contrib import admin as django_admin
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from django.utils import timezone
+from py_vapid import Vapid02
+
+from .events import _publish, changed_order_ids, current_seq, ensure_seq, ORDER_EVENTS_LOG_SIZE
+from .management.commands.bench_http import SCENARIOS, percentile
+from .management.commands.bench_zones import random_points, synthetic_zones
+from .metrics import Counter as MetricsCounter, Histogram as MetricsHistogram, Registry as MetricsRegistry
+from .jobs import TASKS, claim_jobs, enqueue, release_stale_jobs, report_progress, run_pending, task, STALE_LOCK_SECONDS
+from . import urls as tenant_urls
+from .access import tenant_ref_cache
+from .middleware import domain_cache
+from .cache import bump_menu_version, get_store_status
+from .cep_index import CepIndex, lookup_cep
+from .zones import ZoneIndex, get_zone_index
+from .neighborhoods import get_neighborhood_index, search_key
+from .models import (
+    Category, Coupon, CouponUsage, DeliveryFee, DeliveryZone, GroupItem, Job, OperatingDay, OptionItem, Order,
+    OrderItem, Product, ProductGroup, ProductOption, PushSubscription, RequestProfile, Table, Tenant,
+    TenantPaymentConfig,
+)
+from .payments import make_pix_token, mark_pix_failed
+from .push import get_vapid_signer
+from .views import _load_cart_prices
+from .schedule import WeeklySchedule
+
+
+# ========================
+# LOJA DE TESTE (dono, loja e horários)
+# ========================
+
+# Horário que deixa a loja aberta o dia todo nos testes de pedido
+OPEN_ALL_DAY = (dtime(0, 0), dtime(23, 59))
+
+
+class StoreTestMixin:
+    """Loja de teste comum: limpa os caches e cria self.owner e self.tenant."""
+
+    def make_store(self, name, slug, hours=None):
+        """`hours` = (abertura, fechamento) cadastra o mesmo horário nos 7 dias."""
+        cache.clear()
+        tenant_ref_cache.clear()
+        self.owner = User.objects.create_user('dono@loja.com', 'dono@loja.com', 'senha-segura-123')
+        self.tenant = Tenant.objects.create(name=name, slug=slug, owner=self.owner)
+        if hours:
+            open_time, close_time = hours
+            for day in range(7):
+                OperatingDay.objects.create(tenant=self.tenant, day=day, open_time=open_time, close_time=close_time)
+        return self.tenant
+
+
+# ========================
+# HORÁRIO SEMANAL (WeeklySchedule)
+# ========================
+
+def _minutes(hour, minute=0):
+    return hour * 60 + minute
+
+
+# 2026-10-17 é um sábado
+SATURDAY = datetime(2026, 10, 17)
+SUNDAY = datetime(2026, 10, 18)
+MONDAY = datetime(2026, 10, 19)
+
+
+class WeeklyScheduleTests(SimpleTestCase):
+    def test_overnight_span(self):
+        # Sábado 18:00 -> Domingo 02:00
+        schedule = WeeklySchedule({6: (_minutes(18), _minutes(2), False)})
+
+        self.assertEqual(
+            schedule.status(SATURDAY.replace(hour=20)),
+            (True, 'ABERTO - Fecha as 02:00', SUNDAY.replace(hour=2)),
+        )
+        self.assertEqual(
+            schedule.status(SATURDAY.replace(hour=10)),
+            (False, 'FECHADO AGORA - ABRE AS 18:00', SATURDAY.replace(hour=18)),
+        )
+
+    def test_week_boundary(self):
+        schedule = WeeklySchedule({6: (_minutes(18), _minutes(2), False)})
+
+        # Domingo de madrugada ainda é o expediente de sábado (semana anterior)
+        self.assertEqual(
+            schedule.status(SUNDAY.replace(hour=1, minute=30)),
+            (True, 'ABERTO - Fecha as 02:00', SUNDAY.replace(hour=2)),
+        )
+        self.assertEqual(
+            schedule.status(SUNDAY.replace(hour=3)),
+            (False, 'FECHADO - ABRE Sábado às 18:00', datetime(2026, 10, 24, 18, 0)),
+        )
+
+    def test_adjacent_intervals_merge(self):
+        # Segunda 18:00-00:00 + Terça 00:00-02:00 = um expediente só
+        schedule = WeeklySchedule({
+            1: (_minutes(18), _minutes(0), False),
+            2: (_minutes(0), _minutes(2), False),
+        })
+        self.assertEqual(
+            schedule.status(MONDAY.replace(hour=23)),
+            (True, 'ABERTO - Fecha as 02:00', datetime(2026, 10, 20, 2, 0)),
+        )
+
+        # Sábado até meia-noite + Domingo desde 00:00, atravessando a semana
+        schedule = WeeklySchedule({
+            6: (_minutes(18), _minutes(0), False),
+            0: (_minutes(0), _minutes(23, 59), False),
+        })
+        self.assertEqual(
+            schedule.status(SATURDAY.replace(hour=23)),
+            (True, 'ABERTO - Fecha as 23:59', SUNDAY.replace(hour=23, minute=59)),
+        )
+
+    def test_day_without_hours(self):
+        schedule = WeeklySchedule({
+            1: (_minutes(10), _minutes(22), True),
+            2: (_minutes(10), _minutes(22), False),
+            # Abre e fecha no mesmo horário: não abre
+            3: (_minutes(10), _minutes(10), False),
+        })
+        self.assertEqual(
+            schedule.status(MONDAY.replace(hour=12)),
+            (False, 'FECHADO HOJE', datetime(2026, 10, 20, 10, 0)),
+        )
+        # Quarta (abre == fecha) também é dia sem expediente
+        self.assertEqual(
+            schedule.status(datetime(2026, 10, 21, 12, 0)),
+            (False, 'FECHADO HOJE', datetime(2026, 10, 27, 10, 0)),
+        )
+        self.assertEqual(schedule.status(SUNDAY.replace(hour=12))[1], 'FECHADO - ABRE Terça às 10:00')
+
+    def test_never_opens(self):
+        self.assertEqual(WeeklySchedule({}).status(SATURDAY), (False, 'FECHADO HOJE', None))
+        schedule = WeeklySchedule({day: (_minutes(8), _minutes(18), True) for day in range(7)})
+        self.assertEqual(schedule.status(SATURDAY.replace(hour=12)), (False, 'FECHADO HOJE', None))
+
+
+# ========================
+# FILA DE JOBS
+# ========================
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        self.dead = []
+
+        @task('test.ok')
+        def ok(value):
+            self.calls.append(value)
+            return {'double': value * 2}
+
+        @task('test.fail', max_attempts=2, on_dead_letter=lambda job: self.dead.append(job.id))
+        def fail():
+            raise RuntimeError('boom')
+
+    def tearDown(self):
+        TASKS.pop('test.ok', None)
+        TASKS.pop('test.fail', None)
+
+    def test_enqueue_and_run(self):
+        job = enqueue('test.ok', {'value': 21})
+
+        self.assertEqual(run_pending(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.result, {'double': 42})
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(self.calls, [21])
+
+    def test_unknown_task_is_rejected(self):
+        with self.assertRaises(ValueError):
+            enqueue('test.nao_existe')
+
+    def test_future_jobs_wait(self):
+        enqueue('test.ok', {'value': 1}, run_at=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(run_pending(), 0)
+
+    def test_claim_is_exclusive(self):
+        enqueue('test.ok', {'value': 1})
+
+        first = claim_jobs('worker-a', limit=5)
+        second = claim_jobs('worker-b', limit=5)
+
+        self.assertEqual(len(first), 1)
+        self.assertEqual(second, [])
+        self.assertEqual(Job.objects.get().locked_by, 'worker-a')
+
+    def test_retry_with_backoff_then_dead_letter(self):
+        job = enqueue('test.fail')
+
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'pending')
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('boom', job.last_error)
+
+        # Backoff ainda não passou
+        self.assertEqual(run_pending(), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(self.dead, [job.id])
+
+    def test_release_stale_jobs(self):
+        job = enqueue('test.ok', {'value': 3})
+        Job.objects.filter(pk=job.pk).update(
+            status='running',
+            locked_by='worker-morto',
+            locked_at=timezone.now() - timedelta(seconds=STALE_LOCK_SECONDS + 1),
+        )
+
+        self.assertEqual(release_stale_jobs(), 1)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(self.calls, [3])
+
+    def test_stale_job_without_attempts_goes_to_dead_letter(self):
+        # Como o push.broadcast: uma tentativa só, já gasta pelo worker que morreu
+        job = enqueue('test.fail', max_attempts=1)
+        Job.objects.filter(pk=job.pk).update(
+            status='running', attempts=1, locked_by='worker-morto',
+            locked_at=timezone.now() - timedelta(seconds=STALE_LOCK_SECONDS + 1),
+        )
+
+        self.assertEqual(release_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('worker-morto', job.last_error)
+        self.assertEqual(self.dead, [job.id])
+
+        # Mesmo se voltar para 'pending' por fora, não é reservado de novo
+        Job.objects.filter(pk=job.pk).update(status='pending')
+        self.assertEqual(claim_jobs('worker-a', limit=5), [])
+
+    def test_heartbeat_keeps_long_job_locked(self):
+        enqueue('test.ok', {'value': 1})
+        job = claim_jobs('worker-a')[0]
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=STALE_LOCK_SECONDS + 1))
+
+        report_progress(job, {'sent': 10})
+        self.assertEqual(release_stale_jobs(), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), ('running', 'worker-a'))
+
+
+# ========================
+# PUSH EM MASSA
+# ========================
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+class FakePushHandler(BaseHTTPRequestHandler):
+    """Serviço de push falso: /ok/ aceita, /gone/ responde 410, /erro/ responde 500."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.received.append(self.path)
+        if self.path.startswith('/ok/'):
+            status = 201
+        elif self.path.startswith('/gone/'):
+            status = 410
+        else:
+            status = 500
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PushBroadcastTests(StoreTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakePushHandler)
+        cls.server.received = []
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+
+        vapid = Vapid02()
+        vapid.generate_keys()
+        cls.vapid_private_key = _b64url(vapid.private_key.private_numbers().private_value.to_bytes(32, 'big'))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.received.clear()
+        self.make_store('Loja Push', 'loja-push')
+
+    def subscribe(self, path):
+        public_key = ec.generate_private_key(ec.SECP256R1()).public_key()
+        p256dh = public_key.public_bytes(serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint)
+        return PushSubscription.objects.create(
+            tenant=self.tenant,
+            endpoint=f'{self.base_url}{path}',
+            p256dh=_b64url(p256dh),
+            auth=_b64url(os.urandom(16)),
+        )
+
+    def test_broadcast_job_sends_and_deactivates_expired(self):
+        ok = [self.subscribe(f'/ok/{i}') for i in range(5)]
+        gone = [self.subscribe(f'/gone/{i}') for i in range(3)]
+        broken = self.subscribe('/erro/1')
+
+        self.client.force_login(self.owner)
+        with override_settings(VAPID_PRIVATE_KEY=self.vapid_private_key):
+            response = self.client.post(
+                reverse('api_push_send', kwargs={'slug': self.tenant.slug}),
+                data={'title': 'Promoção', 'body': 'Hoje tem desconto'},
+                content_type='application/json',
+            )
+            data = response.json()
+            self.assertEqual(data['status'], 'success')
+            self.assertEqual(data['total'], 9)
+            # A view só enfileira: nada foi enviado ainda
+            self.assertEqual(self.server.received, [])
+
+            self.assertEqual(run_pending(), 1)
+
+        status = self.client.get(data['status_url']).json()
+        self.assertEqual(status['job_status'], 'done')
+        self.assertEqual(
+            (status['sent'], status['expired'], status['failed']), (5, 3, 1)
+        )
+        self.assertEqual(len(self.server.received), 9)
+
+        inactive = set(PushSubscription.objects.filter(is_active=False).values_list('id', flat=True))
+        self.assertEqual(inactive, {sub.id for sub in gone})
+        self.assertTrue(all(PushSubscription.objects.get(pk=sub.id).is_active for sub in ok + [broken]))
+
+    def test_vapid_header_signed_once_per_push_service(self):
+        signer = get_vapid_signer(self.vapid_private_key, 'mailto:teste@loja.com')
+        signer._headers.clear()
+
+        with mock.patch.object(signer.vapid, 'sign', wraps=signer.vapid.sign) as sign:
+            first = signer.headers_for(f'{self.base_url}/ok/1')
+            second = signer.headers_for(f'{self.base_url}/ok/2')
+            other = signer.headers_for('https://fcm.googleapis.com/fcm/send/abc')
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual(sign.call_count, 2)
+
+    def test_job_status_is_scoped_to_tenant(self):
+        other_owner = User.objects.create_user('outro@loja.com', 'outro@loja.com', 'senha-segura-123')
+        other = Tenant.objects.create(name='Outra', slug='outra-loja', owner=other_owner)
+        job = enqueue('push.broadcast', {
+            'tenant_id': self.tenant.id, 'title': 't', 'body': 'b', 'url': '/',
+        })
+
+        self.client.force_login(other_owner)
+        response = self.client.get(reverse('api_push_job_status', kwargs={'slug': other.slug, 'job_id': job.id}))
+        self.assertEqual(response.status_code, 404)
+
+
+# ========================
+# ACESSO AO PAINEL (tenant_owner_required)
+# ========================
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class TenantOwnerAccessTests(StoreTestMixin, TestCase):
+    def setUp(self):
+        self.make_store('Loja Dono', 'loja-dono')
+        self.intruder = User.objects.create_user('outro@loja.com', 'outro@loja.com', 'senha-segura-123')
+        self.other = Tenant.objects.create(name='Loja Outro', slug='loja-outro', owner=self.intruder)
+
+    def url(self, name):
+        return reverse(name, kwargs={'slug': self.tenant.slug})
+
+    def requests(self):
+        return [
+            ('get', self.url('api_get_orders'), None),
+            ('post', self.url('api_update_settings'), {'name': 'Loja Dono Editada'}),
+            ('post', self.url('api_push_send'), {'title': 'Promoção', 'body': 'Hoje tem desconto'}),
+        ]
+
+    def call(self, method, url, data):
+        if method == 'get':
+            return self.client.get(url)
+        return self.client.post(url, data=json.dumps(data), content_type='application/json')
+
+    def test_owner_is_allowed(self):
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(self.url('painel_lojista')).status_code, 200)
+        for method, url, data in self.requests():
+            response = self.call(method, url, data)
+            self.assertNotIn(response.status_code, (302, 403, 404), url)
+
+    def test_non_owner_is_denied(self):
+        self.client.force_login(self.intruder)
+        # O painel manda o usuário para a própria loja
+        response = self.client.get(self.url('painel_lojista'))
+        self.assertRedirects(response, reverse('painel_lojista', kwargs={'slug': self.other.slug}), fetch_redirect_response=False)
+
+        for method, url, data in self.requests():
+            response = self.call(method, url, data)
+            self.assertEqual(response.status_code, 403, url)
+            self.assertEqual(response.json()['message'], 'Acesso negado')
+
+        self.tenant.refresh_from_db()
+        self.assertEqual(self.tenant.name, 'Loja Dono')
+        self.assertFalse(Job.objects.exists())
+
+    def test_anonymous_goes_to_login(self):
+        for method, url, data in self.requests():
+            response = self.call(method, url, data)
+            self.assertEqual(response.status_code, 302, url)
+            self.assertIn(reverse('custom_login'), response['Location'])
+
+
+# ========================
+# STREAM DE PEDIDOS (SSE)
+# ========================
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE, SECURE_SSL_REDIRECT=False)
+class OrderStreamTests(StoreTestMixin, TestCase):
+    def setUp(self):
+        self.make_store('Loja Stream', 'loja-stream')
+
+    def create_order(self, name='Cliente'):
+        return Order.objects.create(tenant=self.tenant, customer_name=name, customer_phone='83999999999', total_value=10)
+
+    def test_event_log_returns_changed_orders_once(self):
+        first, second = self.create_order(), self.create_order()
+        start = ensure_seq(self.tenant.id)
+
+        for order in (first, second, first):
+            _publish(self.tenant.id, order.id)
+
+        self.assertEqual(current_seq(self.tenant.id), start + 3)
+        self.assertEqual(changed_order_ids(self.tenant.id, start, start + 3), [first.id, second.id])
+        # Cliente atrasado demais (ou sem cursor) recarrega tudo
+        self.assertIsNone(changed_order_ids(self.tenant.id, start - ORDER_EVENTS_LOG_SIZE, start + 3))
+        self.assertIsNone(changed_order_ids(self.tenant.id, 0, start + 3))
+
+    def test_order_writes_publish_after_commit(self):
+        order = self.create_order()
+        start = ensure_seq(self.tenant.id)
+        self.client.force_login(self.owner)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('api_update_order', kwargs={'slug': self.tenant.slug, 'order_id': order.id}),
+                data={'status': 'em_preparo'},
+                content_type='application/json',
+            )
+
+        self.assertEqual(changed_order_ids(self.tenant.id, start, current_seq(self.tenant.id)), [order.id])
+
+    def test_stream_requires_owner(self):
+        other = User.objects.create_user('outro@loja.com', 'outro@loja.com', 'senha-segura-123')
+        self.client.force_login(other)
+        response = self.client.get(reverse('api_orders_stream', kwargs={'slug': self.tenant.slug}))
+        self.assertEqual(response.status_code, 403)
+
+    async def test_stream_pushes_changed_orders(self):
+        order = await sync_to_async(self.create_order)('Maria')
+        await self.async_client.aforce_login(self.owner)
+
+        response = await self.async_client.get(reverse('api_orders_stream', kwargs={'slug': self.tenant.slug}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+        self.assertIn(b'event: reset', await anext(stream))
+
+        await sync_to_async(_publish)(self.tenant.id, order.id)
+        message = (await anext(stream)).decode()
+        self.assertIn('event: orders', message)
+        data = json.loads(message.split('data: ', 1)[1])
+        self.assertEqual([o['customer_name'] for o in data], ['Maria'])
+
+        await stream.aclose()
+
+
+# ========================
+# SINCRONIZAÇÃO INCREMENTAL (api_get_orders?since=)
+# ========================
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class OrdersSinceTests(StoreTestMixin, TestCase):
+    def setUp(self):
+        self.make_store('Loja Sync', 'loja-sync')
+        self.url = reverse('api_get_orders', kwargs={'slug': self.tenant.slug})
+        self.client.force_login(self.owner)
+
+    def create_order(self, name):
+        return Order.objects.create(tenant=self.tenant, customer_name=name, customer_phone='83999999999', total_value=10)
+
+    def test_since_returns_only_changed_orders(self):
+        first, second = self.create_order('Ana'), self.create_order('Bia')
+        # Pedidos alterados há mais tempo que a janela de sobreposição
+        Order.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+
+        full = self.client.get(self.url).json()
+        self.assertEqual(len(full['orders']), 2)
+        self.assertFalse(full['delta'])
+
+        unchanged = self.client.get(self.url, {'since': full['cursor']}).json()
+        self.assertEqual(unchanged['orders'], [])
+
+        second.status = 'em_preparo'
+        second.save()
+
+        delta = self.client.get(self.url, {'since': full['cursor']}).json()
+        self.assertTrue(delta['delta'])
+        self.assertEqual([o['id'] for o in delta['orders']], [second.id])
+        self.assertEqual(delta['orders'][0]['status'], 'em_preparo')
+        self.assertGreaterEqual(int(delta['cursor']), int(full['cursor']))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'since': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+# ========================
+# CONSULTAS DO PAINEL (api_get_orders)
+# ========================
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PanelOrdersQueryTests(StoreTestMixin, TestCase):
+    # sessão + usuário + loja (slug) + loja (pk) + pedidos + itens
+    EXPECTED_QUERIES = 6
+
+    def setUp(self):
+        self.make_store('Loja Painel', 'loja-painel')
+        self.coupon = Coupon.objects.create(tenant=self.tenant, code='DEZ', discount_value=10)
+        self.url = reverse('api_get_orders', kwargs={'slug': self.tenant.slug})
+        self.client.force_login(self.owner)
+
+    def create_orders(self, count):
+        for i in range(count):
+            table = Table.objects.create(tenant=self.tenant, number=Table.objects.count() + 1)
+            order = Order.objects.create(
+                tenant=self.tenant, customer_name=f'Cliente {i}', customer_phone='83999999999',
+                total_value=30, order_type='table', table=table, coupon=self.coupon,
+                pix_qr_code_base64='x' * 50_000,
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product_name=f'Produto {n}', quantity=1, price=10) for n in range(3)
+            ])
+
+    def fetch(self):
+        tenant_ref_cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), ctx
+
+    def test_query_count_does_not_grow_with_orders(self):
+        self.create_orders(2)
+        _, few = self.fetch()
+
+        self.create_orders(18)
+        data, many = self.fetch()
+
+        self.assertEqual(len(data['orders']), 20)
+        self.assertEqual(len(many), self.EXPECTED_QUERIES)
+        self.assertEqual(len(few), len(many))
+
+        order = data['orders'][0]
+        self.assertEqual(order['coupon_code'], 'DEZ')
+        self.assertEqual(order['address'], f"Mesa {order['table_number']}")
+        self.assertEqual(len(order['items']), 3)
+
+    def test_pix_image_is_not_loaded(self):
+        self.create_orders(1)
+        _, ctx = self.fetch()
+        order_sql = next(q['sql'] for q in ctx.captured_queries if 'tenants_orderitem' not in q['sql'] and '"tenants_order"' in q['sql'])
+        self.assertNotIn('pix_qr_code_base64', order_sql)
+
+
+# ========================
+# TAXA DE ENTREGA POR BAIRRO NORMALIZADO
+# ========================
+
+@override_settings(CACHES=LOCMEM_CACHE, SECURE_SSL_REDIRECT=False)
+class DeliveryFeeKeyTests(StoreTestMixin, TestCase):
+    def setUp(self):
+        self.make_store('Loja Taxas', 'loja-taxas', hours=OPEN_ALL_DAY)
+        category = Category.objects.create(tenant=self.tenant, name='Lanches')
+        self.product = Product.objects.create(tenant=self.tenant, category=category, name='X-Tudo', price=20)
+        self.fee = DeliveryFee.objects.create(tenant=self.tenant, neighborhood='SÃO JOSÉ', fee=7)
+
+    def order(self, neighborhood):
+        body = {
+            'nome': 'Cliente Teste', 'phone': '83999999999', 'order_type': 'delivery', 'method': 'dinheiro',
+            'address': {'cep': '58000000', 'street': 'Rua A', 'number': '10', 'neighborhood': neighborhood},
+            'items': [{'id': self.product.id, 'qtd': 1, 'obs': '', 'options': []}],
+        }
+        response = self.client.post(
+            reverse('api_create_order', kwargs={'slug': self.tenant.slug}),
+            data=json.dumps(body), content_type='application/json',
+        )
+        self.assertEqual(response.json()['status'], 'success', response.content)
+        return Order.objects.get(pk=response.json()['order_id'])
+
+    def test_key_is_filled_on_save(self):
+        self.assertEqual(self.fee.neighborhood_key, 'SAO JOSE')
+        self.fee.neighborhood = '  Jardim   América '
+        self.fee.save(update_fields=['neighborhood'])
+        self.fee.refresh_from_db()
+        self.assertEqual(self.fee.neighborhood_key, 'JARDIM AMERICA')
+
+    def test_checkout_matches_normalized_neighborhood(self):
+        self.assertEqual(self.order('sao  josé').delivery_fee, 7)
+        self.assertEqual(self.order('Outro Bairro').delivery_fee, 0)
+
+    def test_upsert_uses_key(self):
+        self.client.force_login(self.owner)
+        response = self.client.post(
+            reverse('api_delivery_fees', kwargs={'slug': self.tenant.slug}),
+            data=json.dumps({'neighborhood': 'São José', 'fee': '9.50'}), content_type='application/json',
+        )
+        self.assertEqual(response.json()['status'], 'success')
+
+        fees = list(DeliveryFee.objects.filter(tenant=self.tenant).values_list('neighborhood_key', 'fee'))
+        self.assertEqual(fees, [('SAO JOSE', Decimal('9.50'))])
+
+    def test_backfill_keeps_lowest_duplicate_and_logs(self):
+        backfill = importlib.import_module('tenants.migrations.0033_deliveryfee_neighborhood_key').backfill_neighborhood_key
+        # Linhas como estavam antes da migração (chaves ainda não preenchidas)
+        DeliveryFee.objects.bulk_create([
+            DeliveryFee(tenant=self.tenant, neighborhood='Sao Jose', fee=5, neighborhood_key='tmp-1'),
+            DeliveryFee(tenant=self.tenant, neighborhood='são josé', fee=9, neighborhood_key='tmp-2'),
+        ])
+
+        with self.assertLogs('tenants.migrations', level='WARNING') as logs:
+            backfill(django_apps, None)
+
+        fees = list(DeliveryFee.objects.filter(tenant=self.tenant).values_list('neighborhood', 'neighborhood_key', 'fee'))
+        self.assertEqual(fees, [('Sao Jose', 'SAO JOSE', Decimal('5.00'))])
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn('R$ 7.00', logs.output[0] + logs.output[1])
+
+
+@override_settings(CACHES=LOCMEM_CACHE, SECURE_SSL_REDIRECT=False)
+class NeighborhoodIndexTests(StoreTestMixin, TestCase):
+    def setUp(self):
+        self.make_store('Loja Bairros', 'loja-bairros')
+        for name, fee in [
+            ('JARDIM AMÉRICA', 6), ('JARDIM AEROPORTO', 8), ('VILA NOVA', 5),
+            ('SANTA RITA', 9), ('CENTRO', 4),
+        ]:
+            DeliveryFee.objects.create(tenant=self.tenant, neighborhood=name, fee=fee)
+        self.suggest_url = reverse('api_neighborhood_suggest', kwargs={'slug': self.tenant.slug})
+
+    def test_match_expands_abbreviations_and_typos(self):
+        index = get_neighborhood_index(self.tenant.id)
+        self.assertEqual(search_key('Jd. América'), 'JARDIM AMERICA')
+        self.assertEqual(index.match('Jd. America').neighborhood, 'JARDIM AMÉRICA')
+        self.assertEqual(index.match('vl nova').fee, 5)
+        self.assertEqual(index.match('Sta Ritta').neighborhood, 'SANTA RITA')
+
+    def test_match_refuses_ambiguous_or_distant(self):
+        index = get_neighborhood_index(self.tenant.id)
+        self.assertIsNone(index.match('Jardim'))
+        self.assertIsNone(index.match('Mangabeira'))
+        self.assertIsNone(index.match(''))
+
+    def test_index_is_rebuilt_after_fee_change(self):
+        self.assertIsNone(get_neighborhood_index(self.tenant.id).match('Bessa'))
+        DeliveryFee.objects.create(tenant=self.tenant, neighborhood='BESSA', fee=10)
+        bump_menu_version(self.tenant.id)
+        self.assertEqual(get_neighborhood_index(self.tenant.id).match('Bessa').fee, 10)
+
+    def test_suggest_endpoint_ranks_prefix_first(self):
+        response = self.client.get(self.suggest_url, {'q': 'jd a'})
+        data = response.json()
+        self.assertEqual(data['status'], 'success')
+        names = [item['neighborhood'] for item in data['results']]
+        self.assertCountEqual(names[:2], ['JARDIM AEROPORTO', 'JARDIM AMÉRICA'])
+
+        data = self.client.get(self.suggest_url, {'q': 'jardim america'}).json()
+        self.assertEqual(data['match'], {'neighborhood': 'JARDIM AMÉRICA', 'fee': 6.0})
+        self.assertEqual(self.client.get(self.suggest_url, {'q': 'j'}).json()['results'], [])
+
+    def test_checkout_charges_fuzzy_match(self):
+        category = Category.objects.create(tenant=self.tenant, name='Lanches')
+        product = Product.objects.create(tenant=self.tenant, category=category, name='X-Tudo', price=20)
+        for day in range(7):
+            OperatingDay.objects.create(tenant=self.tenant, day=day, open_time=dtime(0, 0), close_time=dtime(23, 59))
+        body = {
+            'nome': 'Cliente Teste', 'phone': '83999999999', 'order_type': 'delivery', 'method': 'dinheiro',
+            'address': {'cep': '58000000', 'street': 'Rua A', 'number': '10', 'neighborhood': 'Jd America'},
+            'items': [{'id': product.id, 'qtd': 1, 'obs': '', 'options': []}],
+        }
+        response = self.client.post(
+            reverse('api_create_order', kwargs={'slug': self.tenant.slug}),
+            data=json.dumps(body), content_type='application/json',
+        )
+        self.assertEqual(response.json()['status'], 'success', response.content)
+        self.assertEqual(Order.objects.get(pk=response.json()['order_id']).delivery_fee, 6)
+
+
+# ========================
+# BASE LOCAL DE CEPS (import_ceps + mmap)
+# ========================
+
+CEP_CSV = """cep;logradouro;bairro;cidade;uf
+58038-000;Av. Epitácio Pessoa;Tambaú;João Pessoa;PB
+58038-100;Rua Infante Dom Henrique;Tambaú;João Pessoa;PB
+58039-000;Av. Cabo Branco;Cabo Branco;João Pessoa;PB
+58010-000;Rua Duque de Caxias;Centro;João Pessoa;PB
+invalido;Rua X;Centro;João Pessoa;PB
+"""
+
+
+@override_settings(CACHES=LOCMEM_CACHE, SECURE_SSL_REDIRECT=False)
+class CepIndexTests(StoreTestMixin, TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, ignore_errors=True)
+        self.csv_path = os.path.join(tmp_dir, 'ceps.csv')
+        self.index_path = os.path.join(tmp_dir, 'cep_index.bin')
+        with open(self.csv_path, 'w', encoding='utf-8') as f:
+            f.write(CEP_CSV)
+
+        settings_override = override_settings(CEP_INDEX_PATH=self.index_path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        check_patch = mock.patch('tenants.cep_index.CEP_INDEX_CHECK_SECONDS', 0)
+        check_patch.start()
+        self.addCleanup(check_patch.stop)
+
+        self.make_store('Loja CEP', 'loja-cep')
+        DeliveryFee.objects.create(tenant=self.tenant, neighborhood='TAMBAÚ', fee=8)
+        DeliveryFee.objects.create(tenant=self.tenant, neighborhood='CENTRO', fee=4)
+
+    def import_ceps(self):
+        out = StringIO()
+        call_command('import_ceps', self.csv_path, stdout=out)
+        return out.getvalue()
+
+    def test_import_builds_compact_ranges(self):
+        output = self.import_ceps()
+        self.assertIn('1 ignorada(s)', output)
+        index = CepIndex(self.index_path)
+        # Os dois CEPs de Tambaú viram uma faixa só
+        self.assertEqual(len(index), 3)
+
+        self.assertEqual(lookup_cep('58038-000'), ('TAMBAU', 'JOAO PESSOA', 'PB'))
+        self.assertEqual(lookup_cep('58038050').neighborhood, 'TAMBAU')
+        self.assertEqual(lookup_cep('58039000').neighborhood, 'CABO BRANCO')
+        self.assertIsNone(lookup_cep('58039001'))
+        self.assertIsNone(lookup_cep('01001000'))
+        self.assertIsNone(lookup_cep('123'))
+
+    def test_missing_index_and_atomic_rebuild(self):
+        self.assertIsNone(lookup_cep('58038000'))
+        self.import_ceps()
+        self.assertEqual(lookup_cep('58010000').neighborhood, 'CENTRO')
+
+        with open(self.csv_path, 'w', encoding='utf-8') as f:
+            f.write('cep_inicial,cep_final,bairro,cidade,uf\n58010000,58010999,Varadouro,João Pessoa,PB\n')
+        self.import_ceps()
+        self.assertEqual(lookup_cep('58010500').neighborhood, 'VARADOURO')
+        self.assertIsNone(lookup_cep('58038000'))
+
+    def test_lookup_endpoint_returns_fee(self):
+        self.import_ceps()
+        url = reverse('api_cep_lookup', kwargs={'slug': self.tenant.slug})
+
+        data = self.client.get(url, {'cep': '58038-100'}).json()
+        self.assertEqual(data['neighborhood'], 'TAMBAU')
+        self.assertEqual((data['fee'], data['fee_neighborhood']), (8.0, 'TAMBAÚ'))
+        self.assertIsNone(self.client.get(url, {'cep': '58039000'}).json()['fee'])
+        self.assertEqual(self.client.get(url, {'cep': '01001000'}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'cep': '123'}).status_code, 400)
+
+    def test_checkout_prefers_cep_neighborhood(self):
+        self.import_ceps()
+        category = Category.objects.create(tenant=self.tenant, name='Lanches')
+        product = Product.objects.create(tenant=self.tenant, category=category, name='X-Tudo', price=20)
+        for day in range(7):
+            OperatingDay.objects.create(tenant=self.tenant, day=day, open_time=dtime(0, 0), close_time=dtime(23, 59))
+        body = {
+            'nome': 'Cliente Teste', 'phone': '83999999999', 'order_type': 'delivery', 'method': 'dinheiro',
+            'address': {'cep': '58038000', 'street': 'Rua A', 'number': '10', 'neighborhood': 'Centro'},
+            'items': [{'id': product.id, 'qtd': 1, 'obs': '', 'options': []}],
+        }
+        response = self.client.post(
+            reverse('api_create_order', kwargs={'slug': self.tenant.slug}),
+            data=json.dumps(body), content_type='application/json',
+        )
+        self.assertEqual(response.json()['status'], 'success', response.content)
+        self.assertEqual(Order.objects.get(pk=response.json()['order_id']).delivery_fee, 8)
+
+
+# ========================
+# ZONAS DE ENTREGA (raio/polígono + grade)
+# ========================
+
+@override_settings(CACHES=LOCMEM_CACHE, SECURE_SSL_REDIRECT=False)
+class DeliveryZoneTests(StoreTestMixin, TestCase):
+    CENTER = (-7.115, -34.863)
+
+    def setUp(self):
+        self.make_store('Loja Zonas', 'loja-zonas')
+        lat, lng = self.CENTER
+        DeliveryZone.objects.create(tenant=self.tenant, name='Até 2 km', kind='radius', coordinates=[[lat, lng]], radius_km=2, fee=5)
+        DeliveryZone.objects.create(tenant=self.tenant, name='Até 5 km', kind='radius', coordinates=[[lat, lng]], radius_km=5, fee=9)
+        # Quadrado ao norte, fora dos círculos, com prioridade
+        DeliveryZone.objects.create(
+            tenant=self.tenant, name='Litoral Norte', kind='polygon', fee=12, priority=1,
+            coordinates=[[-7.00, -34.90], [-7.00, -34.80], [-6.95, -34.80], [-6.95, -34.90]],
+        )
+        DeliveryFee.objects.create(tenant=self.tenant, neighborhood='CENTRO', fee=4)
+
+    def test_lookup_picks_smallest_or_priority_zone(self):
+        index = get_zone_index(self.tenant.id)
+        lat, lng = self.CENTER
+        self.assertEqual(index.lookup(lat, lng).name, 'Até 2 km')
+        # ~3,3 km ao sul: só o círculo de 5 km
+        self.assertEqual(index.lookup(lat - 0.03, lng).name, 'Até 5 km')
+        self.assertEqual(index.lookup(-6.97, -34.85).fee, 12)
+        self.assertIsNone(index.lookup(-6.97, -34.95))
+        self.assertIsNone(index.lookup(-8.0, -35.0))
+
+    def test_grid_matches_linear_scan(self):
+        rng = random.Random(7)
+        index = ZoneIndex(synthetic_zones(300, rng))
+        for lat, lng in random_points(2000, rng):
+            self.assertEqual(index.lookup(lat, lng), index.lookup_linear(lat, lng))
+
+    def test_clean_validates_coordinates(self):
+        zone = DeliveryZone(tenant=self.tenant, name='Ruim', kind='polygon', coordinates=[[-7.1, -34.8], [-7.2, -34.8]], fee=5)
+        with self.assertRaises(ValidationError):
+            zone.clean()
+        zone = DeliveryZone(tenant=self.tenant, name='Ruim', kind='radius', coordinates=[[-95, -34.8]], radius_km=1, fee=5)
+        with self.assertRaises(ValidationError):
+            zone.clean()
+
+    def test_endpoint_and_checkout_fallback(self):
+        url = reverse('api_delivery_zone', kwargs={'slug': self.tenant.slug})
+        lat, lng = self.CENTER
+        self.assertEqual(self.client.get(url, {'lat': lat, 'lng': lng}).json()['zone'], {'name': 'Até 2 km', 'fee': 5.0})
+        self.assertIsNone(self.client.get(url, {'lat': -8, 'lng': -35}).json()['zone'])
+        self.assertEqual(self.client.get(url, {'lat': 'nan', 'lng': lng}).status_code, 400)
+
+        category = Category.objects.create(tenant=self.tenant, name='Lanches')
+        product = Product.objects.create(tenant=self.tenant, category=category, name='X-Tudo', price=20)
+        for day in range(7):
+            OperatingDay.objects.create(tenant=self.tenant, day=day, open_time=dtime(0, 0), close_time=dtime(23, 59))
+
+        def order(point):
+            address = {'cep': '58000000', 'street': 'Rua A', 'number': '10', 'neighborhood': 'Centro'}
+            if point:
+                address.update(lat=point[0], lng=point[1])
+            body = {
+                'nome': 'Cliente Teste', 'phone': '83999999999', 'order_type': 'delivery', 'method': 'dinheiro',
+                'address': address, 'items': [{'id': product.id, 'qtd': 1, 'obs': '', 'options': []}],
+            }
+            response = self.client.post(
+                reverse('api_create_order', kwargs={'slug': self.tenant.slug}),
+                data=json.dumps(body), content_type='application/json',
+            )
+            self.assertEqual(response.json()['status'], 'success', response.content)
+            return Order.objects.get(pk=response.json()['order_id']).delivery_fee
+
+        self.assertEqual(order((lat - 0.03, lng)), 9)
+        # Fora das zonas e sem GPS: taxa do bairro
+        self.assertEqual(order((-8.0, -35.0)), 4)
+        self.assertEqual(order(None), 4)
+
+    def test_bench_zones_command(self):
+        out = StringIO()
+        call_command('bench_zones', zones=50, lookups=200, stdout=out)
+        self.assertIn('50 zona(s)', out.getvalue())
+        self.assertIn('µs/busca', out.getvalue())
+
+
+# ========================
+# PIX EM SEGUNDO PLANO (api_order_pix_status)
+# ========================
+
+@override_settings(CACHES=LOCMEM_CACHE, SECURE_SSL_REDIRECT=False)
+class PixStatusTests(StoreTestMixin, TestCase):
+    def setUp(self):
+        self.make_store('Loja Pix', 'loja-pix')
+        self.order = Order.objects.create(
+            tenant=self.tenant, customer_name='Ana', customer_phone='83999999999', total_value=10,
+            payment_method='pix',
+        )
+
+    def status(self, order_id, token, slug=None):
+        url = reverse('api_order_pix_status', kwargs={'slug': slug or self.tenant.slug, 'order_id': order_id})
+        return self.client.get(url, {'token': token})
+
+    def test_valid_token_follows_pix_status(self):
+        token = make_pix_token(self.order.id)
+        self.assertEqual(self.status(self.order.id, token).json()['pix_status'], 'pending')
+
+        Order.objects.filter(pk=self.order.pk).update(
+            mercadopago_id='123', mercadopago_status='pending', pix_qr_code='00020126pix', pix_ticket_url='https://mp/t',
+        )
+        data = self.status(self.order.id, token).json()
+        self.assertEqual(data['pix_status'], 'ready')
+        self.assertEqual(data['pix_data']['qr_code'], '00020126pix')
+
+    def test_failed_pix_is_published_to_panel(self):
+        token = make_pix_token(self.order.id)
+        seq = ensure_seq(self.tenant.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_pix_failed(self.order.id)
+        self.assertEqual(self.status(self.order.id, token).json()['pix_status'], 'failed')
+        self.assertEqual(changed_order_ids(self.tenant.id, seq, current_seq(self.tenant.id)), [self.order.id])
+
+        # Pedido que já tem PIX no MP não muda nem gera evento
+        Order.objects.filter(pk=self.order.pk).update(mercadopago_id='123', mercadopago_status='pending')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            mark_pix_failed(self.order.id)
+        self.assertEqual(callbacks, [])
+
+    def test_wrong_token_is_denied(self):
+        for token in ('', 'token-falso', make_pix_token(self.order.id + 1)):
+            response = self.status(self.order.id, token)
+            self.assertEqual(response.status_code, 403)
+            self.assertEqual(response.json()['status'], 'error')
+
+    def test_token_of_another_order_or_store(self):
+        other_tenant = Tenant.objects.create(name='Outra', slug='outra-loja', owner=self.owner)
+        other_order = Order.objects.create(
+            tenant=other_tenant, customer_name='Bia', customer_phone='83999999999', total_value=10,
+        )
+        # Token de um pedido não abre outro
+        self.assertEqual(self.status(other_order.id, make_pix_token(self.order.id)).status_code, 403)
+        # Token certo, mas o pedido é de outra loja
+        response = self.status(other_order.id, make_pix_token(other_order.id))
+        self.assertEqual(response.status_code, 404)
+
+
+# ========================
+# PREÇO DO CARRINHO (_load_cart_prices)
+# ========================
+
+@override_settings(CACHES=LOCMEM_CACHE, SECURE_SSL_REDIRECT=False, RATELIMIT_ENABLE=False)
+class CartPricingTests(StoreTestMixin, TestCase):
+    def setUp(self):
+        self.make_store('Loja Preço', 'loja-preco', hours=OPEN_ALL_DAY)
+        category = Category.objects.create(tenant=self.tenant, name='Lanches')
+        self.products = []
+        for number in range(5):
+            product = Product.objects.create(tenant=self.tenant, category=category, name=f'Lanche {number}', price=20 + number)
+            option = ProductOption.objects.create(product=product, title='Adicionais')
+            OptionItem.objects.create(option=option, name='Bacon', price=3)
+            OptionItem.objects.create(option=option, name='Cheddar', price=Decimal('2.50'))
+            self.products.append(product)
+
+    def cart(self, products):
+        return [{'id': p.id, 'qtd': 1, 'obs': '', 'options': [{'name': 'Bacon', 'price': 0}]} for p in products]
+
+    def order(self, items):
+        body = {
+            'nome': 'Cliente Teste', 'phone': '83999999999', 'order_type': 'pickup', 'method': 'dinheiro',
+            'items': items,
+        }
+        return self.client.post(
+            reverse('api_create_order', kwargs={'slug': self.tenant.slug}),
+            data=json.dumps(body), content_type='application/json',
+        )
+
+    def test_query_count_does_not_grow_with_cart(self):
+        with self.assertNumQueries(2):
+            _load_cart_prices(self.tenant, self.cart(self.products[:1]))
+        with self.assertNumQueries(2):
+            products, option_prices = _load_cart_prices(self.tenant, self.cart(self.products) * 3)
+        self.assertEqual(set(products), {p.id for p in self.products})
+        self.assertEqual(option_prices[(self.products[0].id, 'CHEDDAR')], Decimal('2.50'))
+
+    def test_server_prices_override_client_prices(self):
+        items = [
+            {'id': self.products[0].id, 'qtd': 2, 'obs': '', 'price': 0.01,
+             'options': [{'name': 'bacon', 'price': 0}, {'name': 'Cheddar (2x)', 'price': 0}]},
+            {'id': self.products[1].id, 'qtd': 1, 'obs': '', 'price': 0.01, 'options': []},
+        ]
+        response = self.order(items)
+        self.assertEqual(response.json()['status'], 'success')
+
+        order = Order.objects.get(tenant=self.tenant)
+        # "Cheddar (2x)" conta duas vezes: (20 + 3 + 2.50 * 2) * 2 + 21
+        self.assertEqual(order.total_value, Decimal('77.00'))
+        prices = sorted(order.items.values_list('price', 'options_text'))
+        self.assertEqual(prices, [(Decimal('21.00'), ''), (Decimal('28.00'), 'bacon, Cheddar (2x)')])
+
+    def test_option_name_with_parentheses(self):
+        OptionItem.objects.create(option=self.products[0].options.get(), name='Coca-Cola (350ml)', price=6)
+        items = [{'id': self.products[0].id, 'qtd': 1, 'obs': '', 'options': [
+            {'name': 'Coca-Cola (350ml)', 'price': 0}, {'name': 'Coca-Cola (350ml) (3x)', 'price': 0},
+        ]}]
+        response = self.order(items)
+        self.assertEqual(response.json()['status'], 'success')
+        # 20 + 6 + 6 * 3
+        self.assertEqual(Order.objects.get(tenant=self.tenant).total_value, Decimal('44.00'))
+
+    def test_unknown_product_or_option_is_rejected(self):
+        other_tenant = Tenant.objects.create(name='Outra', slug='outra-loja', owner=self.owner)
+        other_category = Category.objects.create(tenant=other_tenant, name='Pizzas')
+        other_product = Product.objects.create(tenant=other_tenant, category=other_category, name='Pizza', price=1)
+        OptionItem.objects.create(option=self.products[1].options.get(), name='Catupiry', price=4)
+
+        for product_id in (999999, 'abc', other_product.id):
+            response = self.order([{'id': product_id, 'qtd': 1, 'obs': '', 'options': []}])
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('não existe', response.json()['message'])
+
+        # "Bacon Extra" não casa com "Bacon"; opcional de outro produto também não vale
+        for name in ('Bacon Extra', 'Catupiry'):
+            items = [{'id': self.products[0].id, 'qtd': 1, 'obs': '', 'options': [{'name': name, 'price': 0}]}]
+            response = self.order(items)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(
+                response.json()['message'], f'O opcional {name} não está disponível para Lanche 0.'
+            )
+        self.assertFalse(Order.objects.filter(tenant=self.tenant).exists())
+
+
+# ========================
+# RESGATE ATÔMICO DE CUPOM (Coupon.redeem)
+# ========================
+
+@override_settings(CACHES=LOCMEM_CACHE, SECURE_SSL_REDIRECT=False, RATELIMIT_ENABLE=False)
+class CouponRedemptionTests(StoreTestMixin, TransactionTestCase):
+    THREADS = 16
+    ORDERS_PER_THREAD = 3
+
+    def setUp(self):
+        self.make_store('Loja Cupom', 'loja-cupom', hours=OPEN_ALL_DAY)
+        category = Category.objects.create(tenant=self.tenant, name='Lanches')
+        self.product = Product.objects.create(tenant=self.tenant, category=category, name='X-Tudo', price=20)
+        self.coupon = Coupon.objects.create(tenant=self.tenant, code='PROMO', discount_value=10, usage_limit=15)
+
+    def order(self, client):
+        body = {
+            'nome': 'Cliente Teste', 'phone': '83999999999', 'order_type': 'pickup', 'method': 'dinheiro',
+            'coupon_code': 'PROMO', 'items': [{'id': self.product.id, 'qtd': 1, 'obs': '', 'options': []}],
+        }
+        for _ in range(100):
+            response = client.post(
+                reverse('api_create_order', kwargs={'slug': self.tenant.slug}),
+                data=json.dumps(body), content_type='application/json',
+            )
+            # O SQLite em memória do teste não aceita duas escritas ao mesmo tempo
+            # ("database table is locked"): repete, como o cliente faria. No
+            # PostgreSQL as threads só disputam a linha do cupom.
+            if response.status_code != 500 or connection.vendor != 'sqlite':
+                return response.json()
+            time.sleep(0.005)
+        self.fail('Pedido não foi gravado depois de 100 tentativas')
+
+    def test_concurrent_orders_never_pass_the_limit(self):
+        results = []
+        errors = []
+
+        def worker():
+            client = self.client_class()
+            try:
+                for _ in range(self.ORDERS_PER_THREAD):
+                    results.append(self.order(client))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), self.THREADS * self.ORDERS_PER_THREAD)
+        # Quem validou o cupom mas perdeu a corrida pelo último uso é recusado;
+        # quem chegou depois do limite compra sem desconto
+        rejected = [r for r in results if r['status'] != 'success']
+        self.assertTrue(all('limite de uso' in r['message'] for r in rejected))
+
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 15)
+        self.assertEqual(CouponUsage.objects.filter(coupon=self.coupon).count(), 15)
+        self.assertEqual(Order.objects.filter(tenant=self.tenant, coupon=self.coupon).count(), 15)
+        # Pedido recusado não fica gravado
+        self.assertEqual(Order.objects.filter(tenant=self.tenant).count(), len(results) - len(rejected))
+
+    def test_coupon_lost_at_redeem_rolls_back_everything(self):
+        TenantPaymentConfig.objects.create(
+            tenant=self.tenant, access_token='token', refresh_token='refresh', public_key='key',
+            account_id='1', expires_in=3600,
+        )
+        seq = ensure_seq(self.tenant.id)
+        body = {
+            'nome': 'Cliente Teste', 'phone': '83999999999', 'order_type': 'pickup', 'method': 'pix',
+            'coupon_code': 'PROMO', 'items': [{'id': self.product.id, 'qtd': 2, 'obs': '', 'options': []}],
+        }
+        # Outro pedido levou o último uso entre a validação e o resgate
+        with mock.patch.object(Coupon, 'redeem', return_value=False) as redeem, \
+                mock.patch('tenants.views.enqueue', wraps=enqueue) as enqueued:
+            response = self.client.post(
+                reverse('api_create_order', kwargs={'slug': self.tenant.slug}),
+                data=json.dumps(body), content_type='application/json',
+            )
+        redeem.assert_called_once()
+        self.assertEqual(enqueued.call_args.args[0], 'mp.create_pix')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('limite de uso', response.json()['message'])
+        # Pedido, itens e o job do PIX foram gravados antes do resgate e saíram no rollback
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertFalse(Job.objects.filter(name='mp.create_pix').exists())
+        self.assertFalse(CouponUsage.objects.exists())
+        # O aviso aos painéis (on_commit) também é descartado
+        self.assertEqual(current_seq(self.tenant.id), seq)
+
+    def test_redeem_respects_limit(self):
+        self.coupon.usage_limit = 2
+        self.coupon.save()
+
+        self.assertTrue(self.coupon.redeem())
+        self.assertTrue(self.coupon.redeem())
+        self.assertFalse(self.coupon.redeem())
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 2)
+
+    def test_panel_and_admin_edits_do_not_write_used_count(self):
+        self.coupon.redeem()
+        self.client.force_login(self.owner)
+        url = reverse('api_coupon_details', kwargs={'slug': self.tenant.slug, 'coupon_id': self.coupon.id})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.put(url, json.dumps({'description': 'Promoção de inverno'}), content_type='application/json')
+        self.assertEqual(response.json()['status'], 'success')
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "tenants_coupon"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('used_count', updates[0])
+
+        # Admin com o objeto lido antes de um resgate: grava só o campo editado
+        stale = Coupon.objects.get(pk=self.coupon.pk)
+        self.coupon.redeem()
+        stale.description = 'Promoção de verão'
+        request = RequestFactory().post('/admin/')
+        request.user = self.owner
+        form = mock.Mock(changed_data=['description'])
+        django_admin.site._registry[Coupon].save_model(request, stale, form, change=True)
+
+        self.coupon.refresh_from_db()
+        self.assertEqual((self.coupon.used_count, self.coupon.description), (2, 'Promoção de verão'))
+
+
+# ========================
+# VERSÃO DO CARDÁPIO (snapshot em cache)
+# ========================
+
+@override_settings(CACHES=LOCMEM_CACHE, SECURE_SSL_REDIRECT=False)
+class MenuSnapshotInvalidationTests(StoreTestMixin, TestCase):
+    def setUp(self):
+        self.make_store('Loja Cardápio', 'loja-cardapio')
+        self.category = Category.objects.create(tenant=self.tenant, name='Lanches')
+        self.product = Product.objects.create(tenant=self.tenant, category=self.category, name='X-Tudo', price=20)
+        option = ProductOption.objects.create(product=self.product, title='Adicionais')
+        OptionItem.objects.create(option=option, name='Bacon', price=3)
+        DeliveryFee.objects.create(tenant=self.tenant, neighborhood='CENTRO', fee=5)
+        self.menu_url = reverse('cardapio_publico', kwargs={'slug': self.tenant.slug})
+
+    def menu(self):
+        response = self.client.get(self.menu_url)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_snapshot_is_cached_until_bump(self):
+        self.assertIn('X-Tudo', self.menu())
+        # UPDATE direto não passa por nenhuma invalidação: o snapshot antigo continua
+        Product.objects.filter(pk=self.product.pk).update(name='X-Salada')
+        self.assertIn('X-Tudo', self.menu())
+
+        bump_menu_version(self.tenant.id)
+        html = self.menu()
+        self.assertIn('X-Salada', html)
+        self.assertNotIn('X-Tudo', html)
+
+    def test_panel_product_and_option_edit(self):
+        self.assertIn('Bacon', self.menu())
+        self.client.force_login(self.owner)
+        response = self.client.post(reverse('api_save_product', kwargs={'slug': self.tenant.slug}), {
+            'id': self.product.id, 'category': self.category.id, 'name': 'X-Tudo Duplo', 'price': '25,00',
+            'options_json': json.dumps([{
+                'title': 'Adicionais', 'type': 'checkbox', 'required': False, 'max': 5,
+                'items': [{'name': 'Cheddar', 'price': '4.00'}],
+            }]),
+        })
+        self.assertEqual(response.json()['status'], 'success')
+
+        html = self.menu()
+        self.assertIn('X-Tudo Duplo', html)
+        self.assertIn('Cheddar', html)
+        self.assertNotIn('Bacon', html)
+
+    def test_panel_toggle_and_delivery_fee(self):
+        self.assertIn('X-Tudo', self.menu())
+        self.client.force_login(self.owner)
+        self.client.post(reverse('api_toggle_product', kwargs={'slug': self.tenant.slug, 'product_id': self.product.id}))
+        self.client.post(
+            reverse('api_delivery_fees', kwargs={'slug': self.tenant.slug}),
+            data=json.dumps({'neighborhood': 'Bessa', 'fee': '11.00'}), content_type='application/json',
+        )
+
+        html = self.menu()
+        self.assertNotIn('X-Tudo', html)
+        self.assertIn('BESSA', html)
+
+    def test_admin_save_bumps_version(self):
+        html = self.menu()
+        self.assertIn('X-Tudo', html)
+        self.assertNotIn('6.5', html)
+        request = RequestFactory().post('/admin/')
+        request.user = self.owner
+
+        self.product.name = 'X-Bacon'
+        django_admin.site._registry[Product].save_model(request, self.product, form=None, change=True)
+        fee = DeliveryFee.objects.get(tenant=self.tenant)
+        fee.fee = Decimal('6.50')
+        django_admin.site._registry[DeliveryFee].save_model(request, fee, form=None, change=True)
+
+        html = self.menu()
+        self.assertIn('X-Bacon', html)
+        self.assertIn('6.5', html)
+
+
+# ========================
+# STATUS PÚBLICO DA LOJA (cache, ETag e Cache-Control)
+# ========================
+
+@override_settings(CACHES=LOCMEM_CACHE, SECURE_SSL_REDIRECT=False)
+class StoreStatusCacheTests(StoreTestMixin, TestCase):
+    def setUp(self):
+        self.make_store('Loja Status', 'loja-status')
+        # Sábado 10:00-22:00
+        OperatingDay.objects.create(tenant=self.tenant, day=6, open_time=dtime(10), close_time=dtime(22))
+        self.url = reverse('api_public_store_status', kwargs={'slug': self.tenant.slug})
+
+    def at(self, moment):
+        """Congela o relógio do status (timezone.now e time.time) em `moment` (horário local)."""
+        moment = timezone.make_aware(moment)
+        clock = mock.Mock(time=mock.Mock(return_value=moment.timestamp()))
+        patches = [
+            mock.patch('django.utils.timezone.now', return_value=moment),
+            mock.patch('tenants.views.time', clock),
+            mock.patch('tenants.cache.time', clock),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return moment.timestamp()
+
+    def test_matching_etag_returns_304(self):
+        self.at(SATURDAY.replace(hour=12))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"outra-versao"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_max_age_and_ttl_follow_next_transition(self):
+        # Longe da próxima transição: o cache vai até ela, o navegador só STORE_STATUS_MAX_AGE
+        now = self.at(SATURDAY.replace(hour=18))
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['message'], 'ABERTO - Fecha as 22:00')
+        self.assertIn('max-age=30', response['Cache-Control'])
+        self.assertIn('public', response['Cache-Control'])
+        entry = get_store_status(self.tenant.slug)
+        self.assertEqual(entry['expires_at'] - now, 4 * 60 * 60)
+
+        # 10 segundos antes de fechar: cache e max-age acabam na transição
+        cache.clear()
+        now = self.at(SATURDAY.replace(hour=21, minute=59, second=50))
+        response = self.client.get(self.url)
+        self.assertIn('max-age=10', response['Cache-Control'])
+        entry = get_store_status(self.tenant.slug)
+        self.assertEqual(entry['expires_at'] - now, 10)
+
+    def test_save_hours_invalidates_status(self):
+        self.at(SATURDAY.replace(hour=12))
+        response = self.client.get(self.url)
+        self.assertTrue(response.json()['is_open'])
+        etag = response['ETag']
+
+        self.client.force_login(self.owner)
+        response = self.client.post(
+            reverse('api_save_hours', kwargs={'slug': self.tenant.slug}),
+            json.dumps([{'day': 6, 'open': '10:00', 'close': '22:00', 'closed': True}]),
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['status'], 'success')
+
+        # A ETag antiga não vale mais: volta 200 com o status novo
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['is_open'])
+
+    def test_admin_manual_override_invalidates_status(self):
+        self.at(SATURDAY.replace(hour=12))
+        self.assertTrue(self.client.get(self.url).json()['is_open'])
+
+        self.tenant.manual_override = True
+        request = RequestFactory().post('/admin/')
+        request.user = self.owner
+        django_admin.site._registry[Tenant].save_model(request, self.tenant, form=None, change=True)
+
+        data = self.client.get(self.url).json()
+        self.assertFalse(data['is_open'])
+        self.assertEqual(data['reason'], 'fechamento_manual')
+
+
+# ========================
+# MEDIÇÃO POR REQUISIÇÃO (PerfMiddleware)
+# ========================
+
+@override_settings(CACHES=LOCMEM_CACHE, SECURE_SSL_REDIRECT=False)
+class PerfMiddlewareTests(StoreTestMixin, TestCase):
+    def setUp(self):
+        self.make_store('Loja Perf', 'loja-perf')
+        self.orders_url = reverse('api_get_orders', kwargs={'slug': self.tenant.slug})
+        self.status_url = reverse('api_public_store_status', kwargs={'slug': self.tenant.slug})
+
+    def test_server_timing_only_for_staff(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(self.orders_url)
+        self.assertNotIn('Server-Timing', response)
+
+        self.owner.is_staff = True
+        self.owner.save()
+        response = self.client.get(self.orders_url)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    def test_log_line_counts_queries_and_cache(self):
+        self.client.get(self.status_url)
+        with self.assertLogs('tenants.perf', level='INFO') as logs:
+            self.client.get(self.status_url)
+
+        entry = json.loads(logs.records[-1].getMessage().split('[PERF] ', 1)[1])
+        self.assertEqual(entry['view'], 'api_public_store_status')
+        self.assertEqual(entry['tenant'], 'loja-perf')
+        self.assertEqual(entry['status'], 200)
+        self.assertGreaterEqual(entry['cache_hits'], 1)
+        self.assertEqual(entry['cache_misses'], 0)
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0)
+    def test_slow_request_dumps_sql(self):
+        self.client.force_login(self.owner)
+        with self.assertLogs('tenants.perf', level='WARNING') as logs:
+            self.client.get(self.orders_url)
+
+        message = logs.records[-1].getMessage()
+        self.assertIn('Requisição lenta', message)
+        self.assertIn('tenants_order', message)
+
+
+# ========================
+# PROFILER SOB DEMANDA (?_profile=1)
+# ========================
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class RequestProfilerTests(StoreTestMixin, TestCase):
+    def setUp(self):
+        self.make_store('Loja Perfil', 'loja-perfil')
+        self.url = reverse('api_get_orders', kwargs={'slug': self.tenant.slug})
+        self.client.force_login(self.owner)
+
+    def profile_file(self, profile):
+        """Grava o .prof do perfil num arquivo temporário (pstats só lê de arquivo)."""
+        fd, path = tempfile.mkstemp(suffix='.prof')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(bytes(profile.profile_data))
+        return path
+
+    def test_only_staff_can_profile(self):
+        response = self.client.get(self.url, {'_profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_staff_request_is_profiled(self):
+        self.owner.is_staff = True
+        self.owner.is_superuser = True
+        self.owner.save()
+
+        response = self.client.get(self.url, HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+
+        profile = RequestProfile.objects.get(request_id=response['X-Profile-Id'])
+        self.assertEqual(profile.view_name, 'api_get_orders')
+        self.assertEqual(profile.tenant_slug, 'loja-perfil')
+        self.assertGreater(profile.db_queries, 0)
+        self.assertIn('api_get_orders', profile.stats_text)
+        self.assertTrue(pstats.Stats(self.profile_file(profile)).total_calls)
+
+        changelist = self.client.get(reverse('admin:tenants_requestprofile_changelist'))
+        self.assertContains(changelist, self.url)
+
+    def test_view_error_is_profiled_and_handled_by_django(self):
+        self.owner.is_staff = True
+        self.owner.save()
+        client = self.client_class(raise_request_exception=False)
+        client.force_login(self.owner)
+
+        with mock.patch('tenants.views._panel_orders_queryset', side_effect=RuntimeError('falhou')):
+            response = client.get(self.url, {'_profile': '1'})
+        # A exceção segue o caminho normal do Django (process_exception, página 500)
+        self.assertEqual(response.status_code, 500)
+
+        profile = RequestProfile.objects.get(request_id=response['X-Profile-Id'])
+        self.assertEqual(profile.status_code, 500)
+        self.assertIn('api_get_orders', profile.stats_text)
+
+
+# ========================
+# MÉTRICAS (PROMETHEUS)
+# ========================
+
+@override_settings(CACHES=LOCMEM_CACHE, SECURE_SSL_REDIRECT=False, METRICS_TOKEN='segredo', METRICS_DIR='')
+class MetricsTests(StoreTestMixin, TestCase):
+    def setUp(self):
+        self.make_store('Loja Métricas', 'loja-metricas')
+
+    def test_endpoint_requires_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer errado').status_code, 401)
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer segredo').status_code, 404)
+
+    def test_exposes_request_and_cache_metrics(self):
+        self.client.get(reverse('api_public_store_status', kwargs={'slug': self.tenant.slug}))
+
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE rmpedidos_http_request_duration_seconds histogram', body)
+        self.assertIn(
+            'rmpedidos_http_request_duration_seconds_bucket{view="api_public_store_status",method="GET",le="+Inf"}',
+            body,
+        )
+        self.assertIn('rmpedidos_tenant_requests_total{tenant="loja-metricas"}', body)
+        self.assertIn('rmpedidos_cache_requests_total{cache="store_status",result="miss"}', body)
+
+    def test_unknown_tenant_slugs_share_one_label(self):
+        for slug in ('wp-admin-xyz', 'loja-que-nao-existe'):
+            self.client.get(reverse('cardapio_publico', kwargs={'slug': slug}))
+            # Responde 403 sem olhar a loja: o slug não pode virar rótulo
+            self.client.get(reverse('api_order_pix_status', kwargs={'slug': slug, 'order_id': 1}))
+        self.client.get(reverse('api_order_pix_status', kwargs={'slug': self.tenant.slug, 'order_id': 1}))
+
+        body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer segredo').content.decode()
+        self.assertIn('rmpedidos_tenant_requests_total{tenant="unknown"}', body)
+        self.assertIn('rmpedidos_tenant_requests_total{tenant="loja-metricas"}', body)
+        self.assertNotIn('wp-admin-xyz', body)
+        self.assertNotIn('loja-que-nao-existe', body)
+
+    def test_multiprocess_files_are_summed(self):
+        registry = MetricsRegistry()
+        counter = MetricsCounter('teste_total', 'Contador de teste', ['kind'], registry=registry)
+        histogram = MetricsHistogram('teste_seconds', 'Histograma de teste', buckets=(0.1, 1), registry=registry)
+        counter.inc(kind='a')
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        # Arquivo de outro worker
+        with open(os.path.join(directory, 'metrics-1.json'), 'w') as f:
+            json.dump({'teste_total': [[['a'], 2]], 'teste_seconds': [[[], [0, 0, 1, 3.0]]]}, f)
+
+        with override_settings(METRICS_DIR=directory):
+            body = registry.render()
+
+        self.assertIn('teste_total{kind="a"} 3.0', body)
+        self.assertIn('teste_seconds_bucket{le="0.1"} 1.0', body)
+        self.assertIn('teste_seconds_bucket{le="1.0"} 2.0', body)
+        self.assertIn('teste_seconds_bucket{le="+Inf"} 3.0', body)
+        self.assertIn('teste_seconds_count 3.0', body)
+        self.assertIn('teste_seconds_sum 3.55', body)
+
+
+# ========================
+# BENCHMARK HTTP (manage.py bench_http)
+# ========================
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class BenchHttpCommandTests(StoreTestMixin, TestCase):
+    def setUp(self):
+        self.make_store('Loja Bench', 'loja-bench', hours=(dtime(10, 0), dtime(11, 0)))
+        category = Category.objects.create(tenant=self.tenant, name='Lanches')
+        for n in range(3):
+            Product.objects.create(tenant=self.tenant, category=category, name=f'Lanche {n}', price=20)
+        DeliveryFee.objects.create(tenant=self.tenant, neighborhood='CENTRO', fee=5)
+        Coupon.objects.create(tenant=self.tenant, code='BENCH10', discount_value=10)
+
+    def make_tmpdir(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        return path
+
+    def test_runs_every_scenario_and_writes_json(self):
+        output = os.path.join(self.make_tmpdir(), 'bench.json')
+        call_command(
+            'bench_http', tenant='loja-bench', requests=4, concurrency=1, warmup=0,
+            output=output, stdout=StringIO(),
+        )
+
+        with open(output, encoding='utf-8') as f:
+            report = json.load(f)
+
+        self.assertEqual(report['meta']['tenant'], 'loja-bench')
+        self.assertEqual(set(report['results']), set(SCENARIOS))
+        for name, result in report['results'].items():
+            self.assertEqual(result['requests'], 4, name)
+            self.assertEqual(result['errors'], 0, (name, result['status_codes'], result['exceptions']))
+            self.assertLessEqual(result['latency_ms']['p50'], result['latency_ms']['p99'])
+        self.assertGreater(report['results']['create_order']['queries']['mean'], 0)
+        # Loja aberta só das 10h às 11h: o checkout passa a qualquer hora e os pedidos criados são apagados
+        self.assertFalse(Order.objects.filter(tenant=self.tenant).exists())
+
+    def test_percentile(self):
+        values = sorted(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 99), 0.0)
+
+
+# ========================
+# ORÇAMENTO DE CONSULTAS E TEMPO POR VIEW (pytest)
+# ========================
+# Roda com `pytest tenants/tests.py -k budget`. Cada rota de tenants/urls.py
+# é chamada como dono da loja e como cliente anônimo, com caches frios; o
+# teste falha se passar do limite de consultas ou de tempo, e o pytest
+# imprime a tabela completa no final (conftest.py).
+
+DEFAULT_QUERY_BUDGET = 10
+DEFAULT_TIME_BUDGET_MS = 500
+
+# Limites por rota (o padrão vale para as que não estão aqui)
+QUERY_BUDGETS = {
+    # cardápio montado do zero (cache frio): loja, snapshot, horários, mesa
+    'cardapio_publico': 10,
+    'cardapio_mesa': 11,
+}
+TIME_BUDGETS_MS = {}
+
+# Respostas de erro esperadas nessas condições
+EXPECTED_STATUS = {
+    # O test client é WSGI; o stream só funciona sob ASGI e responde 503
+    'api_orders_stream': 503,
+}
+
+BUDGET_PRODUCTS = 200
+BUDGET_ORDERS = 60
+BUDGET_TABLES = 10
+
+BUDGET_SKIP = {
+    # Renderiza tenants/error.html, que não existe no projeto (erro 500 conhecido)
+    'mp_callback',
+}
+
+ROUTES = [
+    pattern.name for pattern in tenant_urls.urlpatterns
+    if isinstance(pattern, URLPattern) and pattern.name and pattern.name not in BUDGET_SKIP
+]
+
+
+def _clear_caches():
+    cache.clear()
+    tenant_ref_cache.clear()
+    domain_cache.clear()
+
+
+@pytest.fixture(scope='module')
+def budget_store(django_db_setup, django_db_blocker):
+    """Loja realista: 200 produtos com adicionais, mesas, cupons, taxas e pedidos."""
+    with django_db_blocker.unblock():
+        owner = User.objects.create_user('budget@loja.com', 'budget@loja.com', 'senha-segura-123')
+        tenant = Tenant.objects.create(
+            name='Loja Orçamento', slug='loja-orcamento', owner=owner,
+            plan_type='pro', phone_whatsapp='83999999999',
+        )
+        OperatingDay.objects.bulk_create([
+            OperatingDay(tenant=tenant, day=day, open_time=dtime(0, 0), close_time=dtime(23, 59))
+            for day in range(7)
+        ])
+        DeliveryFee.objects.bulk_create([
+            DeliveryFee(tenant=tenant, neighborhood=f'BAIRRO {i}', neighborhood_key=f'BAIRRO {i}', fee=5 + i) for i in range(30)
+        ])
+        categories = Category.objects.bulk_create([
+            Category(tenant=tenant, name=f'Categoria {i}', order=i) for i in range(10)
+        ])
+        products = Product.objects.bulk_create([
+            Product(tenant=tenant, category=categories[i % 10], name=f'Produto {i}', price=10 + i % 7)
+            for i in range(BUDGET_PRODUCTS)
+        ])
+        group = ProductGroup.objects.create(tenant=tenant, name='Adicionais')
+        GroupItem.objects.bulk_create([GroupItem(group=group, name=f'Extra {i}', price=2) for i in range(5)])
+        options = ProductOption.objects.bulk_create([
+            ProductOption(product=product, group=group, title='Adicionais', max_quantity=3) for product in products
+        ])
+        OptionItem.objects.bulk_create([
+            OptionItem(option=option, name=f'Extra {i}', price=2) for option in options for i in range(3)
+        ])
+        tables = Table.objects.bulk_create([
+            Table(tenant=tenant, number=i + 1) for i in range(BUDGET_TABLES)
+        ])
+        coupon = Coupon.objects.create(tenant=tenant, code='BUDGET10', discount_value=10)
+        orders = Order.objects.bulk_create([
+            Order(
+                tenant=tenant, customer_name=f'Cliente {i}', customer_phone='83988887777',
+                payment_method='pix', total_value=50, coupon=coupon if i % 5 == 0 else None,
+                order_type='table' if i % 4 == 0 else 'delivery',
+                table=tables[i % BUDGET_TABLES] if i % 4 == 0 else None,
+                address_street='Rua A', address_number='10', address_neighborhood='BAIRRO 1',
+            )
+            for i in range(BUDGET_ORDERS)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_name=products[n].name, quantity=2, price=products[n].price)
+            for order in orders for n in range(3)
+        ])
+        job = Job.objects.create(name='push.broadcast', payload={'tenant_id': tenant.id}, status='done', result={'sent': 1})
+        fee_id = DeliveryFee.objects.filter(tenant=tenant).values_list('id', flat=True).first()
+
+    yield {
+        'owner': owner,
+        'tenant': tenant,
+        'products': products,
+        'kwargs': {
+            'slug': tenant.slug,
+            'table_number': tables[0].number,
+            'order_id': orders[0].id,
+            'product_id': products[0].id,
+            'group_id': group.id,
+            'table_id': tables[0].id,
+            'coupon_id': coupon.id,
+            'fee_id': fee_id,
+            'job_id': job.id,
+            'uidb64': urlsafe_base64_encode(force_bytes(owner.pk)),
+            'token': default_token_generator.make_token(owner),
+        },
+    }
+
+    # Os dados foram criados fora da transação de cada teste
+    with django_db_blocker.unblock():
+        job.delete()
+        tenant.delete()
+        owner.delete()
+
+
+def _route_url(name, store):
+    pattern = next(p for p in tenant_urls.urlpatterns if getattr(p, 'name', None) == name)
+    kwargs = {key: store['kwargs'][key] for key in pattern.pattern.converters}
+    return reverse(name, kwargs=kwargs)
+
+
+def _measure(client, method, url, **kwargs):
+    _clear_caches()
+    with CaptureQueriesContext(connection) as ctx:
+        start = time.perf_counter()
+        response = getattr(client, method)(url, **kwargs)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    return response, len(ctx), elapsed_ms
+
+
+def _check_budget(report, name, role, method, response, queries, elapsed_ms):
+    max_queries = QUERY_BUDGETS.get(name, DEFAULT_QUERY_BUDGET)
+    max_ms = TIME_BUDGETS_MS.get(name, DEFAULT_TIME_BUDGET_MS)
+    ok = queries <= max_queries and elapsed_ms <= max_ms
+    report.append({
+        'name': name, 'role': role, 'method': method.upper(), 'status': response.status_code,
+        'queries': queries, 'max_queries': max_queries, 'ms': elapsed_ms, 'max_ms': max_ms, 'ok': ok,
+    })
+    if response.status_code != EXPECTED_STATUS.get(name):
+        assert response.status_code < 500, f'{name} ({role}) respondeu {response.status_code}'
+    assert queries <= max_queries, f'{name} ({role}): {queries} consultas (limite {max_queries})'
+    assert elapsed_ms <= max_ms, f'{name} ({role}): {elapsed_ms:.0f}ms (limite {max_ms}ms)'
+
+
+@pytest.fixture
+def budget_settings(settings):
+    settings.SECURE_SSL_REDIRECT = False
+    settings.CACHES = LOCMEM_CACHE
+    settings.RATELIMIT_ENABLE = False
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('role', ['owner', 'anonymous'])
+@pytest.mark.parametrize('name', ROUTES)
+def test_view_budget(name, role, budget_store, budget_settings, client, view_budget_report):
+    if role == 'owner':
+        client.force_login(budget_store['owner'])
+
+    url = _route_url(name, budget_store)
+    response, queries, elapsed_ms = _measure(client, 'get', url)
+    _check_budget(view_budget_report, name, role, 'get', response, queries, elapsed_ms)
+
+
+@pytest.mark.django_db
+def test_create_order_budget(budget_store, budget_settings, client, view_budget_report):
+    """Checkout do cliente anônimo com 20 itens diferentes (caminho de escrita mais quente)."""
+    items = [
+        {'id': product.id, 'qtd': 1, 'obs': '', 'options': [{'name': 'Extra 1', 'price': 2}]}
+        for product in budget_store['products'][:20]
+    ]
+    body = {
+        'nome': 'Cliente Teste', 'phone': '83999999999', 'order_type': 'delivery', 'method': 'dinheiro',
+        'address': {'cep': '58000000', 'street': 'Rua A', 'number': '10', 'neighborhood': 'BAIRRO 1'},
+        'items': items,
+    }
+    url = reverse('api_create_order', kwargs={'slug': budget_store['tenant'].slug})
+    response, queries, elapsed_ms = _measure(
+        client, 'post', url, data=json.dumps(body), content_type='application/json'
+    )
+    assert response.json()['status'] == 'success', response.content
+    _check_budget(view_budget_report, 'api_create_order', 'anonymous', 'post', response, queries, elapsed_ms)
@@ -39,9 +39,11 @@ urlpatterns = [
 
     # ROTA PARA CRIAÇÃO DE PEDIDOS
     path('<slug:slug>/api/create_order/', views.create_order, name='api_create_order'),
+    path('<slug:slug>/api/order/<int:order_id>/pix/', views.api_order_pix_status, name='api_order_pix_status'),
 
     # NOVAS ROTAS PARA O PAINEL
     path('<slug:slug>/api/orders/', views.api_get_orders, name='api_get_orders'),
+    path('<slug:slug>/api/orders/stream/', views.api_orders_stream, name='api_orders_stream'),
     path('<slug:slug>/api/orders/<int:order_id>/update/', views.api_update_order, name='api_update_order'),
     path('<slug:slug>/api/orders/<int:order_id>/printed/', views.api_mark_printed, name='api_mark_printed'),
 
@@ -58,6 +60,9 @@ urlpatterns = [
 
     # ROTAS PARA TAXAS DE ENTREGA
     path('<slug:slug>/api/delivery-fees/', views.api_delivery_fees, name='api_delivery_fees'),
+    path('<slug:slug>/api/neighborhoods/', views.api_neighborhood_suggest, name='api_neighborhood_suggest'),
+    path('<slug:slug>/api/cep/', views.api_cep_lookup, name='api_cep_lookup'),
+    path('<slug:slug>/api/delivery-zone/', views.api_delivery_zone, name='api_delivery_zone'),
     path('<slug:slug>/api/delivery-fees/<int:fee_id>/delete/', views.api_delete_delivery_fee, name='api_delete_delivery_fee'),
 
     # NOVAS ROTAS DE PRODUTOS
@@ -97,6 +102,7 @@ urlpatterns = [
     path('<slug:slug>/api/push/subscribe/', views.api_push_subscribe, name='api_push_subscribe'),
     path('<slug:slug>/api/push/subscriptions/count/', views.api_push_subscriptions_count, name='api_push_subscriptions_count'),
     path('<slug:slug>/api/push/send/', views.api_push_send, name='api_push_send'),
+    path('<slug:slug>/api/push/jobs/<int:job_id>/', views.api_push_job_status, name='api_push_job_status'),
 
     # ========================
     # INTEGRAÇÃO MERCADO PAGO (OAuth)
@@ -3,6 +3,7 @@ Validadores customizados para o aplicativo de pedidos.
 """
 from django.core.exceptions import ValidationError
 import re
+import unicodedata
 
 
 def validate_cep(cep):
@@ -135,3 +136,28 @@ def validate_order_data(data, order_type):
         'obs': obs,
         'address': data.get('address', {}) if order_type == 'delivery' else {}
     }
+
+
+def normalizar_texto(texto):
+    """
+    Normaliza uma string para comparação de bairros.
+    Remove acentos, converte para maiúsculas e remove espaços extras.
+    Ex: 'São José' -> 'SAO JOSE'
+    """
+    if not texto:
+        return ''
+    # Normalizaunicode para remover acentos
+    texto_normalizado = unicodedata.normalize('NFD', texto)
+    # Remove os diacríticos (acentos)
+    texto_sem_acentos = ''.join(c for c in texto_normalizado if not unicodedata.combining(c))
+    # Converte para maiúsculas e remove espaços extras
+    return texto_sem_acentos.upper().strip()
+
+
+def neighborhood_key(texto):
+    """
+    Chave de busca do bairro (DeliveryFee.neighborhood_key): normalizar_texto
+    com os espaços internos repetidos reduzidos a um.
+    Ex: '  Jardim   América ' -> 'JARDIM AMERICA'
+    """
+    return ' '.join(normalizar_texto(texto).split())
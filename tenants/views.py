@@ -1,8 +1,17 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
+import asyncio
+import hmac
 import json
-from django.http import JsonResponse
+import re
+import time
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, HttpResponseNotModified, Http404, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import quote_etag, parse_etags
 from django.core.files.storage import default_storage
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
@@ -11,6 +20,7 @@ from django.db.models import Prefetch
 from django.db import IntegrityError, transaction
 from django.db.models import Sum, Prefetch, Count, Q
 from django.utils import timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
 from decimal import Decimal
 from django.core.exceptions import ValidationError
 from django.core.mail import send_mail
@@ -20,10 +30,8 @@ import base64
 from io import BytesIO
 
 from django.conf import settings
-from pywebpush import webpush
 
 import requests
-import mercadopago
 
 from django_ratelimit.decorators import ratelimit
 from django.views.decorators.cache import never_cache
@@ -44,192 +52,58 @@ from .models import (
     CouponUsage,
     Table,
     TenantPaymentConfig,
+    Job,
 )
 
-from .validators import validate_cep, validate_phone, validate_order_data
+from .validators import validate_cep, validate_phone, validate_order_data, normalizar_texto, neighborhood_key
+from .cache import (
+    get_menu_snapshot,
+    bump_menu_version,
+    get_weekly_schedule,
+    invalidate_weekly_schedule,
+    get_store_status,
+    set_store_status,
+    invalidate_store_status,
+)
+from .access import get_request_tenant, get_tenant_ref, can_manage_tenant, tenant_owner_required
+from .payments import make_pix_token, check_pix_token, pix_payload, PIX_STATUS_ERROR
+from .jobs import enqueue
+from .neighborhoods import get_neighborhood_index
+from .cep_index import lookup_cep
+from .zones import get_zone_index, parse_point
+from .metrics import ORDERS_CREATED, registry as metrics_registry
+from .events import (
+    hub,
+    publish_order_change,
+    ensure_seq,
+    current_seq,
+    changed_order_ids,
+    STREAM_MAX_SECONDS,
+    STREAM_POLL_SECONDS,
+    STREAM_KEEPALIVE_SECONDS,
+)
 
 # CORRIGIDO: Usar logger ao invés de print
 logger = logging.getLogger(__name__)
 
-def normalizar_texto(texto):
-    """
-    Normaliza uma string para comparação de bairros.
-    Remove acentos, converte para maiúsculas e remove espaços extras.
-    Ex: 'São José' -> 'SAO JOSE'
-    """
-    import unicodedata
-    if not texto:
-        return ''
-    # Normalizaunicode para remover acentos
-    texto_normalizado = unicodedata.normalize('NFD', texto)
-    # Remove os diacríticos (acentos)
-    texto_sem_acentos = ''.join(c for c in texto_normalizado if not unicodedata.combining(c))
-    # Converte para maiúsculas e remove espaços extras
-    return texto_sem_acentos.upper().strip()
-
-def send_push_notification(order, tenant, custom_title=None, custom_body=None):
-    from .models import PushSubscription
-    
-    try:
-        VAPID_PRIVATE_KEY = getattr(settings, 'VAPID_PRIVATE_KEY', None)
-        VAPID_CLAIM_EMAIL = getattr(settings, 'VAPID_CLAIM_EMAIL', 'mailto:admin@admin.com')
-        
-        if not VAPID_PRIVATE_KEY:
-            return {'success': False, 'error': 'VAPID key not configured'}
-
-        # Lógica de Mensagem
-        subscriptions = []
-        
-        if custom_body:
-            # Notificação Manual (Promoção/Aviso) -> Envia para TODOS
-            title = custom_title or tenant.name
-            body = custom_body
-            url = f"/{tenant.slug}/"
-            subscriptions = PushSubscription.objects.filter(tenant=tenant, is_active=True)
-            
-        elif order:
-            # Notificação de Pedido -> Envia APENAS para o CLIENTE ESPECÍFICO
-            title = f"🔔 Atualização do Pedido #{order.id}"
-            url = f"/{tenant.slug}/meus-pedidos/"
-            
-            if order.status == 'saiu_entrega':
-                body = f"🏍️ Seu pedido saiu para entrega! Acompanhe."
-            else:
-                body = f"Status atualizado para: {order.get_status_display()}"
-            
-            # CORREÇÃO: Filtrar pelo telefone
-            if order.customer_phone:
-                # Garante que só temos números para comparar
-                target_phone = ''.join(filter(str.isdigit, order.customer_phone))
-                
-                subscriptions = PushSubscription.objects.filter(
-                    tenant=tenant, 
-                    is_active=True, 
-                    customer_phone=target_phone
-                )
-                
-                if not subscriptions.exists():
-                    logger.warning(f"[PUSH] Nenhuma inscrição encontrada para o telefone {target_phone}")
-                    return {'success': False, 'error': 'Cliente não inscrito no push'}
-            else:
-                logger.warning("[PUSH] Pedido sem telefone, impossível notificar.")
-                return {'success': False, 'error': 'Pedido sem telefone'}
-        
-        else:
-            return {'success': False, 'error': 'Sem contexto'}
-
-        # Envio
-        sent_count = 0
-        icon_url = tenant.logo.url if tenant.logo else '/static/img/icon-192.svg'
-        
-        for sub in subscriptions:
-            try:
-                webpush(
-                    subscription_info=sub.to_json(),
-                    data=json.dumps({
-                        'title': title,
-                        'body': body,
-                        'icon': icon_url,
-                        'url': url
-                    }),
-                    vapid_private_key=VAPID_PRIVATE_KEY,
-                    vapid_claims={'sub': VAPID_CLAIM_EMAIL}
-                )
-                sent_count += 1
-            except Exception as e:
-                if '410' in str(e) or 'not found' in str(e).lower():
-                    sub.is_active = False # Marca como inativo se falhar permanentemente
-                    sub.save()
-                logger.error(f"[PUSH] Erro individual: {e}")
-
-        logger.info(f"[PUSH] Enviado para {sent_count} dispositivos.")
-        return {'success': True, 'sent': sent_count}
-
-    except Exception as e:
-        logger.error(f"[PUSH] Erro crítico: {e}")
-        return {'success': False, 'error': str(e)}
-
-def is_store_open_by_hours(tenant):
+def is_store_open_by_hours(tenant, schedule=None):
     """
     Verifica se a loja está aberto baseado no horário de funcionamento.
     Retorna (True, 'ABERTO - Fecha as XX:XX') se aberto,
     (False, 'FECHADO HOJE') se fechado hoje,
     (False, 'FECHADO AGORA - ABRE AS XX:XX') se fora do horário mas abre hoje,
-    (False, 'FECHADO HOJE') se não abre hoje
+    (False, 'FECHADO - ABRE <Dia> às XX:XX') se só abre em outro dia
+
+    Usa o horário semanal compilado (cache), sem consultar o banco a cada chamada.
+    Quem já tem o WeeklySchedule em mãos (ex: snapshot do cardápio) pode passá-lo em `schedule`.
     """
-    from datetime import datetime
-    from django.utils import timezone
-    
+    if schedule is None:
+        schedule = get_weekly_schedule(tenant.id)
+
     # Usar timezone.localtime para garantir horário do Brasil
     now = timezone.localtime(timezone.now())
-    current_minutes = now.hour * 60 + now.minute
-    current_weekday = now.weekday()  # 0=Segunda, 6=Domingo
-    
-    # Converter Python weekday (0=Segunda...6=Domingo) para model (0=Domingo...6=Sábado)
-    model_today = (current_weekday + 1) % 7
-    
-    def check_rule(rule):
-        """Verifica se uma regra de horário permite a loja aberta"""
-        if not rule:
-            return None
-        
-        if rule.is_closed:
-            return None
-        
-        if not rule.open_time or not rule.close_time:
-            return None
-        
-        open_min = rule.open_time.hour * 60 + rule.open_time.minute
-        close_min = rule.close_time.hour * 60 + rule.close_time.minute
-        
-        # Se close < open, é horário de madrugada (ex: 18:00 às 02:00)
-        if close_min < open_min:
-            # Está aberto se já passou do open OU ainda não passou do close
-            return current_minutes >= open_min or current_minutes < close_min
-        else:
-            # Horário normal (ex: 08:00 às 18:00)
-            return open_min <= current_minutes < close_min
-    
-    # 1. Verificar regra de HOJE no model
-    today_rule = OperatingDay.objects.filter(tenant=tenant, day=model_today).first()
-    
-    if today_rule:
-        if today_rule.is_closed:
-            # HOJE está marcado como fechado
-            return (False, 'FECHADO HOJE')
-        
-        today_check = check_rule(today_rule)
-        if today_check is True:
-            # Está aberto, retorna mensagem com horário de fechamento
-            close_time = today_rule.close_time.strftime('%H:%M') if today_rule.close_time else '23:59'
-            return (True, f'ABERTO - Fecha as {close_time}')
-        
-        # HOJE tem horário definido mas está FORA do horário
-        if today_rule.open_time and today_rule.close_time:
-            # Verificar se ainda não chegou na hora de abrir
-            open_min = today_rule.open_time.hour * 60 + today_rule.open_time.minute
-            if current_minutes < open_min:
-                return (False, f'FECHADO AGORA - ABRE AS {today_rule.open_time.strftime("%H:%M")}')
-            else:
-                # Passou do horário de fechamento
-                return (False, 'FECHADO HOJE')
-    
-    # Se não tem configuração para hoje, procurar quando abre
-    # 2. Procurar próximo dia que abre
-    for i in range(1, 7):  # Verificar próximos 6 dias
-        next_day = (model_today + i) % 7
-        next_rule = OperatingDay.objects.filter(tenant=tenant, day=next_day).first()
-        
-        if next_rule and not next_rule.is_closed and next_rule.open_time:
-            # Encontrou um dia que abre
-            day_names = ['Domingo', 'Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado']
-            # Converter Python weekday (0=Segunda...6=Domingo) para array (0=Domingo...6=Sábado)
-            model_weekday = (now.weekday() + 1) % 7
-            day_name = day_names[(model_weekday + i) % 7]
-            return (False, f'FECHADO - ABRE {day_name} às {next_rule.open_time.strftime("%H:%M")}')
-    
-    # Se não encontrou nenhum dia configurado
-    return (False, 'FECHADO HOJE')
+    is_open, message, _ = schedule.status(now)
+    return (is_open, message)
 
 
 
@@ -249,82 +123,8 @@ def home(request):
     return render(request, 'tenants/landing.html')
 
 def cardapio_publico(request, slug):
-    tenant = get_object_or_404(Tenant, slug=slug)
-
-    # 1. Carrega todos os horários para o JS
-    db_days = OperatingDay.objects.filter(tenant=tenant).order_by('day')
-    schedule_data = {}
-    for d in db_days:
-        schedule_data[d.day] = {
-            'open': d.open_time.strftime('%H:%M') if d.open_time else '00:00',
-            'close': d.close_time.strftime('%H:%M') if d.close_time else '00:00',
-            'closed': d.is_closed
-        }
-
-    delivery_fees = list(tenant.delivery_fees.values('neighborhood', 'fee'))
-    
-    now = timezone.localtime(timezone.now())
-    py_weekday = now.weekday() 
-    
-    today_index = 0 if py_weekday == 6 else py_weekday + 1
-    
-    day_today = OperatingDay.objects.filter(tenant=tenant, day=today_index).first()
-
-    # 3. Produtos e Categorias
-    produtos_ativos = Product.objects.filter(is_available=True)
-    categories = Category.objects.filter(
-        tenant=tenant,
-        products__is_available=True 
-    ).prefetch_related(
-        Prefetch('products', queryset=produtos_ativos)
-    ).distinct().order_by('order')
-
-    # 4. Determinar se a loja está aberta (NOVA LÓGICA PROFISSIONAL)
-    # Padrão: SEMPRE ABERTA. Só fecha se:
-    # (a) Não for hora de abrir (por horário) OU
-    # (b) Dono ativou fechamento manual (manual_override)
-    
-    store_is_open = True  # Por padrão: sempre aberta
-    store_closed_message = None
-    
-    is_open_by_hours, status = is_store_open_by_hours(tenant)
-    
-    if not is_open_by_hours:
-        store_is_open = False
-        if status == 'CLOSED_TODAY':
-            store_closed_message = "Fechado HOJE"
-        elif status == 'SCHEDULE_CLOSED_TIME':
-            today_rule = OperatingDay.objects.filter(tenant=tenant, day=today_index).first()
-            if today_rule and today_rule.open_time:
-                opens_at = f"{today_rule.open_time.hour:02d}:{today_rule.open_time.minute:02d}"
-                store_closed_message = f"Fechado - Abre às {opens_at}"
-            else:
-                store_closed_message = "Fechado - Abre amanhã"
-        else:
-            store_closed_message = "Fechado - Abre amanhã"
-    
-    if tenant.manual_override:
-        store_is_open = False
-        store_closed_message = "FECHADO TEMPORARIAMENTE"
-
-    context = {
-        'tenant': tenant,
-        'categories': categories,
-        'schedule_json': json.dumps(schedule_data),
-        'operating_days': db_days,
-        'day_today': day_today,
-        # Variáveis de status da loja
-        'store_is_open': store_is_open,
-        'store_closed_message': store_closed_message,
-        'delivery_fees_json': json.dumps(delivery_fees, default=float),
-        # Flag para identificar que não é pedido de mesa
-        'is_table_order': False,
-        'table': None,
-        # VAPID Public Key para notificações push (injetada do settings.py)
-        'vapid_public_key': getattr(settings, 'VAPID_PUBLIC_KEY', '')
-    }
-    
-    return render(request, 'tenants/cardapio.html', context)
+    tenant = get_request_tenant(request, slug)
+    return _render_cardapio(request, tenant)
 
 
 # ========================
@@ -335,7 +135,7 @@ def cardapio_mesa(request, slug, table_number):
     Cardápio específico para pedido na mesa.
     O cliente escaneia o QR code da mesa e vai direto para esta página.
     """
-    tenant = get_object_or_404(Tenant, slug=slug)
+    tenant = get_request_tenant(request, slug)
     
     # Validar mesa com mensagem customizada
     table = Table.objects.filter(
@@ -352,34 +152,23 @@ def cardapio_mesa(request, slug, table_number):
             'table_number': table_number
         }
         return render(request, 'tenants/error_table.html', context, status=404)
-    
-    # 1. Carrega todos os horários para o JS
-    db_days = OperatingDay.objects.filter(tenant=tenant).order_by('day')
-    schedule_data = {}
-    for d in db_days:
-        schedule_data[d.day] = {
-            'open': d.open_time.strftime('%H:%M') if d.open_time else '00:00',
-            'close': d.close_time.strftime('%H:%M') if d.close_time else '00:00',
-            'closed': d.is_closed
-        }
 
-    delivery_fees = list(tenant.delivery_fees.values('neighborhood', 'fee'))
-    
+    return _render_cardapio(request, tenant, table=table)
+
+
+def _render_cardapio(request, tenant, table=None):
+    """
+    Renderiza o cardápio (público ou de mesa) a partir do snapshot em cache.
+    Categorias, produtos, adicionais, horários e taxas vêm de get_menu_snapshot().
+    """
+    menu = get_menu_snapshot(tenant)
+
     now = timezone.localtime(timezone.now())
     py_weekday = now.weekday() 
     
     today_index = 0 if py_weekday == 6 else py_weekday + 1
     
-    day_today = OperatingDay.objects.filter(tenant=tenant, day=today_index).first()
-
-    # 3. Produtos e Categorias
-    produtos_ativos = Product.objects.filter(is_available=True)
-    categories = Category.objects.filter(
-        tenant=tenant,
-        products__is_available=True 
-    ).prefetch_related(
-        Prefetch('products', queryset=produtos_ativos)
-    ).distinct().order_by('order')
+    day_today = next((d for d in menu['schedule'] if d['day'] == today_index), None)
 
     # 4. Determinar se a loja está aberta (NOVA LÓGICA PROFISSIONAL)
     # Padrão: SEMPRE ABERTA. Só fecha se:
@@ -389,16 +178,15 @@ def cardapio_mesa(request, slug, table_number):
     store_is_open = True  # Por padrão: sempre aberta
     store_closed_message = None
     
-    is_open_by_hours, status = is_store_open_by_hours(tenant)
+    is_open_by_hours, status = is_store_open_by_hours(tenant, schedule=menu['weekly_schedule'])
     
     if not is_open_by_hours:
         store_is_open = False
         if status == 'CLOSED_TODAY':
             store_closed_message = "Fechado HOJE"
         elif status == 'SCHEDULE_CLOSED_TIME':
-            today_rule = OperatingDay.objects.filter(tenant=tenant, day=today_index).first()
-            if today_rule and today_rule.open_time:
-                opens_at = f"{today_rule.open_time.hour:02d}:{today_rule.open_time.minute:02d}"
+            if day_today and day_today['open_time']:
+                opens_at = f"{day_today['open_time'].hour:02d}:{day_today['open_time'].minute:02d}"
                 store_closed_message = f"Fechado - Abre às {opens_at}"
             else:
                 store_closed_message = "Fechado - Abre amanhã"
@@ -411,16 +199,17 @@ def cardapio_mesa(request, slug, table_number):
 
     context = {
         'tenant': tenant,
-        'categories': categories,
-        'schedule_json': json.dumps(schedule_data),
-        'operating_days': db_days,
+        'categories': menu['categories'],
+        'schedule_json': menu['schedule_json'],
+        'operating_days': menu['schedule'],
         'day_today': day_today,
         # Variáveis de status da loja
         'store_is_open': store_is_open,
         'store_closed_message': store_closed_message,
-        'delivery_fees_json': json.dumps(delivery_fees, default=float),
-        # Flag para identificar que é pedido de mesa
-        'is_table_order': True,
+        'delivery_fees_json': menu['delivery_fees_json'],
+        'accepts_online_pix': menu['accepts_online_pix'],
+        # Flag para identificar se é pedido de mesa
+        'is_table_order': table is not None,
         'table': table,
         # VAPID Public Key para notificações push (injetada do settings.py)
         'vapid_public_key': getattr(settings, 'VAPID_PUBLIC_KEY', '')
@@ -432,10 +221,10 @@ def cardapio_mesa(request, slug, table_number):
 @never_cache
 @login_required
 def painel_lojista(request, slug):
-    tenant = get_object_or_404(Tenant, slug=slug)
+    tenant = get_request_tenant(request, slug)
     
     # SEGURANÇA CRÍTICA: Verificar se o usuário logado é o dono da loja
-    if tenant.owner != request.user and not request.user.is_superuser:
+    if not can_manage_tenant(request.user, tenant):
         # Se não for o dono, verificar se ele possui alguma loja
         user_tenant = Tenant.objects.filter(owner=request.user).first()
         if user_tenant:
@@ -480,7 +269,61 @@ def painel_lojista(request, slug):
     }
     return render(request, 'tenants/painel.html', context)
 
-@transaction.atomic
+# Quantidade que o front acrescenta ao nome do opcional repetido: "Bacon (3x)"
+OPTION_QUANTITY_SUFFIX = re.compile(r'\s\((\d+)x\)$')
+
+def _option_price(option_prices, product_id, opt_name):
+    """
+    Preço total do opcional como o front manda ('Coca-Cola (350ml)', 'Bacon (3x)').
+    Procura o nome inteiro primeiro; só depois tira o sufixo de quantidade e
+    multiplica o preço unitário. Retorna (nome_base, preço) ou (nome_base, None).
+    """
+    name = opt_name.strip()
+    price = option_prices.get((product_id, name.upper()))
+    if price is not None:
+        return name, price
+
+    match = OPTION_QUANTITY_SUFFIX.search(name)
+    if match:
+        base_name = name[:match.start()].strip()
+        price = option_prices.get((product_id, base_name.upper()))
+        if price is not None and int(match.group(1)) > 0:
+            return base_name, price * int(match.group(1))
+        return base_name, None
+    return name, None
+
+def _load_cart_prices(tenant, cart_items):
+    """
+    Carrega de uma vez tudo que o carrinho referencia, para precificar sem
+    uma consulta por item/opcional (2 consultas, qualquer que seja o tamanho do carrinho).
+
+    Retorna (produtos_por_id, preço_do_opcional) onde preço_do_opcional é
+    {(product_id, NOME_EM_MAIÚSCULAS): preço}.
+    """
+    product_ids = set()
+    for item in cart_items:
+        try:
+            product_ids.add(int(item['id']))
+        except (ValueError, TypeError):
+            # ID inválido: tratado como produto inexistente na validação
+            pass
+
+    products = {
+        p.id: p
+        for p in Product.objects.filter(tenant=tenant, id__in=product_ids).only('id', 'name', 'price', 'is_available')
+    }
+
+    # Mesma regra do iexact: "Bacon" só casa com "Bacon", nunca com "Bacon Extra".
+    # Em caso de nomes repetidos vale o primeiro item cadastrado.
+    option_prices = {}
+    option_rows = OptionItem.objects.filter(
+        option__product_id__in=products.keys()
+    ).order_by('id').values_list('option__product_id', 'name', 'price')
+    for product_id, name, price in option_rows:
+        option_prices.setdefault((product_id, name.upper()), price)
+
+    return products, option_prices
+
 @ratelimit(key='ip', rate='3/m', block=False)
 def create_order(request, slug):
 
@@ -494,7 +337,7 @@ def create_order(request, slug):
     if request.method == 'POST':
         try:
             # 1. Identifica a loja
-            tenant = get_object_or_404(Tenant, slug=slug)
+            tenant = get_request_tenant(request, slug)
             
             # Validações de Loja Aberta (Mantida sua lógica que é boa)
             if not tenant.is_open:
@@ -615,11 +458,13 @@ def create_order(request, slug):
             items_total = Decimal('0.00')
             order_items_objects = [] # Lista para salvar depois
 
+            # Produtos e opcionais do carrinho inteiro com os PREÇOS REAIS do banco
+            products_by_id, option_prices = _load_cart_prices(tenant, cart_items)
+
             for item in cart_items:
-                # Busca o produto original no banco para pegar o PREÇO REAL
                 try:
-                    product = Product.objects.get(id=item['id'], tenant=tenant)
-                except Product.DoesNotExist:
+                    product = products_by_id[int(item['id'])]
+                except (KeyError, ValueError, TypeError):
                     return JsonResponse({'status': 'error', 'message': f"Produto ID {item['id']} não existe ou foi removido."}, status=400)
                 
                 # Validar disponibilidade
@@ -645,25 +490,19 @@ def create_order(request, slug):
                 for opt in options_list:
                     # O front manda {name: 'Bacon', price: 2.00} ou {name: 'Bacon (3x)', price: 6.00}
                     # Usamos o nome do front para preservar a quantidade se existir
-                    opt_name = opt.get('name')
-                    
-                    # Busca complexa: OpçãoItem -> ProductOption -> Product
-                    # Primeiro tenta encontrar o item exato (para validar preço)
-                    clean_name = opt_name.split(' (')[0].strip()
-
-                    # 2. Busca EXATA (iexact): Garante que "Bacon" só pegue "Bacon", e não "Bacon Extra"
-                    db_option_item = OptionItem.objects.filter(
-                        name__iexact=clean_name, 
-                        option__product=product
-                    ).first()
-                    
-                    if db_option_item:
-                        current_item_total += db_option_item.price
-                        # Usa o nome do front (que pode ter "(3x)") em vez do nome do banco
-                        valid_options_text.append(opt_name)
-                    else:
-                        # Se não encontrar, ainda assim salva o nome do front
-                        valid_options_text.append(opt_name)
+                    opt_name = str(opt.get('name') or '')
+
+                    # Busca EXATA (sem diferenciar maiúsculas) nos opcionais deste produto;
+                    # "Bacon (3x)" vale 3 vezes o preço do Bacon
+                    clean_name, option_price = _option_price(option_prices, product.id, opt_name)
+
+                    if option_price is None:
+                        # Opcional que não existe (ou foi removido) não entra no pedido sem preço
+                        return JsonResponse({'status': 'error', 'message': f"O opcional {clean_name} não está disponível para {product.name}."}, status=400)
+
+                    current_item_total += option_price
+                    # Usa o nome do front (que pode ter "(3x)") em vez do nome do banco
+                    valid_options_text.append(opt_name)
 
                 quantity = int(item['qtd'])
                 items_total += current_item_total * quantity
@@ -685,19 +524,21 @@ def create_order(request, slug):
             if order_type == 'table':
                 delivery_fee = Decimal('0.00')
             elif neighborhood:
-                # Normaliza o bairro do cliente para busca
-                neighborhood_normalized = normalizar_texto(neighborhood)
-                
-                # Busca todas as taxas e compara com versão normalizada
-                fees = DeliveryFee.objects.filter(tenant=tenant)
-                fee_obj = None
-                for fee in fees:
-                    if normalizar_texto(fee.neighborhood) == neighborhood_normalized:
-                        fee_obj = fee
-                        break
-                
-                if fee_obj:
-                    delivery_fee = fee_obj.fee
+                # Localização do GPS dentro de uma zona de entrega (tenants/zones.py)
+                point = parse_point(address_data.get('lat'), address_data.get('lng')) if order_type == 'delivery' else None
+                zone_match = get_zone_index(tenant.id).lookup(*point) if point else None
+                if zone_match:
+                    delivery_fee = zone_match.fee
+                else:
+                    # Bairro exato ou bem parecido ('Jd. America' -> 'JARDIM AMÉRICA'),
+                    # pelo índice de trigramas em cache (tenants/neighborhoods.py)
+                    fee_index = get_neighborhood_index(tenant.id)
+                    # O bairro do CEP (base local, tenants/cep_index.py) vale mais que o digitado
+                    cep_entry = lookup_cep(cep_clean) if order_type == 'delivery' else None
+                    fee_match = fee_index.match(cep_entry.neighborhood) if cep_entry else None
+                    fee_match = fee_match or fee_index.match(neighborhood)
+                    if fee_match:
+                        delivery_fee = fee_match.fee
 
             # C. Calcular Cupom (Validar no Backend)
             discount_value = Decimal('0.00')
@@ -714,9 +555,6 @@ def create_order(request, slug):
                         else:
                             final_val, discount_amt = coupon.apply_discount(items_total)
                             discount_value = Decimal(str(discount_amt))
-                            
-                            coupon.used_count += 1
-                            coupon.save()
                             applied_coupon = coupon
 
             # D. TOTAL FINAL REAL
@@ -730,7 +568,7 @@ def create_order(request, slug):
             # Criação do Pedido
             obs = data.get('obs', '').strip()[:500]  # Limitar a 500 caracteres
             
-            order = Order.objects.create(
+            order = Order(
                 tenant=tenant,
                 customer_name=nome,
                 status=status_inicial,
@@ -758,84 +596,60 @@ def create_order(request, slug):
                 scheduled_date=scheduled_date if is_scheduled else None,
                 scheduled_time=scheduled_time if is_scheduled else None
             )
-            
-            # Cria os Itens (usando os dados validados)
-            for item_obj in order_items_objects:
-                OrderItem.objects.create(
-                    order=order,
-                    product_name=item_obj['product_name'],
-                    quantity=item_obj['quantity'],
-                    price=item_obj['price'],
-                    observation=item_obj['observation'],
-                    options_text=item_obj['options_text']
-                )
-                
-            # Registro de uso do cupom (Tabela Link)
-            if applied_coupon:
-                CouponUsage.objects.create(
-                    coupon=applied_coupon,
-                    order=order,
-                    discount_applied=discount_value
-                )
 
-                # ============================================================
+            # ============================================================
             # INTEGRAÇÃO MERCADO PAGO: GERAÇÃO DO PIX
             # ============================================================
-            mp_response_data = None
-            
-            # Só gera PIX se o método for 'pix' E a loja tiver a conta conectada
-            if data.get('method') == 'pix' and hasattr(tenant, 'payment_config'):
-                try:
-                    # 1. Inicializa SDK com o Token DO LOJISTA
-                    sdk = mercadopago.SDK(tenant.payment_config.access_token)
-                    
-                    # 2. Prepara os dados do pagamento
-                    # Email é obrigatório na API, usamos um fictício caso não tenha
-                    payer_email = "cliente@rmpedidos.online" 
-                    
-                    payment_data = {
-                        "transaction_amount": float(final_total),
-                        "description": f"Pedido #{order.id} - {tenant.name}",
-                        "payment_method_id": "pix",
-                        "payer": {
-                            "email": payer_email,
-                            "first_name": nome.split()[0],
-                            "last_name": nome.split()[-1] if len(nome.split()) > 1 else "Cliente",
-                        },
-                        # A URL onde o MP vai avisar que o pagamento foi aprovado
-                        # IMPORTANTE: Deve ser HTTPS em produção
-                        "notification_url": "https://rmpedidos.online/api/mp/webhook/",
-                        "external_reference": str(order.id)
-                    }
-
-                    # 3. Cria o pagamento
-                    mp_response = sdk.payment().create(payment_data)
-                    mp_result = mp_response["response"]
-                    
-                    # 4. Salva os dados do PIX no pedido
-                    if mp_response["status"] == 201: # Sucesso
-                        poi = mp_result.get("point_of_interaction", {}).get("transaction_data", {})
-                        
-                        order.mercadopago_id = str(mp_result.get("id"))
-                        order.mercadopago_status = mp_result.get("status")
-                        order.pix_qr_code = poi.get("qr_code") # Copia e Cola
-                        order.pix_qr_code_base64 = poi.get("qr_code_base64") # Imagem
-                        order.pix_ticket_url = poi.get("ticket_url")
-                        order.save()
-                        
-                        # Dados para retornar ao Frontend
-                        mp_response_data = {
-                            'qr_code': poi.get("qr_code"),
-                            'qr_code_base64': poi.get("qr_code_base64"),
-                            'ticket_url': poi.get("ticket_url")
-                        }
+            # Só gera PIX se o método for 'pix' E a loja tiver a conta conectada.
+            # A cobrança é criada pela fila de jobs depois que o pedido é gravado:
+            # o frontend consulta o resultado em api_order_pix_status.
+            pix_pending = data.get('method') == 'pix' and hasattr(tenant, 'payment_config')
+
+            # ESCRITA: tudo acima só leu o banco. A transação fica aberta apenas
+            # durante os INSERTs/UPDATE abaixo (pedido, itens, job, cupom, uso do cupom).
+            coupon_exhausted = False
+            with transaction.atomic():
+                order.save(force_insert=True)
+                # Painéis abertos recebem o pedido pelo stream depois do COMMIT
+                publish_order_change(order)
+
+                # Cria os Itens (usando os dados validados) em um único INSERT
+                OrderItem.objects.bulk_create([
+                    OrderItem(
+                        order=order,
+                        product_name=item_obj['product_name'],
+                        quantity=item_obj['quantity'],
+                        price=item_obj['price'],
+                        observation=item_obj['observation'],
+                        options_text=item_obj['options_text']
+                    )
+                    for item_obj in order_items_objects
+                ])
+
+                if pix_pending:
+                    # O job só fica visível para os workers depois do COMMIT
+                    enqueue('mp.create_pix', {'order_id': order.id})
+
+                # Cupom por último: o UPDATE trava a linha do cupom (disputada por todos
+                # os pedidos da promoção) só até o COMMIT logo abaixo
+                if applied_coupon:
+                    if applied_coupon.redeem():
+                        # Registro de uso do cupom (Tabela Link). Depende do resultado do
+                        # resgate, por isso não vai junto com os INSERTs acima
+                        CouponUsage.objects.create(
+                            coupon=applied_coupon,
+                            order=order,
+                            discount_applied=discount_value
+                        )
                     else:
-                        logger.error(f"Erro MP: {mp_result}")
-                        
-                except Exception as e:
-                    # Se der erro no MP, não cancelamos o pedido, mas avisamos no log
-                    # O cliente poderá ver o PIX chave manual como fallback se quiser
-                    logger.error(f"Erro ao gerar PIX MP: {e}")
+                        # Esgotou entre a validação e agora: desfaz o pedido inteiro
+                        transaction.set_rollback(True)
+                        coupon_exhausted = True
+
+            if coupon_exhausted:
+                return JsonResponse({'status': 'error', 'message': 'Cupom atingiu limite de uso. Remova o cupom e tente novamente.'}, status=400)
+
+            ORDERS_CREATED.inc(status=order.status, order_type=order_type)
 
             try:
                 # 1. Recupera o endpoint salvo no cookie do navegador
@@ -853,13 +667,19 @@ def create_order(request, slug):
             except Exception as e:
                 logger.warning(f"[PUSH] Erro ao vincular telefone no pedido: {e}")
             
-            return JsonResponse({
+            response_data = {
                 'status': 'success', 
                 'order_id': order.id, 
                 'real_total': float(final_total),
                 'order_type': order_type,
-                'pix_data': mp_response_data
-            })
+                'pix_data': None,
+                'pix_pending': pix_pending,
+            }
+            if pix_pending:
+                token = make_pix_token(order.id)
+                response_data['pix_token'] = token
+                response_data['pix_status_url'] = f"{reverse('api_order_pix_status', args=[tenant.slug, order.id])}?token={token}"
+            return JsonResponse(response_data)
 
         except ValidationError as e:
             # Erros de validação (CEP, telefone, etc)
@@ -875,7 +695,7 @@ def create_order(request, slug):
             return JsonResponse({'status': 'error', 'message': 'Dados inválidos enviados. Tente novamente.'}, status=400)
         
         except Exception as e:
-            # Em caso de erro genérico, o transaction.atomic desfaz tudo
+            # Em caso de erro na gravação, o transaction.atomic desfaz tudo
             logger.error(f"Erro inesperado ao criar pedido: {type(e).__name__} - {str(e)}", exc_info=True)
             return JsonResponse({
                 'status': 'error', 
@@ -884,14 +704,131 @@ def create_order(request, slug):
 
     return JsonResponse({'status': 'error', 'message': 'Método inválido'}, status=400)
 
+@never_cache
+def api_order_pix_status(request, slug, order_id):
+    """
+    Consulta do PIX gerado em segundo plano após o pedido.
+    O cliente chama com o token recebido em create_order até o status sair de 'pending'.
+    """
+    if not check_pix_token(request.GET.get('token', ''), order_id):
+        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+
+    order = Order.objects.filter(id=order_id, tenant__slug=slug).only(
+        'id', 'mercadopago_status', 'pix_qr_code', 'pix_qr_code_base64', 'pix_ticket_url'
+    ).first()
+    if not order:
+        return JsonResponse({'status': 'error', 'message': 'Pedido não encontrado'}, status=404)
+
+    pix_data = pix_payload(order)
+    if pix_data:
+        pix_status = 'ready'
+    elif order.mercadopago_status == PIX_STATUS_ERROR:
+        pix_status = 'failed'
+    else:
+        pix_status = 'pending'
+
+    return JsonResponse({'status': 'success', 'pix_status': pix_status, 'pix_data': pix_data})
+
+# Colunas usadas por _serialize_panel_order. Fica de fora principalmente o
+# pix_qr_code_base64 (imagem do QR Code, dezenas de KB por pedido PIX)
+PANEL_ORDER_FIELDS = (
+    'id', 'customer_name', 'customer_phone', 'total_value', 'delivery_fee',
+    'discount_value', 'status', 'is_printed', 'payment_method',
+    'address_street', 'address_number', 'address_neighborhood', 'observation',
+    'created_at', 'order_type', 'is_scheduled', 'scheduled_date', 'scheduled_time',
+    'table__id', 'table__number', 'coupon__code',
+)
+
+def _panel_orders_queryset(tenant):
+    """Pedidos da loja prontos para _serialize_panel_order: 2 consultas para qualquer quantidade."""
+    return (
+        Order.objects.filter(tenant=tenant)
+        .select_related('table', 'coupon')
+        .prefetch_related(Prefetch(
+            'items',
+            queryset=OrderItem.objects.only(
+                'order', 'product_name', 'quantity', 'price', 'observation', 'options_text'
+            ).order_by('id'),
+        ))
+        .only(*PANEL_ORDER_FIELDS)
+    )
+
+def _serialize_panel_order(order):
+    """Pedido no formato usado pelo painel (api_get_orders e stream de pedidos)."""
+    items = []
+    for item in order.items.all():
+        items.append({
+            'name': item.product_name,
+            'quantity': item.quantity,
+            'price': float(item.price),
+            'obs': item.observation,
+            'options': item.options_text or ''
+        })
+
+    # Identificar informações da mesa (NOVO)
+    table_info = None
+    if order.table:
+        table_info = {
+            'id': order.table.id,
+            'number': order.table.number
+        }
+
+    # Formata o endereço ou mesa
+    if order.order_type == 'table':
+        address_display = f"Mesa {order.table.number}"
+    elif order.address_street:
+        address_display = f"{order.address_street}, {order.address_number} - {order.address_neighborhood}"
+    else:
+        address_display = "Retirada"
+
+    return {
+        'id': order.id,
+        'customer_name': order.customer_name,
+        'customer_phone': order.customer_phone,
+        'phone': order.customer_phone,
+        'total_value': float(order.total_value),
+        'delivery_fee': float(order.delivery_fee) if order.delivery_fee else 0,
+        'discount_amount': float(order.discount_value) if order.discount_value else 0,
+        'discount_value': float(order.discount_value) if order.discount_value else 0,
+        'coupon_code': order.coupon.code if order.coupon else None,
+        'status': order.status,
+        'is_printed': order.is_printed,
+        'payment_method': order.payment_method,
+        'address': address_display,
+        'observation': order.observation,
+        'created_at': timezone.localtime(order.created_at).strftime('%d/%m %H:%M'),
+        'items': items,
+        'order_type': order.order_type,
+        'table': table_info,
+        'table_number': order.table.number if order.table else None,
+        # ADICIONE ESTES CAMPOS:
+        'is_scheduled': order.is_scheduled,
+        'scheduled_date': order.scheduled_date.strftime('%d/%m/%Y') if order.scheduled_date else None,
+        'scheduled_time': order.scheduled_time.strftime('%H:%M') if order.scheduled_time else None,
+    }
+
+# O cursor devolvido fica um pouco antes do momento da consulta: pedido salvo
+# numa transação que ainda não tinha feito COMMIT (ou por outro servidor com
+# relógio levemente atrasado) aparece na consulta seguinte. O painel junta
+# por id, então receber um pedido repetido não tem efeito.
+ORDERS_SINCE_OVERLAP = timedelta(seconds=5)
+
+def _orders_cursor(value):
+    return str(int(value.timestamp() * 1_000_000))
+
+def _parse_orders_cursor(cursor):
+    """Cursor opaco (microssegundos desde a epoch) -> datetime. ValueError se inválido."""
+    return datetime.fromtimestamp(int(cursor) / 1_000_000, tz=dt_timezone.utc)
+
 @login_required
+@tenant_owner_required
 def api_get_orders(request, slug):
-    # Retorna os pedidos da loja (JSON) para o painel atualizar via AJAX
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    # Verificar se o usuário é o dono da loja
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'error': 'Acesso negado'}, status=403)
+    """
+    Retorna os pedidos da loja (JSON) para o painel atualizar via AJAX.
+    Sem parâmetros: os 20 mais recentes. Com ?since=<cursor>: só os pedidos
+    alterados depois do cursor (delta). As duas respostas trazem o próximo cursor.
+    """
+    tenant = get_request_tenant(request, slug)
 
     # --- PROTEÇÃO DO PLANO ---
     if not tenant.can_access_orders:
@@ -900,7 +837,7 @@ def api_get_orders(request, slug):
     # Filtro por tipo de pedido (NOVO)
     filter_type = request.GET.get('type', 'all')  # all, delivery, table
     
-    orders = Order.objects.filter(tenant=tenant)
+    orders = _panel_orders_queryset(tenant)
     
     if filter_type == 'table':
         orders = orders.filter(order_type='table')
@@ -910,88 +847,120 @@ def api_get_orders(request, slug):
         orders = orders.filter(order_type='pickup')
     # 'all' não aplica filtro
     
-    orders = orders.order_by('-created_at')[:20]
+    cursor = _orders_cursor(timezone.now() - ORDERS_SINCE_OVERLAP)
     
-    data = []
-    for order in orders:
-        items = []
-        for item in order.items.all():
-            items.append({
-                'name': item.product_name,
-                'quantity': item.quantity,
-                'price': float(item.price),
-                'obs': item.observation,
-                'options': item.options_text or ''
-            })
-            
-        # Identificar informações da mesa (NOVO)
-        table_info = None
-        if order.table:
-            table_info = {
-                'id': order.table.id,
-                'number': order.table.number
-            }
-        
-        # Formata o endereço ou mesa
-        if order.order_type == 'table':
-            address_display = f"Mesa {order.table.number}"
-        elif order.address_street:
-            address_display = f"{order.address_street}, {order.address_number} - {order.address_neighborhood}"
-        else:
-            address_display = "Retirada"
-            
-        data.append({
-            'id': order.id,
-            'customer_name': order.customer_name,
-            'customer_phone': order.customer_phone,
-            'phone': order.customer_phone,
-            'total_value': float(order.total_value),
-            'delivery_fee': float(order.delivery_fee) if order.delivery_fee else 0,
-            'discount_amount': float(order.discount_value) if order.discount_value else 0,
-            'discount_value': float(order.discount_value) if order.discount_value else 0,
-            'coupon_code': order.coupon.code if order.coupon else None,
-            'status': order.status,
-            'is_printed': order.is_printed,
-            'payment_method': order.payment_method,
-            'address': address_display,
-            'observation': order.observation,
-            'created_at': timezone.localtime(order.created_at).strftime('%d/%m %H:%M'),
-            'items': items,
-            'order_type': order.order_type,
-            'table': table_info,
-            'table_number': order.table.number if order.table else None,
-            # ADICIONE ESTES CAMPOS:
-            'is_scheduled': order.is_scheduled,
-            'scheduled_date': order.scheduled_date.strftime('%d/%m/%Y') if order.scheduled_date else None,
-            'scheduled_time': order.scheduled_time.strftime('%H:%M') if order.scheduled_time else None,
-        })
+    since = request.GET.get('since')
+    if since:
+        try:
+            since_dt = _parse_orders_cursor(since)
+        except (ValueError, OverflowError, OSError):
+            return JsonResponse({'status': 'error', 'message': 'Cursor inválido'}, status=400)
+        # Índice (tenant, updated_at): sem alterações, é uma consulta vazia
+        orders = orders.filter(updated_at__gt=since_dt).order_by('-created_at')
+    else:
+        orders = orders.order_by('-created_at')[:20]
+    
+    data = [_serialize_panel_order(order) for order in orders]
         
-    return JsonResponse({'orders': data})
+    return JsonResponse({'orders': data, 'cursor': cursor, 'delta': bool(since)})
+
+def _load_panel_orders(tenant, order_ids):
+    orders = _panel_orders_queryset(tenant).filter(id__in=order_ids).order_by('-created_at')
+    return [_serialize_panel_order(order) for order in orders]
+
+def _sse_message(event, data, event_id):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _order_events(tenant, last_seq):
+    """Gerador do stream: acorda pelo hub local ou pela checagem periódica do contador."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STREAM_MAX_SECONDS
+    next_keepalive = loop.time() + STREAM_KEEPALIVE_SECONDS
+
+    with hub.listen(tenant.id) as wakeup:
+        seq = await sync_to_async(ensure_seq)(tenant.id)
+        yield "retry: 3000\n\n"
+
+        # Primeira conexão (ou contador recriado): o painel carrega a lista
+        # inteira e a partir daí só recebe o que mudar depois deste evento
+        if not last_seq or last_seq > seq:
+            yield _sse_message('reset', {}, seq)
+            last_seq = seq
+
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=min(STREAM_POLL_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+
+            seq = await sync_to_async(current_seq)(tenant.id)
+            if seq != last_seq:
+                order_ids = await sync_to_async(changed_order_ids)(tenant.id, last_seq, seq)
+                if order_ids is None:
+                    yield _sse_message('reset', {}, seq)
+                else:
+                    orders = await sync_to_async(_load_panel_orders)(tenant, order_ids)
+                    yield _sse_message('orders', orders, seq)
+                last_seq = seq
+                next_keepalive = loop.time() + STREAM_KEEPALIVE_SECONDS
+            elif loop.time() >= next_keepalive:
+                yield ": ping\n\n"
+                next_keepalive = loop.time() + STREAM_KEEPALIVE_SECONDS
 
 @login_required
+@tenant_owner_required
+async def api_orders_stream(request, slug):
+    """
+    Stream (Server-Sent Events) dos pedidos novos/alterados da loja.
+    Evento 'orders': pedidos no mesmo formato de api_get_orders.
+    Evento 'reset': o painel deve recarregar a lista em api_get_orders.
+    """
+    if not isinstance(request, ASGIRequest):
+        # Sob WSGI o stream seguraria um worker inteiro: o painel fica no polling
+        return JsonResponse({'status': 'error', 'message': 'Stream disponível apenas no servidor ASGI'}, status=503)
+
+    tenant = await sync_to_async(get_request_tenant)(request, slug)
+    if not tenant.can_access_orders:
+        return JsonResponse({'status': 'error', 'plan_block': True, 'message': 'Faça upgrade para ver pedidos em tempo real.'}, status=403)
+
+    try:
+        last_seq = int(request.headers.get('Last-Event-ID') or 0)
+    except ValueError:
+        last_seq = 0
+
+    response = StreamingHttpResponse(_order_events(tenant, last_seq), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Nginx/proxies: não acumular o stream em buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required
+@tenant_owner_required
 def api_update_order(request, slug, order_id):
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
             new_status = data.get('status')
             
-            order = Order.objects.get(id=order_id, tenant__slug=slug)
+            order = Order.objects.get(id=order_id, tenant=tenant)
             
             # Log para debug
             logger.info(f"Atualizando pedido #{order.id} para status: {new_status}")
             
             order.status = new_status
             order.save()
+            publish_order_change(order)
             
             # CORREÇÃO: Usar 'saiu_entrega' (snake_case) ao invés de 'saiu para entrega'
             if new_status == 'saiu_entrega':
                 logger.info(f"Disparando Push para pedido #{order.id}")
-                send_push_notification(order, tenant)
+                enqueue('push.order_status', {'order_id': order.id})
             
             return JsonResponse({'status': 'success'})
         except Order.DoesNotExist:
@@ -1000,30 +969,25 @@ def api_update_order(request, slug, order_id):
     return JsonResponse({'status': 'error'}, status=400)
 
 @login_required
+@tenant_owner_required
 def api_mark_printed(request, slug, order_id):
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    # Verificar se o usuário é o dono da loja
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
-            order = Order.objects.get(id=order_id, tenant__slug=slug)
+            order = Order.objects.get(id=order_id, tenant=tenant)
             order.is_printed = True
             order.save()
+            publish_order_change(order)
             return JsonResponse({'status': 'success'})
         except Order.DoesNotExist:
             return JsonResponse({'status': 'error'}, status=404)
     return JsonResponse({'status': 'error'}, status=400)
 
 @login_required
+@tenant_owner_required
 def api_update_settings(request, slug):
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    # Verificar se o usuário é o dono da loja
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
@@ -1095,7 +1059,7 @@ def api_update_settings(request, slug):
 
 # --- APIs DE HISTORICO DO CLIENTE ---
 def api_customer_history(request, slug):
-    tenant = get_object_or_404(Tenant, slug=slug)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
@@ -1140,12 +1104,9 @@ def api_customer_history(request, slug):
 # --- APIs DE PRODUTOS (CRUD) ---
 
 @login_required
+@tenant_owner_required
 def api_get_products(request, slug):
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    # Verificar se o usuário é o dono da loja
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'error': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     categories = Category.objects.filter(tenant=tenant).prefetch_related('products', 'products__options', 'products__options__items').order_by('order')
     
@@ -1193,12 +1154,9 @@ def api_get_products(request, slug):
     return JsonResponse({'categories': data})
 
 @login_required
+@tenant_owner_required
 def api_save_product(request, slug):
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    # Verificar se o usuário é o dono da loja
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
@@ -1290,6 +1248,7 @@ def api_save_product(request, slug):
             # Passamos o ID da categoria atual para ela ser protegida da exclusão
             current_cat_id = category.id if category else None
             _limpar_categorias_vazias(tenant, category_id_to_protect=current_cat_id)
+            bump_menu_version(tenant.id)
                 
             return JsonResponse({'status': 'success'})
         except Exception as e:
@@ -1298,15 +1257,12 @@ def api_save_product(request, slug):
     return JsonResponse({'status': 'error'}, status=400)
 
 @login_required
+@tenant_owner_required
 def api_get_product_options(request, slug, product_id):
     """
     Retorna os grupos de adicionais de um produto específico para importação.
     """
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    # Verifica permissão
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
 
     try:
         source_product = Product.objects.get(id=product_id, tenant=tenant)
@@ -1336,11 +1292,9 @@ def api_get_product_options(request, slug, product_id):
 
 
 @login_required
+@tenant_owner_required
 def api_delete_product(request, slug, product_id):
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
@@ -1349,6 +1303,7 @@ def api_delete_product(request, slug, product_id):
             product.delete()
             
             _limpar_categorias_vazias(tenant)
+            bump_menu_version(tenant.id)
             
             return JsonResponse({'status': 'success'})
         except Exception as e:
@@ -1356,17 +1311,16 @@ def api_delete_product(request, slug, product_id):
     return JsonResponse({'status': 'error'}, status=400)
 
 @login_required
+@tenant_owner_required
 def api_toggle_product(request, slug, product_id):
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
-            product = get_object_or_404(Product, id=product_id, tenant__slug=slug)
+            product = get_object_or_404(Product, id=product_id, tenant=tenant)
             product.is_available = not product.is_available
             product.save()
+            bump_menu_version(tenant.id)
             return JsonResponse({'status': 'success', 'new_state': product.is_available})
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': 'Erro ao alternar disponibilidade'}, status=400)
@@ -1377,12 +1331,10 @@ def api_toggle_product(request, slug, product_id):
 # ========================
 
 @login_required
+@tenant_owner_required
 def api_get_product_groups(request, slug):
     """Retorna todos os grupos de adicionais reutilizáveis da loja"""
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     from .models import ProductGroup
     
@@ -1397,14 +1349,12 @@ def api_get_product_groups(request, slug):
     return JsonResponse({'status': 'success', 'groups': groups_data})
 
 @login_required
+@tenant_owner_required
 def api_save_product_group(request, slug):
     """Cria ou atualiza um grupo de adicionais reutilizável"""
     from .models import ProductGroup, GroupItem
     
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
@@ -1450,6 +1400,7 @@ def api_save_product_group(request, slug):
                         price=item_data.get('price', 0)
                     )
             
+            bump_menu_version(tenant.id)
             return JsonResponse({'status': 'success', 'id': group.id})
         except ProductGroup.DoesNotExist:
             return JsonResponse({'status': 'error', 'message': 'Grupo não encontrado'}, status=404)
@@ -1460,14 +1411,12 @@ def api_save_product_group(request, slug):
     return JsonResponse({'status': 'error'}, status=400)
 
 @login_required
+@tenant_owner_required
 def api_delete_product_group(request, slug, group_id):
     """Deleta um grupo de adicionais reutilizável"""
     from .models import ProductGroup
     
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
@@ -1482,14 +1431,12 @@ def api_delete_product_group(request, slug, group_id):
     return JsonResponse({'status': 'error'}, status=400)
 
 @login_required
+@tenant_owner_required
 def api_import_product_group(request, slug, product_id):
     """Importa um grupo reutilizável para um produto específico"""
     from .models import ProductOption, ProductGroup
     
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
@@ -1519,6 +1466,7 @@ def api_import_product_group(request, slug, product_id):
                     price=group_item.price
                 )
             
+            bump_menu_version(tenant.id)
             return JsonResponse({'status': 'success', 'option_id': option.id})
         except Product.DoesNotExist:
             return JsonResponse({'status': 'error', 'message': 'Produto não encontrado'}, status=404)
@@ -1640,9 +1588,6 @@ def signup(request):
                 # ENVIAR EMAIL DE BOAS-VINDAS
                 # ===========================================
                 try:
-                    from django.conf import settings
-                    from django.core.mail import EmailMultiAlternatives
-                    
                     subject = f'🎉 Bem-vindo ao RM Pedidos, {store_name}!'
                     
                     # Versão texto simples
@@ -1823,16 +1768,15 @@ Tecnologia que vende mais 🚀
 </html>
 '''
                     
-                    # Criar email com versão HTML e texto
-                    email = EmailMultiAlternatives(
-                        subject=subject,
-                        body=text_content,
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        to=[email]
-                    )
-                    email.attach_alternative(html_content, "text/html")
-                    email.send(fail_silently=True)
-                    logger.info(f'[EMAIL] Email de boas-vindas enviado para {email}')
+                    # Email com versão HTML e texto, enviado pela fila de jobs
+                    # (o cadastro não espera o SMTP)
+                    enqueue('email.send', {
+                        'subject': subject,
+                        'text': text_content,
+                        'html': html_content,
+                        'to': [email],
+                    })
+                    logger.info(f'[EMAIL] Email de boas-vindas enfileirado para {email}')
                 except Exception as email_error:
                     # Log do erro mas não impede o cadastro
                     logger.warning(f'[EMAIL] Erro ao enviar email de boas-vindas: {email_error}')
@@ -1848,11 +1792,9 @@ Tecnologia que vende mais 🚀
 
 # --- API FINANCEIRO E HISTÓRICO ---
 @login_required
+@tenant_owner_required
 def api_get_financials(request, slug):
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'error': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
 
     # --- PROTEÇÃO DO PLANO ---
     if not tenant.can_access_reports:
@@ -1903,12 +1845,9 @@ def api_get_financials(request, slug):
 
 # --- API ABRIR/FECHAR LOJA ---
 @login_required
+@tenant_owner_required
 def api_toggle_store_open(request, slug):
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    # Permitir owner da loja OU superuser
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
         
     if request.method == 'POST':
         try:
@@ -1927,6 +1866,7 @@ def api_toggle_store_open(request, slug):
                 tenant.manual_override = True
             
             tenant.save()
+            invalidate_store_status(tenant.slug)
             
             return JsonResponse({
                 'status': 'success', 
@@ -1940,6 +1880,7 @@ def api_toggle_store_open(request, slug):
 
 # --- API SINCRONIZAR STATUS COM HORÁRIOS ---
 @login_required
+@tenant_owner_required
 def api_sync_store_status(request, slug):
     """Sincroniza o estado da loja com os horários.
     
@@ -1947,10 +1888,7 @@ def api_sync_store_status(request, slug):
     - Se manual_override está ativado, mantém fechado (dono quer fechar manualmente)
     - Se manual_override está desativado, sincroniza com os horários
     """
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
@@ -1975,34 +1913,60 @@ def api_sync_store_status(request, slug):
     return JsonResponse({'status': 'error'}, status=400)
 
 # --- API PÚBLICA PARA STATUS DA LOJA (ACESSO PELO CLIENTE) ---
+
+# Tempo máximo que navegador/proxy podem reaproveitar a resposta sem revalidar.
+# Curto porque o fechamento manual pode acontecer a qualquer momento.
+STORE_STATUS_MAX_AGE = 30
+
+def _compute_public_store_status(tenant):
+    """Calcula o status público da loja. Retorna (payload, próxima_transição)."""
+    # PRIORIDADE 1: Fechamento manual pelo dono
+    if tenant.manual_override:
+        return {
+            'is_open': False,
+            'reason': 'fechamento_manual',
+            'message': 'FECHADO TEMPORARIAMENTE'
+        }, None
+
+    # PRIORIDADE 2: Verificar horário de funcionamento
+    now = timezone.localtime(timezone.now())
+    is_open, message, transition_at = get_weekly_schedule(tenant.id).status(now)
+    return {
+        'is_open': is_open,
+        'reason': 'horario_funcionamento',
+        'message': message
+    }, transition_at
+
 def api_public_store_status(request, slug):
     """
     API pública para verificar o status da loja.
     Usada pelo cardápio do cliente para exibir a mensagem correta.
+
+    O resultado fica em cache por loja até a próxima abertura/fechamento,
+    e a resposta leva ETag/Cache-Control para o navegador e o proxy absorverem o polling.
     """
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
     if request.method == 'GET':
         try:
-            # PRIORIDADE 1: Fechamento manual pelo dono
-            if tenant.manual_override:
-                return JsonResponse({
-                    'status': 'success',
-                    'is_open': False,
-                    'reason': 'fechamento_manual',
-                    'message': 'FECHADO TEMPORARIAMENTE'
-                })
-            
-            # PRIORIDADE 2: Verificar horário de funcionamento
-            is_open, message = is_store_open_by_hours(tenant)
-            
-            return JsonResponse({
-                'status': 'success',
-                'is_open': is_open,
-                'reason': 'horario_funcionamento',
-                'message': message
-            })
+            entry = get_store_status(slug)
+            if entry is None:
+                tenant = get_request_tenant(request, slug)
+                payload, transition_at = _compute_public_store_status(tenant)
+                entry = set_store_status(slug, payload, transition_at)
+
+            max_age = max(0, min(STORE_STATUS_MAX_AGE, int(entry['expires_at'] - time.time())))
+            etag = quote_etag(entry['etag'])
+
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                response = HttpResponseNotModified()
+            else:
+                response = JsonResponse({'status': 'success', **entry['payload']})
+
+            response['ETag'] = etag
+            patch_cache_control(response, public=True, max_age=max_age)
+            return response
                 
+        except Http404:
+            raise
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
     
@@ -2010,11 +1974,9 @@ def api_public_store_status(request, slug):
 
 # ROTA PARA HORARIO DE FUNCIONAMENTO/FOLGAS
 @login_required
+@tenant_owner_required
 def api_save_hours(request, slug):
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
@@ -2031,18 +1993,73 @@ def api_save_hours(request, slug):
                     }
                 )
             
+            bump_menu_version(tenant.id)
+            invalidate_weekly_schedule(tenant.id)
+            invalidate_store_status(tenant.slug)
             return JsonResponse({'status': 'success'})
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': 'Erro ao salvar horários'}, status=500)
     return JsonResponse({'status': 'error'}, status=400)
 
 # --- API TAXAS DE ENTREGA ---
+def api_neighborhood_suggest(request, slug):
+    """Autocomplete do bairro no carrinho: bairros com taxa parecidos com ?q=."""
+    ref = get_tenant_ref(slug)
+    query = request.GET.get('q', '').strip()[:100]
+    if len(query) < 2:
+        return JsonResponse({'status': 'success', 'results': [], 'match': None})
+
+    index = get_neighborhood_index(ref.id)
+    match = index.match(query)
+    results = index.search(query)
+    return JsonResponse({
+        'status': 'success',
+        'results': [{'neighborhood': r.neighborhood, 'fee': float(r.fee), 'score': r.score} for r in results],
+        # O bairro que o checkout vai cobrar para esse texto (None = taxa a combinar)
+        'match': {'neighborhood': match.neighborhood, 'fee': float(match.fee)} if match else None,
+    })
+
+def api_cep_lookup(request, slug):
+    """Bairro do CEP pela base local e a taxa de entrega que o checkout vai cobrar."""
+    ref = get_tenant_ref(slug)
+    try:
+        cep_clean = validate_cep(request.GET.get('cep', ''))
+    except ValidationError as e:
+        return JsonResponse({'status': 'error', 'message': f'CEP: {e.message}'}, status=400)
+
+    entry = lookup_cep(cep_clean)
+    if entry is None:
+        return JsonResponse({'status': 'error', 'message': 'CEP não encontrado na base local.'}, status=404)
+
+    match = get_neighborhood_index(ref.id).match(entry.neighborhood)
+    return JsonResponse({
+        'status': 'success',
+        'cep': cep_clean,
+        'neighborhood': entry.neighborhood,
+        'city': entry.city,
+        'uf': entry.uf,
+        'fee': float(match.fee) if match else None,
+        'fee_neighborhood': match.neighborhood if match else None,
+    })
+
+def api_delivery_zone(request, slug):
+    """Zona de entrega e taxa da localização do cliente (?lat=&lng=), como o checkout calcula."""
+    ref = get_tenant_ref(slug)
+    point = parse_point(request.GET.get('lat'), request.GET.get('lng'))
+    if point is None:
+        return JsonResponse({'status': 'error', 'message': 'Localização inválida.'}, status=400)
+
+    zone = get_zone_index(ref.id).lookup(*point)
+    return JsonResponse({
+        'status': 'success',
+        # None = fora das zonas; o checkout usa a taxa do bairro
+        'zone': {'name': zone.name, 'fee': float(zone.fee)} if zone else None,
+    })
+
 @login_required
+@tenant_owner_required
 def api_delivery_fees(request, slug):
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'GET':
         fees = list(tenant.delivery_fees.values('id', 'neighborhood', 'fee'))
@@ -2060,11 +2077,13 @@ def api_delivery_fees(request, slug):
             # Normaliza o bairro para manter consistência
             neighborhood_normalized = normalizar_texto(neighborhood)
 
+            # Mesma chave do checkout: 'São José' atualiza a taxa de 'SAO JOSE'
             DeliveryFee.objects.update_or_create(
                 tenant=tenant,
-                neighborhood__iexact=neighborhood,
+                neighborhood_key=neighborhood_key(neighborhood),
                 defaults={'neighborhood': neighborhood_normalized, 'fee': fee}
             )
+            bump_menu_version(tenant.id)
             return JsonResponse({'status': 'success'})
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': 'Erro ao salvar taxa de entrega'}, status=500)
@@ -2078,7 +2097,7 @@ def api_delivery_fees(request, slug):
 def api_push_subscribe(request, slug):
     from .models import PushSubscription
     
-    tenant = get_object_or_404(Tenant, slug=slug)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
@@ -2149,6 +2168,7 @@ def api_push_subscribe(request, slug):
     return JsonResponse({'status': 'error'}, status=400)
 
 @login_required
+@tenant_owner_required
 def api_push_subscriptions_count(request, slug):
     """
     Retorna a quantidade de assinantes de push notifications ativos de uma loja.
@@ -2156,10 +2176,7 @@ def api_push_subscriptions_count(request, slug):
     """
     from .models import PushSubscription
     
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'GET':
         try:
@@ -2171,6 +2188,8 @@ def api_push_subscriptions_count(request, slug):
     
     return JsonResponse({'status': 'error'}, status=400)
 
+@login_required
+@tenant_owner_required
 def api_push_send(request, slug):
     """
     Envia uma notificação push para todos os subscribers de uma loja.
@@ -2180,10 +2199,7 @@ def api_push_send(request, slug):
     from .models import PushSubscription
     from django.conf import settings
     
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
@@ -2213,67 +2229,31 @@ def api_push_send(request, slug):
             
             url = data.get('url', f'/{slug}/')
             
-            # Configurar web-push com VAPID do settings
-            VAPID_PRIVATE_KEY = getattr(settings, 'VAPID_PRIVATE_KEY', None)
-            VAPID_CLAIM_EMAIL = getattr(settings, 'VAPID_CLAIM_EMAIL', 'mailto: <gabriel.mito07@gmail.com>')
-            
-            if not VAPID_PRIVATE_KEY:
+            if not getattr(settings, 'VAPID_PRIVATE_KEY', None):
                 return JsonResponse({
                     'status': 'error', 
                     'message': 'VAPID private key não configurada no settings.py'
                 }, status=500)
             
-            # Nota: A nova API do pywebpush não usa set_vapid_details()
-            # Os dados VAPID são passados diretamente para webpush()
-            
-            subscriptions = PushSubscription.objects.filter(tenant=tenant, is_active=True)
-            sent_count = 0
-            failed_count = 0
-            
-            icon_url = tenant.logo.url if tenant.logo else '/static/img/icon-192.svg'
+            total = PushSubscription.objects.filter(tenant=tenant, is_active=True).count()
             
-            logger.info(f'[PUSH MANUAL] Enviando "{notification_type}" para {subscriptions.count()} subscribers')
+            # O envio roda na fila de jobs; o painel acompanha pelo job_id
+            job = enqueue('push.broadcast', {
+                'tenant_id': tenant.id,
+                'title': title,
+                'body': body,
+                'url': url,
+                'notification_type': notification_type,
+            })
             
-            for sub in subscriptions:
-                try:
-                    subscription = sub.to_json()
-                    webpush(
-                        subscription_info=subscription,
-                        data=json.dumps({
-                            'title': title,
-                            'body': body,
-                            'icon': icon_url,
-                            'badge': '/static/img/badge-72.png',
-                            'url': url,
-                            'tag': f'push-manual-{notification_type}-{int(timezone.now().timestamp())}',
-                            'extra': {
-                                'type': notification_type,
-                                'tenant_slug': slug
-                            }
-                        }),
-                        vapid_private_key=VAPID_PRIVATE_KEY,
-                        vapid_claims={
-                            'sub': VAPID_CLAIM_EMAIL
-                        }
-                    )
-                    sent_count += 1
-                except Exception as e:
-                    error_str = str(e)
-                    # Se o subscription expirou, marcar como inativo
-                    if '410' in error_str or 'unsubscribed' in error_str.lower() or 'not found' in error_str.lower():
-                        sub.is_active = False
-                        sub.save()
-                        logger.info(f'[PUSH MANUAL] Subscription {sub.id} marcada como inativa')
-                    failed_count += 1
-                    logger.warning(f'[PUSH MANUAL] Falha para sub {sub.id}: {error_str}')
-            
-            logger.info(f'[PUSH MANUAL] Concluído: {sent_count} enviados, {failed_count} falharam')
+            logger.info(f'[PUSH MANUAL] "{notification_type}" enfileirado (job #{job.id}) para {total} subscribers')
             
             return JsonResponse({
                 'status': 'success', 
-                'sent': sent_count,
-                'failed': failed_count,
-                'message': f'Notificação enviada para {sent_count} clientes'
+                'job_id': job.id,
+                'total': total,
+                'status_url': reverse('api_push_job_status', kwargs={'slug': slug, 'job_id': job.id}),
+                'message': f'Enviando notificação para {total} clientes'
             })
         except json.JSONDecodeError:
             return JsonResponse({'status': 'error', 'message': 'JSON inválido'}, status=400)
@@ -2284,15 +2264,38 @@ def api_push_send(request, slug):
     return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=400)
 
 @login_required
-def api_delete_delivery_fee(request, slug, fee_id):
-    tenant = get_object_or_404(Tenant, slug=slug)
+@tenant_owner_required
+@never_cache
+def api_push_job_status(request, slug, job_id):
+    """Andamento de um envio de push manual (job 'push.broadcast')."""
+    tenant = get_request_tenant(request, slug)
     
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    job = Job.objects.filter(
+        pk=job_id, name='push.broadcast', payload__tenant_id=tenant.id
+    ).values('status', 'result').first()
+    if not job:
+        return JsonResponse({'status': 'error', 'message': 'Envio não encontrado'}, status=404)
+    
+    result = job['result'] or {}
+    return JsonResponse({
+        'status': 'success',
+        'job_status': job['status'],
+        'done': job['status'] in ('done', 'failed'),
+        'total': result.get('total'),
+        'sent': result.get('sent', 0),
+        'failed': result.get('failed', 0),
+        'expired': result.get('expired', 0),
+    })
+
+@login_required
+@tenant_owner_required
+def api_delete_delivery_fee(request, slug, fee_id):
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
             DeliveryFee.objects.filter(id=fee_id, tenant=tenant).delete()
+            bump_menu_version(tenant.id)
             return JsonResponse({'status': 'success'})
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': 'Erro ao excluir taxa'}, status=500)
@@ -2304,15 +2307,13 @@ def api_delete_delivery_fee(request, slug, fee_id):
 # ========================
 
 @login_required
+@tenant_owner_required
 def api_tables(request, slug):
     """
     GET: Lista todas as mesas da loja
     POST: Cria uma nova mesa
     """
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     # GET: Lista mesas
     if request.method == 'GET':
@@ -2375,16 +2376,14 @@ def api_tables(request, slug):
 
 
 @login_required
+@tenant_owner_required
 def api_table_details(request, slug, table_id):
     """
     GET: Retorna detalhes de uma mesa específica
     PUT: Atualiza uma mesa
     DELETE: Exclui uma mesa
     """
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     table = get_object_or_404(Table, id=table_id, tenant=tenant)
     
@@ -2454,12 +2453,10 @@ def api_table_details(request, slug, table_id):
 
 
 @login_required
+@tenant_owner_required
 def api_delete_table(request, slug, table_id):
     """Exclui uma mesa"""
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
@@ -2477,12 +2474,10 @@ def api_delete_table(request, slug, table_id):
 
 
 @login_required
+@tenant_owner_required
 def api_toggle_table(request, slug, table_id):
     """Ativa ou desativa uma mesa"""
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
@@ -2505,9 +2500,9 @@ def api_generate_qrcode(request, slug, table_id):
     Gera QR Code para uma mesa específica.
     O QR Code leva para a URL: /{slug}/mesa/{number}/
     """
-    tenant = get_object_or_404(Tenant, slug=slug)
+    tenant = get_request_tenant(request, slug)
     
-    if tenant.owner != request.user and not request.user.is_superuser:
+    if not can_manage_tenant(request.user, tenant):
         
         # Se não for dono e nem admin, verifica se tem loja própria
         user_tenant = Tenant.objects.filter(owner=request.user).first()
@@ -2562,14 +2557,12 @@ def api_generate_qrcode(request, slug, table_id):
 
 
 @login_required
+@tenant_owner_required
 def api_generate_all_qrcodes(request, slug):
     """
     Gera QR Codes para todas as mesas ativas da loja.
     """
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
@@ -2628,11 +2621,9 @@ def api_generate_all_qrcodes(request, slug):
 # ========================
 
 @login_required
+@tenant_owner_required
 def api_coupons(request, slug):
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     # --- PROTEÇÃO DO PLANO ---
     if not tenant.can_access_coupons:
@@ -2707,12 +2698,16 @@ def api_coupons(request, slug):
     return JsonResponse({'status': 'error'}, status=400)
 
 
+# Campos que a edição do cupom pelo painel grava
+COUPON_EDIT_FIELDS = [
+    'code', 'description', 'discount_type', 'discount_value', 'minimum_order_value',
+    'usage_limit', 'valid_from', 'valid_until', 'is_active',
+]
+
 @login_required
+@tenant_owner_required
 def api_coupon_details(request, slug, coupon_id):
-    tenant = get_object_or_404(Tenant, slug=slug)
-    
-    if tenant.owner != request.user and not request.user.is_superuser:
-        return JsonResponse({'status': 'error', 'message': 'Acesso negado'}, status=403)
+    tenant = get_request_tenant(request, slug)
     
     coupon = get_object_or_404(Coupon, id=coupon_id, tenant=tenant)
     
@@ -2758,7 +2753,8 @@ def api_coupon_details(request, slug, coupon_id):
             coupon.valid_until = data.get('valid_until', coupon.valid_until)
             coupon.is_active = data.get('is_active', coupon.is_active)
             
-            coupon.save()
+            # used_count fica de fora: só o redeem() dos pedidos mexe no contador
+            coupon.save(update_fields=COUPON_EDIT_FIELDS)
             return JsonResponse({'status': 'success'})
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
@@ -2774,7 +2770,7 @@ def api_coupon_details(request, slug, coupon_id):
 
 
 def api_validate_coupon(request, slug):
-    tenant = get_object_or_404(Tenant, slug=slug)
+    tenant = get_request_tenant(request, slug)
     
     if request.method == 'POST':
         try:
@@ -2878,7 +2874,7 @@ def politica_privacidade(request):
 # ========================
 def pwa_manifest(request, slug):
     """Retorna manifest.json customizado para cada loja (PWA) com ícones dinâmicos"""
-    tenant = get_object_or_404(Tenant, slug=slug)
+    tenant = get_request_tenant(request, slug)
     
     # Determinar a cor primária
     primary_color = tenant.primary_color if tenant.primary_color else '#ea580c'
@@ -2948,10 +2944,10 @@ def mp_connect(request, slug):
     Passo 1 do OAuth: Redireciona o lojista para o site do Mercado Pago
     para ele autorizar nossa aplicação.
     """
-    tenant = get_object_or_404(Tenant, slug=slug)
+    tenant = get_request_tenant(request, slug)
     
     # Segurança: Apenas o dono pode conectar
-    if tenant.owner != request.user and not request.user.is_superuser:
+    if not can_manage_tenant(request.user, tenant):
         return redirect('painel_lojista', slug=slug)
 
     # Montamos a URL de autorização do MP
@@ -3008,6 +3004,9 @@ def mp_callback(request):
                 }
             )
             
+            # A opção de PIX online aparece no cardápio em cache
+            bump_menu_version(tenant.id)
+
             # Redireciona de volta para o painel com sucesso
             return redirect('painel_lojista', slug=tenant.slug)
             
@@ -3035,48 +3034,10 @@ def mp_webhook(request):
 
             # O MP manda notificações de vários tipos, só queremos 'payment'
             if topic == 'payment' and payment_id:
-                
-                # Precisamos descobrir de qual LOJA é esse pagamento para usar o Token certo.
-                # Como o webhook vem "seco", vamos tentar achar o pedido pelo ID da transação
-                # Se o pedido ainda não tem ID do MP salvo (fase inicial), isso pode ser complexo.
-                # ESTRATÉGIA SEGURA: Tentar buscar o pagamento usando o Token da Loja se soubermos qual é.
-                # Mas aqui, o MP avisa de forma genérica.
-                
-                # Solução: O MP manda no corpo (body) da notificação alguns dados.
-                # Vamos simplificar: Vamos verificar se temos esse ID salvo em algum pedido nosso.
-                
-                # 1. Tenta achar o pedido que tem esse ID de transação (se já salvamos antes)
-                order = Order.objects.filter(mercadopago_id=payment_id).first()
-                
-                if order:
-                    # Achamos o pedido! Agora consultamos o status atualizado no MP
-                    tenant = order.tenant
-                    if hasattr(tenant, 'payment_config'):
-                        sdk = mercadopago.SDK(tenant.payment_config.access_token)
-                        payment_info = sdk.payment().get(payment_id)
-                        response = payment_info["response"]
-                        
-                        status = response.get("status")
-                        
-                        if status == 'approved':
-                            # PAGAMENTO CONFIRMADO!
-                            # Muda status do pedido e salva
-                            if order.status == 'pendente':
-                                order.status = 'em_preparo' # Ou 'confirmado'
-                                order.mercadopago_status = status
-                                order.save()
-                                logger.info(f"Webhook: Pedido #{order.id} APROVADO via Pix!")
-                                
-                        elif status == 'rejected' or status == 'cancelled':
-                            order.mercadopago_status = status
-                            order.status = 'cancelado'
-                            order.save()
-                
-                else:
-                    # Se não achamos o pedido pelo ID direto (as vezes o MP avisa antes da gente salvar),
-                    # podemos tentar pegar pelo external_reference se vier no body, mas por hora
-                    # vamos confiar que o ID já foi salvo na criação do pedido.
-                    logger.warning(f"Webhook: Pedido não encontrado para ID MP {payment_id}")
+                # A consulta ao MP e a atualização do pedido ficam com a fila de jobs
+                # (tenants/payments.py:process_payment_notification). Respondemos
+                # na hora; se o pedido ainda não tiver o ID do MP salvo, o job tenta de novo.
+                enqueue('mp.webhook', {'payment_id': str(payment_id)})
 
             return JsonResponse({'status': 'ok'}, status=200)
             
@@ -3085,3 +3046,20 @@ def mp_webhook(request):
             return JsonResponse({'error': str(e)}, status=500)
             
     return JsonResponse({'status': 'method_not_allowed'}, status=405)
+
+
+# ==========================================
+# MÉTRICAS (PROMETHEUS)
+# ==========================================
+@never_cache
+def metrics_endpoint(request):
+    """Métricas de todos os workers no formato do Prometheus. Exige 'Authorization: Bearer <METRICS_TOKEN>'."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        raise Http404
+
+    auth = request.headers.get('Authorization', '')
+    if not auth.startswith('Bearer ') or not hmac.compare_digest(auth[len('Bearer '):].encode(), token.encode()):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+
+    return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
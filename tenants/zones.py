@@ -0,0 +1,213 @@
+"""
+Zonas de entrega por localização (DeliveryZone): lat/lng -> zona e taxa.
+
+Cada loja tem um ZoneIndex: as zonas ativas já convertidas (polígono ou
+círculo, com a caixa envolvente) e uma grade uniforme sobre a área de todas
+elas. Cada célula guarda só as zonas cuja caixa a toca, já na ordem de
+desempate (prioridade, depois a menor área). A busca calcula a célula do
+ponto e testa poucas zonas, em vez de todas.
+
+O índice segue o mesmo cache dos bairros (tenants/neighborhoods.py): uma
+versão por versão do cardápio, no cache compartilhado e num LRU local.
+Salvar zona pelo admin chama bump_menu_version.
+
+Distâncias em aproximação plana (equiretangular): erro desprezível na escala
+de uma cidade.
+"""
+import logging
+import math
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .cache import MENU_CACHE_TIMEOUT, get_menu_version
+from .localcache import LocalLRUCache
+from .models import DeliveryZone
+
+logger = logging.getLogger(__name__)
+
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LNG = 111.320
+
+# Células por eixo: ~2 * sqrt(zonas), até este limite
+GRID_MAX_CELLS = 128
+
+ZONE_INDEX_LOCAL_SIZE = 512
+# A chave já leva a versão do cardápio; o TTL só libera memória de lojas paradas
+ZONE_INDEX_LOCAL_TTL = 60 * 10
+
+ZoneMatch = namedtuple('ZoneMatch', ['zone_id', 'name', 'fee'])
+
+_local_indexes = LocalLRUCache(ZONE_INDEX_LOCAL_SIZE, ZONE_INDEX_LOCAL_TTL, name='zone_index')
+
+
+def parse_point(lat, lng):
+    """(lat, lng) em float se forem coordenadas válidas, senão None."""
+    try:
+        lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
+        return None
+    # Comparações com NaN são falsas: NaN também cai aqui
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+class Zone:
+    """Zona pronta para a busca (polígono ou círculo)."""
+
+    __slots__ = ('zone_id', 'name', 'fee', 'priority', 'area', 'bbox', 'points', 'center', 'radius_km', 'lng_scale')
+
+    def __init__(self, zone_id, name, fee, priority, kind, coordinates, radius_km=None):
+        self.zone_id = zone_id
+        self.name = name
+        self.fee = fee
+        self.priority = priority
+        self.points = None
+        self.center = None
+        self.radius_km = None
+
+        points = [(float(lat), float(lng)) for lat, lng in coordinates]
+        if kind == 'radius':
+            if len(points) != 1 or not radius_km or float(radius_km) <= 0:
+                raise ValueError('zona de raio precisa de um centro e raio_km > 0')
+            self.center = points[0]
+            self.radius_km = float(radius_km)
+            self.lng_scale = KM_PER_DEGREE_LNG * math.cos(math.radians(self.center[0]))
+            dlat = self.radius_km / KM_PER_DEGREE_LAT
+            dlng = self.radius_km / max(self.lng_scale, 1e-9)
+            lat, lng = self.center
+            self.bbox = (lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+            self.area = math.pi * self.radius_km ** 2
+        else:
+            if len(points) < 3:
+                raise ValueError('polígono precisa de pelo menos 3 pontos')
+            self.points = points
+            lats = [lat for lat, _ in points]
+            lngs = [lng for _, lng in points]
+            self.bbox = (min(lats), min(lngs), max(lats), max(lngs))
+            self.lng_scale = KM_PER_DEGREE_LNG * math.cos(math.radians(sum(lats) / len(lats)))
+            # Fórmula do laço (shoelace) em km²
+            twice_area = sum(
+                lng_a * lat_b - lng_b * lat_a
+                for (lat_a, lng_a), (lat_b, lng_b) in zip(points, points[1:] + points[:1])
+            )
+            self.area = abs(twice_area) / 2 * KM_PER_DEGREE_LAT * self.lng_scale
+
+    def contains(self, lat, lng):
+        min_lat, min_lng, max_lat, max_lng = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+            return False
+
+        if self.center is not None:
+            dy = (lat - self.center[0]) * KM_PER_DEGREE_LAT
+            dx = (lng - self.center[1]) * self.lng_scale
+            return dx * dx + dy * dy <= self.radius_km * self.radius_km
+
+        # Ray casting: conta quantas arestas um raio para leste cruza
+        inside = False
+        points = self.points
+        lat_j, lng_j = points[-1]
+        for lat_i, lng_i in points:
+            if (lat_i > lat) != (lat_j > lat):
+                cross_lng = lng_i + (lat - lat_i) * (lng_j - lng_i) / (lat_j - lat_i)
+                if lng < cross_lng:
+                    inside = not inside
+            lat_j, lng_j = lat_i, lng_i
+        return inside
+
+
+class ZoneIndex:
+    """Zonas de uma loja com grade uniforme (imutável; montado por build())."""
+
+    def __init__(self, zones):
+        # Ordem de desempate: maior prioridade, depois a menor área
+        self.zones = sorted(zones, key=lambda zone: (-zone.priority, zone.area, zone.zone_id))
+        self.cells = {}
+        if not self.zones:
+            self.bounds = None
+            return
+
+        self.bounds = (
+            min(zone.bbox[0] for zone in self.zones), min(zone.bbox[1] for zone in self.zones),
+            max(zone.bbox[2] for zone in self.zones), max(zone.bbox[3] for zone in self.zones),
+        )
+        self.size = min(GRID_MAX_CELLS, 2 * math.ceil(math.sqrt(len(self.zones))))
+        min_lat, min_lng, max_lat, max_lng = self.bounds
+        self.cell_lat = (max_lat - min_lat) / self.size or 1.0
+        self.cell_lng = (max_lng - min_lng) / self.size or 1.0
+
+        cells = {}
+        for position, zone in enumerate(self.zones):
+            row_a, col_a = self._cell(zone.bbox[0], zone.bbox[1])
+            row_b, col_b = self._cell(zone.bbox[2], zone.bbox[3])
+            for row in range(row_a, row_b + 1):
+                for col in range(col_a, col_b + 1):
+                    cells.setdefault((row, col), []).append(position)
+        # Posições crescentes = já na ordem de desempate
+        self.cells = {cell: tuple(positions) for cell, positions in cells.items()}
+
+    @classmethod
+    def build(cls, tenant_id):
+        zones = []
+        rows = DeliveryZone.objects.filter(tenant_id=tenant_id, is_active=True).values_list(
+            'id', 'name', 'fee', 'priority', 'kind', 'coordinates', 'radius_km',
+        )
+        for row in rows:
+            try:
+                zones.append(Zone(*row))
+            except (TypeError, ValueError) as e:
+                # Zona gravada sem passar pelo clean() (shell, bulk): ignora e avisa
+                logger.warning(f'[ZONES] Zona #{row[0]} da loja {tenant_id} ignorada: {e}')
+        return cls(zones)
+
+    def __len__(self):
+        return len(self.zones)
+
+    def _cell(self, lat, lng):
+        min_lat, min_lng = self.bounds[0], self.bounds[1]
+        row = min(self.size - 1, int((lat - min_lat) / self.cell_lat))
+        col = min(self.size - 1, int((lng - min_lng) / self.cell_lng))
+        return row, col
+
+    def lookup(self, lat, lng):
+        """ZoneMatch da zona que cobre o ponto, ou None."""
+        if self.bounds is None:
+            return None
+        min_lat, min_lng, max_lat, max_lng = self.bounds
+        if not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+            return None
+        for position in self.cells.get(self._cell(lat, lng), ()):
+            zone = self.zones[position]
+            if zone.contains(lat, lng):
+                return ZoneMatch(zone.zone_id, zone.name, zone.fee)
+        return None
+
+    def lookup_linear(self, lat, lng):
+        """Mesma resposta de lookup() testando todas as zonas (referência do bench_zones)."""
+        for zone in self.zones:
+            if zone.contains(lat, lng):
+                return ZoneMatch(zone.zone_id, zone.name, zone.fee)
+        return None
+
+
+def _index_cache_key(tenant_id, version):
+    return f'zone_index:{tenant_id}:{version}'
+
+
+def get_zone_index(tenant_id):
+    """Índice de zonas da loja (LRU local -> cache compartilhado -> banco)."""
+    version = get_menu_version(tenant_id)
+    local_key = (tenant_id, version)
+
+    found, index = _local_indexes.get(local_key)
+    if found:
+        return index
+
+    key = _index_cache_key(tenant_id, version)
+    index = cache.get(key)
+    if index is None:
+        index = ZoneIndex.build(tenant_id)
+        cache.set(key, index, MENU_CACHE_TIMEOUT)
+    _local_indexes.set(local_key, index)
+    return index